@@ -0,0 +1,160 @@
+import queue
+import sqlite3
+import threading
+
+from migrations import configure_connection
+
+# =============================
+# Chạy việc nặng của giao diện trên luồng nền (nạp dữ liệu thống kê, báo cáo lâu)
+# =============================
+# Tkinter chỉ được gọi từ luồng chính. Khi cần đọc CSDL, luồng nền mở kết nối SQLite RIÊNG (một kết nối
+# sqlite3 không dùng chung giữa các luồng; ở chế độ WAL nó đọc song song được trong lúc
+# quầy khác ghi), gửi tiến độ và kết quả qua queue.Queue. Luồng chính lấy chúng ra bằng
+# widget.after() định kỳ, nên cửa sổ vẫn vẽ lại và các nút vẫn bấm được trong lúc chờ.
+
+POLL_INTERVAL_MS = 100
+CANCEL_CHECK_STEPS = 1000 # Số lệnh VM của SQLite giữa hai lần kiểm tra hủy
+CANCEL_CHECK_ITEMS = 10000 # Số phần tử giữa hai lần kiểm tra hủy trong vòng lặp Python
+
+_current = threading.local() # Tác vụ đang chạy trên luồng này (xem cancellable)
+
+class TaskCancelled(Exception):
+    """Ném ra trong luồng nền khi tác vụ đã bị hủy (xem BackgroundTask.check_cancelled)."""
+
+def cancellable(iterable, every=CANCEL_CHECK_ITEMS):
+    """
+    Duyệt iterable; nếu đang chạy trong một BackgroundTask thì cứ every phần tử kiểm tra hủy
+    một lần (ném TaskCancelled). Dùng cho các vòng lặp dài trên dữ liệu trong RAM, vốn không
+    đi qua SQLite nên không được progress handler của kết nối dừng giúp.
+    Ngoài tác vụ nền trả lại iterator thường, không tốn gì thêm.
+    """
+    task = getattr(_current, "task", None)
+    if task is None:
+        return iter(iterable)
+    return _checked_iter(iterable, task, every)
+
+def _checked_iter(iterable, task, every):
+    for i, item in enumerate(iterable):
+        if i % every == 0:
+            task.check_cancelled()
+        yield item
+
+def database_path(conn):
+    """Đường dẫn file của CSDL "main" của conn; None nếu CSDL nằm trong RAM (":memory:")."""
+    for _, name, path in conn.execute("PRAGMA database_list"):
+        if name == "main":
+            return path or None
+    return None
+
+class BackgroundTask:
+    """
+    work(task) chạy trên luồng nền và dùng:
+    - task.conn: kết nối SQLite riêng của luồng nền (mở từ đường dẫn file của conn ở lần
+      dùng đầu tiên; việc chỉ đọc dữ liệu trong RAM không mở kết nối nào);
+    - task.report_progress(text): gửi dòng tiến độ về giao diện, đồng thời là điểm hủy;
+    - task.check_cancelled() / cancellable(...): dừng (TaskCancelled) nếu người dùng đã hủy.
+    on_progress(text), on_done(kết quả), on_error(ngoại lệ), on_cancelled() luôn được gọi
+    trên luồng chính. Câu SQL đang chạy dở trên task.conn cũng dừng khi bị hủy.
+    CSDL trong RAM không mở được kết nối thứ hai: khi đó work chạy luôn trên luồng chính với conn.
+    """
+    def __init__(self, widget, conn, work, on_done, on_progress=None, on_error=None, on_cancelled=None):
+        self.widget = widget
+        self.main_conn = conn
+        self.work = work
+        self.on_done = on_done
+        self.on_progress = on_progress
+        self.on_error = on_error
+        self.on_cancelled = on_cancelled
+        self.finished = False
+        self._path = None
+        self._conn = None
+        self._messages = queue.Queue()
+        self._cancel_event = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    def start(self):
+        self._path = database_path(self.main_conn)
+        if self._path is None:
+            self._conn = self.main_conn
+            self._run()
+            self.poll()
+            return self
+        threading.Thread(target=self._run_with_own_connection, daemon=True).start()
+        self.widget.after(POLL_INTERVAL_MS, self._poll_until_finished)
+        return self
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            conn = sqlite3.connect(self._path)
+            configure_connection(conn)
+            # SQLite gọi hàm này định kỳ trong lúc chạy câu lệnh; trả về True thì câu lệnh
+            # dừng với lỗi "interrupted" (không lỡ lệnh hủy đến trước khi câu lệnh bắt đầu)
+            conn.set_progress_handler(self._cancel_event.is_set, CANCEL_CHECK_STEPS)
+            self._conn = conn
+        return self._conn
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def check_cancelled(self):
+        if self._cancel_event.is_set():
+            raise TaskCancelled()
+
+    def report_progress(self, text):
+        self.check_cancelled()
+        self._messages.put(("progress", text))
+
+    def _run_with_own_connection(self):
+        try:
+            self._run()
+        finally:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _run(self):
+        _current.task = self
+        try:
+            result = self.work(self)
+        except TaskCancelled:
+            message = ("cancelled", None)
+        except sqlite3.OperationalError as e:
+            # Bị hủy giữa câu SQL -> "interrupted"
+            message = ("cancelled", None) if self.cancelled else ("error", e)
+        except Exception as e:
+            message = ("error", e)
+        else:
+            message = ("cancelled", None) if self.cancelled else ("done", result)
+        finally:
+            _current.task = None
+        self._messages.put(message)
+
+    def _poll_until_finished(self):
+        if not self.poll():
+            self.widget.after(POLL_INTERVAL_MS, self._poll_until_finished)
+
+    def poll(self):
+        """Xử lý các thông điệp đang chờ trên luồng chính; trả về True khi tác vụ đã kết thúc."""
+        while not self.finished:
+            try:
+                kind, payload = self._messages.get_nowait()
+            except queue.Empty:
+                return False
+            if kind == "progress":
+                if self.on_progress and not self.cancelled:
+                    self.on_progress(payload)
+                continue
+            self.finished = True
+            # Kết quả đến sau khi người dùng đã hủy thì bỏ đi
+            if kind == "done" and not self.cancelled:
+                self.on_done(payload)
+            elif kind == "error" and not self.cancelled:
+                if self.on_error:
+                    self.on_error(payload)
+            elif self.on_cancelled:
+                self.on_cancelled()
+        return True
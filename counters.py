@@ -0,0 +1,86 @@
+# =============================
+# Bộ đếm thống kê duy trì liên tục (bảng stats_* của migration 4)
+# =============================
+# Trigger trong CSDL cập nhật các bộ đếm mỗi khi thêm/sửa/xóa sách, bạn đọc, phiếu mượn
+# (mượn, trả, xóa phiếu), trong cùng giao dịch với thao tác đó. Báo cáo tổng số chỉ còn là
+# đọc MỘT dòng, không phải nạp lại toàn bộ sách/bạn đọc/phiếu mượn vào RAM.
+# reconcile_counters() tính lại mọi bộ đếm từ dữ liệu gốc, chỉ cần khi nghi ngờ bị lệch
+# (vd. file .db bị sửa bởi công cụ tắt trigger).
+
+TOTAL_COUNTERS = ("book_titles", "book_copies", "available_copies", "readers", "loans", "active_loans")
+
+_TOTALS_QUERY = f"SELECT {', '.join(TOTAL_COUNTERS)} FROM stats_totals WHERE id = 1"
+
+# Cùng các giá trị như stats_totals, nhưng tính trực tiếp từ bảng gốc
+_ACTUAL_TOTALS_QUERY = """
+    SELECT (SELECT COUNT(*) FROM books),
+           (SELECT COALESCE(SUM(quantity), 0) FROM books),
+           (SELECT COALESCE(SUM(available_quantity), 0) FROM books),
+           (SELECT COUNT(*) FROM readers),
+           (SELECT COUNT(*) FROM loans),
+           (SELECT COUNT(*) FROM loans WHERE status = 'Đang mượn')
+"""
+
+def read_totals(conn):
+    """Các bộ đếm tổng (tên trong TOTAL_COUNTERS -> giá trị): đọc một dòng, O(1)."""
+    row = conn.execute(_TOTALS_QUERY).fetchone()
+    return dict(zip(TOTAL_COUNTERS, row if row else (0,) * len(TOTAL_COUNTERS)))
+
+def count_totals(conn):
+    """Các giá trị như read_totals nhưng đếm lại trực tiếp trên bảng gốc (COUNT/SUM, không dùng bộ đếm)."""
+    return dict(zip(TOTAL_COUNTERS, conn.execute(_ACTUAL_TOTALS_QUERY).fetchone()))
+
+def count_overdue(conn, as_of_ts):
+    """
+    Số phiếu đang mượn có hạn trả < as_of_ts. "Quá hạn" phụ thuộc thời điểm hỏi nên không
+    lưu thành bộ đếm; đếm theo khoảng trên chỉ mục (status, due_date): O(log n + k).
+    """
+    return conn.execute("SELECT COUNT(*) FROM loans WHERE status = 'Đang mượn' AND due_date < ?",
+                        (as_of_ts,)).fetchone()[0]
+
+def loan_count_for_isbn(conn, isbn):
+    row = conn.execute("SELECT loan_count FROM stats_loans_by_isbn WHERE isbn = ?", (isbn,)).fetchone()
+    return row[0] if row else 0
+
+def loan_count_for_reader(conn, reader_id):
+    row = conn.execute("SELECT loan_count FROM stats_loans_by_reader WHERE reader_id = ?", (reader_id,)).fetchone()
+    return row[0] if row else 0
+
+def read_loans_version(conn):
+    """Phiên bản dữ liệu phiếu mượn (bảng loans_version của migration 5), tăng sau mỗi thay đổi."""
+    return conn.execute("SELECT version FROM loans_version WHERE id = 1").fetchone()[0]
+
+def loan_counts_by_isbn(conn):
+    """Danh sách (isbn, tên sách, số phiếu mượn) từ bộ đếm, không duyệt bảng loans."""
+    return conn.execute("""
+        SELECT s.isbn, COALESCE(b.title, 'N/A'), s.loan_count
+        FROM stats_loans_by_isbn s LEFT JOIN books b ON b.isbn = s.isbn
+        ORDER BY s.isbn
+    """).fetchall()
+
+def reconcile_counters(conn):
+    """
+    Tính lại toàn bộ bộ đếm từ bảng gốc trong một giao dịch (BEGIN IMMEDIATE: không quầy
+    nào ghi xen vào giữa lúc đếm và lúc ghi lại). Trả về dict các bộ đếm tổng bị lệch:
+    tên -> (giá trị đã lưu, giá trị đúng); dict rỗng nghĩa là bộ đếm vẫn khớp.
+    """
+    if conn.in_transaction:
+        conn.commit()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        stored = read_totals(conn)
+        actual = count_totals(conn)
+        conn.execute("DELETE FROM stats_totals")
+        conn.execute(f"INSERT INTO stats_totals (id, {', '.join(TOTAL_COUNTERS)}) VALUES (1, ?, ?, ?, ?, ?, ?)",
+                     tuple(actual[name] for name in TOTAL_COUNTERS))
+        conn.execute("DELETE FROM stats_loans_by_isbn")
+        conn.execute("""INSERT INTO stats_loans_by_isbn (isbn, loan_count)
+            SELECT isbn, COUNT(*) FROM loans WHERE isbn IS NOT NULL GROUP BY isbn""")
+        conn.execute("DELETE FROM stats_loans_by_reader")
+        conn.execute("""INSERT INTO stats_loans_by_reader (reader_id, loan_count)
+            SELECT reader_id, COUNT(*) FROM loans WHERE reader_id IS NOT NULL GROUP BY reader_id""")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return {name: (stored[name], actual[name]) for name in TOTAL_COUNTERS if stored[name] != actual[name]}
@@ -0,0 +1,325 @@
+import sys
+import zlib
+
+# =============================
+# Bảng băm tự cài dùng chung cho sách, bạn đọc, thống kê (chaining / địa chỉ mở)
+# =============================
+
+def stable_hash(key):
+    """
+    Hash 32-bit của khóa, tính bằng CRC32 (cài bằng C trong zlib).
+    Khác với hash() có sẵn của Python, kết quả không phụ thuộc PYTHONHASHSEED
+    nên giống nhau giữa các lần chạy (benchmark tái lập được).
+    """
+    if not isinstance(key, str):
+        key = str(key)
+    return zlib.crc32(key.encode("utf-8"))
+
+class HashNode:
+    def __init__(self, key, value, hash_value):
+        self.key = key
+        self.value = value
+        self.hash_value = hash_value  # Lưu sẵn để rehash/so sánh không phải tính lại
+        self.next = None
+
+class LinkedListForHash:
+    def __init__(self):
+        self.head = None
+
+    def insert(self, key, value, hash_value):
+        """Chèn hoặc cập nhật. Trả về True nếu tạo node mới."""
+        node = self.head
+        while node:
+            if node.hash_value == hash_value and node.key == key:
+                node.value = value
+                return False
+            node = node.next
+        new_node = HashNode(key, value, hash_value)
+        new_node.next = self.head
+        self.head = new_node
+        return True
+
+    def increment(self, key, amount, hash_value):
+        """Cộng amount vào giá trị của key (chưa có thì tạo node với giá trị amount). Trả về (giá trị mới, có tạo node mới)."""
+        node = self.head
+        while node:
+            if node.hash_value == hash_value and node.key == key:
+                node.value += amount
+                return node.value, False
+            node = node.next
+        new_node = HashNode(key, amount, hash_value)
+        new_node.next = self.head
+        self.head = new_node
+        return amount, True
+
+    def search(self, key, hash_value):
+        node = self.head
+        while node:
+            if node.hash_value == hash_value and node.key == key:
+                return node.value
+            node = node.next
+        return None
+
+    def delete(self, key, hash_value):
+        """Xóa node có khóa key. Trả về True nếu có node bị xóa."""
+        prev = None
+        node = self.head
+        while node:
+            if node.hash_value == hash_value and node.key == key:
+                if prev:
+                    prev.next = node.next
+                else:
+                    self.head = node.next
+                return True
+            prev = node
+            node = node.next
+        return False
+
+    def get_all_key_value_pairs(self):
+        result = []
+        node = self.head
+        while node:
+            result.append((node.key, node.value))
+            node = node.next
+        return result
+
+class HashTable:
+    def __init__(self, capacity=100, load_factor=0.75, min_load_factor=None):
+        # load_factor: khi size / capacity vượt ngưỡng này thì bảng tăng gấp đôi.
+        # min_load_factor: khi size / capacity nhỏ hơn ngưỡng này thì bảng thu nhỏ
+        # một nửa (None = không bao giờ thu nhỏ). Phải < load_factor / 2 để
+        # tránh việc tăng/giảm liên tục quanh cùng một ngưỡng.
+        if load_factor <= 0:
+            raise ValueError("load_factor phải lớn hơn 0")
+        if min_load_factor is not None and min_load_factor >= load_factor / 2:
+            raise ValueError("min_load_factor phải nhỏ hơn load_factor / 2")
+        self.initial_capacity = capacity
+        self.capacity = capacity
+        self.load_factor = load_factor
+        self.min_load_factor = min_load_factor
+        self.size = 0
+        self.table = [LinkedListForHash() for _ in range(capacity)]
+
+    def _hash_function(self, key):
+        return stable_hash(key) % self.capacity
+
+    def _resize(self, new_capacity):
+        # Rehash: chuyển nguyên các node sang bảng mới, không tạo node mới
+        # và dùng hash_value đã lưu trong node, không tính lại hash của khóa
+        old_table = self.table
+        self.capacity = new_capacity
+        self.table = [LinkedListForHash() for _ in range(new_capacity)]
+        for bucket in old_table:
+            node = bucket.head
+            while node:
+                next_node = node.next
+                target = self.table[node.hash_value % new_capacity]
+                node.next = target.head
+                target.head = node
+                node = next_node
+
+    def insert(self, key, value):
+        hash_value = stable_hash(key)
+        if self.table[hash_value % self.capacity].insert(key, value, hash_value):
+            self._grow_after_insert()
+
+    def _grow_after_insert(self):
+        self.size += 1
+        if self.size > self.capacity * self.load_factor:
+            self._resize(self.capacity * 2)
+
+    def increment(self, key, amount=1):
+        """
+        Bộ đếm: cộng amount vào giá trị của key (chưa có thì coi là 0) và trả về giá trị mới.
+        Chỉ băm và duyệt bucket một lần, thay cho cặp search + insert.
+        """
+        hash_value = stable_hash(key)
+        value, created = self.table[hash_value % self.capacity].increment(key, amount, hash_value)
+        if created:
+            self._grow_after_insert()
+        return value
+
+    def search(self, key):
+        hash_value = stable_hash(key)
+        return self.table[hash_value % self.capacity].search(key, hash_value)
+
+    def delete(self, key):
+        hash_value = stable_hash(key)
+        if not self.table[hash_value % self.capacity].delete(key, hash_value):
+            return
+        self.size -= 1
+        if (self.min_load_factor is not None and self.capacity > self.initial_capacity
+                and self.size < self.capacity * self.min_load_factor):
+            self._resize(max(self.initial_capacity, self.capacity // 2))
+
+    def clear(self):
+        self.capacity = self.initial_capacity
+        self.size = 0
+        self.table = [LinkedListForHash() for _ in range(self.capacity)]
+
+    def get_all_values(self):
+        result = []
+        for bucket in self.table:
+            result.extend([value for _, value in bucket.get_all_key_value_pairs()])
+        return result
+
+    def get_all_items(self):
+        result = []
+        for bucket in self.table:
+            result.extend(bucket.get_all_key_value_pairs())
+        return result
+
+# Đánh dấu ô trống / ô đã xóa (tombstone) trong bảng địa chỉ mở
+_EMPTY = object()
+_DELETED = object()
+
+class OpenAddressingHashTable:
+    """
+    Bảng băm địa chỉ mở (linear probing) trên ba mảng song song keys/values/hashes.
+    Không cần HashNode hay LinkedListForHash cho mỗi phần tử; xóa bằng tombstone.
+    API tương thích với HashTable: insert/search/delete/get_all_values/size.
+    """
+    def __init__(self, capacity=128, load_factor=0.6, min_load_factor=None):
+        if not 0 < load_factor < 1:
+            raise ValueError("load_factor phải nằm trong khoảng (0, 1)")
+        if min_load_factor is not None and min_load_factor >= load_factor / 2:
+            raise ValueError("min_load_factor phải nhỏ hơn load_factor / 2")
+        # Capacity luôn là lũy thừa của 2 để lấy chỉ số bằng phép AND
+        real_capacity = 8
+        while real_capacity < capacity:
+            real_capacity *= 2
+        self.initial_capacity = real_capacity
+        self.load_factor = load_factor
+        self.min_load_factor = min_load_factor
+        self._allocate(real_capacity)
+
+    def _allocate(self, capacity):
+        self.capacity = capacity
+        self.size = 0
+        self._used = 0  # Số ô không trống (phần tử thật + tombstone)
+        self._keys = [_EMPTY] * capacity
+        self._values = [None] * capacity
+        self._hashes = [0] * capacity
+
+    def _probe(self, key, hash_value):
+        """
+        Dò tuyến tính một lần duy nhất.
+        Trả về (index, found): index là ô chứa key nếu found, ngược lại là ô
+        nên dùng để chèn (ưu tiên tombstone đầu tiên gặp trên đường dò).
+        """
+        keys = self._keys
+        hashes = self._hashes
+        mask = self.capacity - 1
+        index = hash_value & mask
+        first_deleted = -1
+        while True:
+            current = keys[index]
+            if current is _EMPTY:
+                return (first_deleted if first_deleted >= 0 else index), False
+            if current is _DELETED:
+                if first_deleted < 0:
+                    first_deleted = index
+            elif hashes[index] == hash_value and current == key:
+                return index, True
+            index = (index + 1) & mask
+
+    def _resize(self, new_capacity):
+        old_keys, old_values, old_hashes = self._keys, self._values, self._hashes
+        self._allocate(new_capacity)
+        mask = new_capacity - 1
+        keys, values, hashes = self._keys, self._values, self._hashes
+        for i in range(len(old_keys)):
+            key = old_keys[i]
+            if key is _EMPTY or key is _DELETED:
+                continue
+            # Hash đã lưu sẵn, chỉ cần tìm ô trống đầu tiên
+            index = old_hashes[i] & mask
+            while keys[index] is not _EMPTY:
+                index = (index + 1) & mask
+            keys[index] = key
+            values[index] = old_values[i]
+            hashes[index] = old_hashes[i]
+            self.size += 1
+        self._used = self.size
+
+    def insert(self, key, value):
+        # stable_hash (CRC32) phân tán đều cả các khóa liên tiếp như
+        # ISBN0001, ISBN0002... nên dò tuyến tính không tạo thành cụm dài
+        hash_value = stable_hash(key)
+        index, found = self._probe(key, hash_value)
+        if found:
+            self._values[index] = value
+            return
+        self._insert_at(index, key, value, hash_value)
+
+    def increment(self, key, amount=1):
+        """Bộ đếm: cộng amount vào giá trị của key (chưa có thì coi là 0), một lần dò; trả về giá trị mới."""
+        hash_value = stable_hash(key)
+        index, found = self._probe(key, hash_value)
+        if found:
+            value = self._values[index] + amount
+            self._values[index] = value
+            return value
+        self._insert_at(index, key, amount, hash_value)
+        return amount
+
+    def _insert_at(self, index, key, value, hash_value):
+        """Đặt khóa mới vào ô index do _probe trả về, rồi tăng kích thước bảng nếu cần."""
+        if self._keys[index] is _EMPTY:
+            self._used += 1
+        self._keys[index] = key
+        self._values[index] = value
+        self._hashes[index] = hash_value
+        self.size += 1
+        if self._used > self.capacity * self.load_factor:
+            # Nhiều tombstone thì chỉ cần dọn dẹp, không cần tăng gấp đôi
+            if self.size > self.capacity * self.load_factor / 2:
+                self._resize(self.capacity * 2)
+            else:
+                self._resize(self.capacity)
+
+    def search(self, key):
+        index, found = self._probe(key, stable_hash(key))
+        return self._values[index] if found else None
+
+    def delete(self, key):
+        index, found = self._probe(key, stable_hash(key))
+        if not found:
+            return
+        self._keys[index] = _DELETED
+        self._values[index] = None
+        self.size -= 1
+        if (self.min_load_factor is not None and self.capacity > self.initial_capacity
+                and self.size < self.capacity * self.min_load_factor):
+            self._resize(max(self.initial_capacity, self.capacity // 2))
+
+    def clear(self):
+        self._allocate(self.initial_capacity)
+
+    def get_all_values(self):
+        keys = self._keys
+        return [self._values[i] for i in range(self.capacity)
+                if keys[i] is not _EMPTY and keys[i] is not _DELETED]
+
+    def get_all_items(self):
+        keys = self._keys
+        return [(keys[i], self._values[i]) for i in range(self.capacity)
+                if keys[i] is not _EMPTY and keys[i] is not _DELETED]
+
+# Các engine bảng băm có thể chọn cho tab sách / bạn đọc / thống kê
+HASH_TABLE_ENGINES = {
+    "chaining": HashTable,
+    "open_addressing": OpenAddressingHashTable,
+}
+
+def create_hash_table(engine="chaining", **kwargs):
+    if engine not in HASH_TABLE_ENGINES:
+        raise ValueError(f"Engine bảng băm không hợp lệ: {engine}")
+    return HASH_TABLE_ENGINES[engine](**kwargs)
+
+def intern_text(value):
+    """
+    sys.intern cho chuỗi: các chuỗi bằng nhau (thể loại, tên tác giả, tên sách, mã bạn đọc,
+    ISBN lặp lại trên mọi phiếu mượn) dùng chung một đối tượng thay vì mỗi dòng CSDL một bản sao.
+    """
+    return sys.intern(value) if type(value) is str else value
@@ -0,0 +1,243 @@
+import unicodedata
+from array import array
+from bisect import bisect_left
+
+from sorting import merge_sort_pairs
+
+# =============================
+# Chỉ mục đảo n-gram cho tìm kiếm chuỗi con (tìm sách theo ISBN / tiêu đề / tác giả)
+# =============================
+# Mỗi văn bản (đã chuẩn hóa) được cắt thành các n-gram (mặc định 3 ký tự liên tiếp).
+# posting list của một n-gram = các văn bản chứa nó. Chuỗi cần tìm chứa n-gram nào thì
+# kết quả phải nằm trong posting list của n-gram đó, nên chỉ cần giao vài posting list
+# ngắn nhất rồi kiểm tra lại bằng toán tử `in` trên số ít ứng viên còn lại,
+# thay vì duyệt toàn bộ catalog.
+
+# Bỏ dấu tiếng Việt: sau khi tách NFD ("ễ" -> "e" + dấu mũ + dấu ngã), xóa các dấu kết hợp
+# (U+0300..U+036F) bằng str.translate (chạy trong C); "đ"/"Đ" không tách được nên đổi riêng.
+_FOLD_TABLE = {code_point: None for code_point in range(0x300, 0x370)}
+_FOLD_TABLE[ord("đ")] = "d"
+_FOLD_TABLE[ord("Đ")] = "d"
+
+def normalize_search_text(text):
+    """Khóa tìm kiếm không dấu, chữ thường: "Nguyễn Văn Đức" -> "nguyen van duc"."""
+    if not isinstance(text, str):
+        text = "" if text is None else str(text)
+    return unicodedata.normalize("NFD", text).translate(_FOLD_TABLE).lower()
+
+class TrigramIndex:
+    """
+    Văn bản được đánh số thứ tự (ordinal) tăng dần theo lúc thêm; posting list là
+    array('i') các ordinal (4 byte/phần tử, luôn tăng dần).
+    Xóa/sửa là xóa lười: văn bản cũ bị đánh dấu None, ordinal cũ còn trong posting list
+    bị bỏ qua khi kiểm tra, và chỉ mục được dựng lại khi số văn bản đã xóa vượt số còn sống.
+    """
+    def __init__(self, n=3, normalize=str.lower):
+        if n < 1:
+            raise ValueError("n phải >= 1")
+        self.n = n
+        self.normalize = normalize
+        self.clear()
+
+    def clear(self):
+        self._postings = {}    # n-gram -> array('i') các ordinal
+        self._doc_ids = []     # ordinal -> doc_id (None nếu đã xóa)
+        self._texts = []       # ordinal -> văn bản đã chuẩn hóa (None nếu đã xóa)
+        self._ordinal_of = {}  # doc_id -> ordinal hiện tại
+        self._removed = 0
+
+    def __len__(self):
+        return len(self._ordinal_of)
+
+    def __contains__(self, doc_id):
+        return doc_id in self._ordinal_of
+
+    def _grams(self, text):
+        n = self.n
+        return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+    def add(self, doc_id, text):
+        """Thêm văn bản cho doc_id; nếu doc_id đã có thì thay văn bản cũ."""
+        self.add_normalized(doc_id, self.normalize(text) if text is not None else "")
+
+    update = add
+
+    def add_normalized(self, doc_id, key):
+        """Như add, nhưng key đã được chuẩn hóa sẵn (vd. khóa tìm kiếm tính trước trên Book/Reader)."""
+        if doc_id in self._ordinal_of:
+            self.remove(doc_id)
+        self._add_normalized(doc_id, key)
+
+    def _add_normalized(self, doc_id, text):
+        ordinal = len(self._doc_ids)
+        self._doc_ids.append(doc_id)
+        self._texts.append(text)
+        self._ordinal_of[doc_id] = ordinal
+        postings = self._postings
+        for gram in self._grams(text):
+            posting = postings.get(gram)
+            if posting is None:
+                posting = postings[gram] = array("i")
+            posting.append(ordinal)
+
+    def remove(self, doc_id):
+        ordinal = self._ordinal_of.pop(doc_id, None)
+        if ordinal is None:
+            return False
+        self._doc_ids[ordinal] = None
+        self._texts[ordinal] = None
+        self._removed += 1
+        if self._removed > len(self._ordinal_of) + 1024:
+            self._rebuild()
+        return True
+
+    def _rebuild(self):
+        live = [(doc_id, text) for doc_id, text in zip(self._doc_ids, self._texts) if text is not None]
+        self.clear()
+        for doc_id, text in live:
+            self._add_normalized(doc_id, text)
+
+    def search(self, query, max_candidates=64):
+        """
+        doc_id của các văn bản chứa query (sau chuẩn hóa), theo thứ tự thêm vào.
+        Query ngắn hơn n không có n-gram nào để tra: kiểm tra trực tiếp trên văn bản
+        đã chuẩn hóa sẵn (vẫn không phải chuẩn hóa lại cả catalog mỗi lần tìm).
+        """
+        query = self.normalize(query)
+        texts = self._texts
+        if len(query) < self.n:
+            ordinals = range(len(texts))
+        else:
+            postings = []
+            for gram in self._grams(query):
+                posting = self._postings.get(gram)
+                if posting is None:
+                    return []
+                postings.append(posting)
+            postings.sort(key=len)
+            # Giao từ posting list ngắn nhất; dừng sớm khi còn ít ứng viên hoặc posting
+            # list kế tiếp dài hơn nhiều (duyệt nó tốn hơn kiểm tra `in` trên ứng viên)
+            candidates = set(postings[0])
+            for posting in postings[1:]:
+                if len(candidates) <= max_candidates or len(posting) > 4 * len(candidates):
+                    break
+                candidates.intersection_update(posting)
+            ordinals = sorted(candidates)
+        doc_ids = self._doc_ids
+        return [doc_ids[i] for i in ordinals if texts[i] is not None and query in texts[i]]
+
+# =============================
+# Chỉ mục tiền tố cho gợi ý mã (ISBN, mã bạn đọc) khi nhập ở quầy mượn/trả
+# =============================
+
+class PrefixIndex:
+    """
+    Danh sách khóa đã sắp xếp + tìm kiếm nhị phân (bisect). Mọi khóa bắt đầu bằng cùng một
+    tiền tố nằm liền nhau trong danh sách, nên gợi ý = một lần bisect (O(|prefix| log n))
+    rồi đọc tiếp k phần tử. Thêm/xóa là list.insert/pop: O(n) nhưng chỉ là memmove trong C,
+    đủ nhanh cho thao tác của người dùng; nạp lại toàn bộ thì dùng reset().
+    """
+    def __init__(self, keys=()):
+        self.reset(keys)
+
+    def reset(self, keys=()):
+        self._keys = sorted(set(keys))
+
+    def clear(self):
+        self._keys = []
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, key):
+        keys = self._keys
+        i = bisect_left(keys, key)
+        return i < len(keys) and keys[i] == key
+
+    def add(self, key):
+        keys = self._keys
+        i = bisect_left(keys, key)
+        if i < len(keys) and keys[i] == key:
+            return False
+        keys.insert(i, key)
+        return True
+
+    def remove(self, key):
+        keys = self._keys
+        i = bisect_left(keys, key)
+        if i < len(keys) and keys[i] == key:
+            del keys[i]
+            return True
+        return False
+
+    def complete(self, prefix, limit=10):
+        """Tối đa limit khóa bắt đầu bằng prefix, theo thứ tự tăng dần."""
+        keys = self._keys
+        result = []
+        i = bisect_left(keys, prefix)
+        while i < len(keys) and len(result) < limit and keys[i].startswith(prefix):
+            result.append(keys[i])
+            i += 1
+        return result
+
+# =============================
+# Danh sách đã sắp xếp được duy trì liên tục (sắp xếp sách/bạn đọc theo tiêu chí)
+# =============================
+
+class SortedView:
+    """
+    Giữ các bản ghi luôn theo thứ tự (khóa sắp xếp, mã bản ghi). Khóa sắp xếp được tính
+    MỘT lần khi bản ghi được thêm/sửa (decorate) và lưu cùng bản ghi, nên bấm "Sắp xếp"
+    chỉ còn là đọc danh sách ra, không phải sắp xếp lại.
+    - key_func(record): khóa sắp xếp; id_func(record): mã duy nhất (ISBN, mã bạn đọc),
+      dùng phá hòa khi khóa bằng nhau và để tìm lại bản ghi khi sửa/xóa.
+    - sort_pairs(pairs): sắp xếp ổn định danh sách (khóa, bản ghi) theo khóa, dùng khi
+      nạp lại toàn bộ (mặc định merge sort bottom-up của sorting.py).
+    Thêm/xóa: bisect O(log n) + list.insert/pop O(n) (memmove trong C).
+    """
+    def __init__(self, key_func, id_func, sort_pairs=None):
+        self.key_func = key_func
+        self.id_func = id_func
+        self.sort_pairs = sort_pairs or merge_sort_pairs
+        self.clear()
+
+    def clear(self):
+        self._keys = []      # (khóa sắp xếp, mã bản ghi), tăng dần
+        self._records = []   # bản ghi tương ứng với từng phần tử của _keys
+        self._key_of = {}    # mã bản ghi -> (khóa sắp xếp, mã bản ghi) hiện tại
+
+    def __len__(self):
+        return len(self._records)
+
+    def reset(self, records):
+        """Nạp lại toàn bộ: decorate một lần rồi sắp xếp một lần."""
+        key_func, id_func = self.key_func, self.id_func
+        pairs = self.sort_pairs([((key_func(record), id_func(record)), record) for record in records])
+        self._keys = [key for key, _ in pairs]
+        self._records = [record for _, record in pairs]
+        self._key_of = {key[1]: key for key in self._keys}
+
+    def add(self, record):
+        """Thêm bản ghi; nếu mã đã có (bản ghi vừa được sửa) thì chuyển về đúng vị trí mới."""
+        record_id = self.id_func(record)
+        if record_id in self._key_of:
+            self.remove(record_id)
+        key = (self.key_func(record), record_id)
+        i = bisect_left(self._keys, key)
+        self._keys.insert(i, key)
+        self._records.insert(i, record)
+        self._key_of[record_id] = key
+
+    update = add
+
+    def remove(self, record_id):
+        key = self._key_of.pop(record_id, None)
+        if key is None:
+            return False
+        i = bisect_left(self._keys, key)
+        del self._keys[i]
+        del self._records[i]
+        return True
+
+    def values(self, reverse=False):
+        return self._records[::-1] if reverse else list(self._records)
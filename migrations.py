@@ -0,0 +1,337 @@
+import logging
+import sqlite3
+
+logger = logging.getLogger(__name__)
+
+# =============================
+# Quản lý phiên bản lược đồ CSDL (schema migrations)
+# =============================
+# Phiên bản hiện tại của file .db được lưu trong PRAGMA user_version (số nguyên nằm sẵn
+# trong header file SQLite, mặc định 0). Mỗi migration nâng lược đồ lên đúng một phiên bản
+# và chạy trong một giao dịch riêng: lỗi giữa chừng thì rollback, user_version giữ nguyên.
+# Migration chép lại cả bảng lớn (migration 3) tự commit theo từng lô và chạy tiếp được
+# nếu bị ngắt; chỉ bước cuối mới nằm chung giao dịch với user_version.
+# Muốn đổi lược đồ: viết thêm một hàm _migration_N và thêm vào MIGRATIONS, KHÔNG sửa
+# các migration cũ (file .db của người dùng có thể đã chạy chúng).
+
+def _migration_1_create_tables(conn):
+    """Lược đồ gốc (trước đây tạo trực tiếp trong Home.py.py)."""
+    conn.execute('''CREATE TABLE IF NOT EXISTS books (
+        isbn TEXT PRIMARY KEY,
+        title TEXT,
+        genre TEXT,
+        author TEXT,
+        year INTEGER,
+        quantity INTEGER,
+        available_quantity INTEGER
+    )''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS readers (
+        reader_id TEXT PRIMARY KEY,
+        name TEXT,
+        birth_date TEXT,
+        address TEXT
+    )''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS loans (
+        loan_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        reader_id TEXT,
+        isbn TEXT,
+        borrow_date TEXT,
+        due_date TEXT,
+        return_date TEXT,
+        status TEXT
+    )''')
+
+def _migration_2_add_loan_indexes(conn):
+    """
+    Chỉ mục phụ trên loans: WHERE reader_id = ? / WHERE isbn = ? (lịch sử mượn, kiểm tra
+    trước khi xóa sách/bạn đọc) và WHERE status = ? AND due_date < ? (sách quá hạn)
+    không còn phải quét toàn bảng.
+    """
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_loans_reader_id ON loans(reader_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_loans_isbn ON loans(isbn)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_loans_status_due_date ON loans(status, due_date)")
+    conn.execute("ANALYZE")
+
+LOAN_DATE_BATCH_SIZE = 50000
+
+def _timestamp_sql(column):
+    # Chuỗi "%Y-%m-%d %H:%M:%S.%f" -> số giây kể từ 1970-01-01 (giờ như ghi trên lịch, xem
+    # to_timestamp trong ui_loans.py); giá trị đã là số nguyên thì giữ nguyên
+    return (f"CASE WHEN {column} IS NULL OR {column} = 'None' THEN NULL "
+            f"WHEN typeof({column}) = 'integer' THEN {column} "
+            f"ELSE CAST(strftime('%s', {column}) AS INTEGER) END")
+
+def _unreadable_date_sql(column, required):
+    # Ngày không chuyển được sang số: chuỗi strftime không đọc được (hoặc thiếu, nếu bắt buộc)
+    if required:
+        return f"({_timestamp_sql(column)} IS NULL)"
+    return f"({_timestamp_sql(column)} IS NULL AND {column} IS NOT NULL AND {column} != 'None')"
+
+def _commit_batch(conn):
+    """Trong một migration dài: commit phần đã làm và mở giao dịch ghi mới (xem migrate)."""
+    conn.commit()
+    conn.execute("BEGIN IMMEDIATE")
+
+def _migration_3_integer_loan_dates(conn, batch_size=None):
+    """
+    Ngày mượn / hạn trả / ngày trả chuyển từ chuỗi sang INTEGER (timestamp). SQLite không
+    đổi kiểu cột tại chỗ được nên dựng bảng loans_new, chép theo từng lô loan_id rồi đổi tên.
+    Mỗi lô được commit riêng: WAL/journal và thời gian giữ khóa ghi chỉ lớn cỡ một lô chứ
+    không cỡ cả bảng. Bị tắt giữa chừng thì lần mở sau chép tiếp từ loan_id lớn nhất đã
+    chép; bảng loans cũ còn nguyên cho tới bước đổi tên cuối cùng, chạy trong cùng giao
+    dịch với PRAGMA user_version. (Trong lúc dở dang, chương trình bản cũ ở quầy khác
+    không được sửa các phiếu đã chép.)
+    Phiếu có ngày không đọc được không chặn việc mở CSDL: được chuyển nguyên dạng chuỗi
+    sang bảng loans_unreadable_dates (để sửa tay) và ghi cảnh báo vào log.
+    """
+    batch_size = batch_size or LOAN_DATE_BATCH_SIZE
+    conn.execute('''CREATE TABLE IF NOT EXISTS loans_new (
+        loan_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        reader_id TEXT,
+        isbn TEXT,
+        borrow_date INTEGER,
+        due_date INTEGER,
+        return_date INTEGER,
+        status TEXT
+    )''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS loans_unreadable_dates (
+        loan_id INTEGER PRIMARY KEY,
+        reader_id TEXT,
+        isbn TEXT,
+        borrow_date TEXT,
+        due_date TEXT,
+        return_date TEXT,
+        status TEXT
+    )''')
+    unreadable = " OR ".join((_unreadable_date_sql("borrow_date", True), _unreadable_date_sql("due_date", True),
+                              _unreadable_date_sql("return_date", False)))
+    copy_batch = f"""
+        INSERT INTO loans_new (loan_id, reader_id, isbn, borrow_date, due_date, return_date, status)
+        SELECT loan_id, reader_id, isbn, {_timestamp_sql("borrow_date")}, {_timestamp_sql("due_date")},
+               {_timestamp_sql("return_date")}, status
+        FROM loans WHERE loan_id > :lo AND loan_id <= :hi AND NOT ({unreadable})
+    """
+    set_aside_batch = f"""
+        INSERT INTO loans_unreadable_dates (loan_id, reader_id, isbn, borrow_date, due_date, return_date, status)
+        SELECT loan_id, reader_id, isbn, borrow_date, due_date, return_date, status
+        FROM loans WHERE loan_id > :lo AND loan_id <= :hi AND ({unreadable})
+    """
+    while True:
+        if get_schema_version(conn) >= 3:
+            return # Một quầy khác vừa chạy xong migration này
+        # Lô trước đã commit cả hai bảng cùng lúc: chép tiếp ngay sau loan_id lớn nhất đã xử lý
+        lo = conn.execute("""SELECT MAX(COALESCE((SELECT MAX(loan_id) FROM loans_new), -1),
+                                        COALESCE((SELECT MAX(loan_id) FROM loans_unreadable_dates), -1))""").fetchone()[0]
+        hi = conn.execute("SELECT MAX(loan_id) FROM (SELECT loan_id FROM loans WHERE loan_id > ? ORDER BY loan_id LIMIT ?)",
+                          (lo, batch_size)).fetchone()[0]
+        if hi is None:
+            break
+        conn.execute(copy_batch, {"lo": lo, "hi": hi})
+        conn.execute(set_aside_batch, {"lo": lo, "hi": hi})
+        _commit_batch(conn)
+
+    bad_rows = conn.execute("SELECT COUNT(*) FROM loans_unreadable_dates").fetchone()[0]
+    if bad_rows:
+        logger.warning("Migration 3: %d phiếu mượn có ngày không đọc được, đã chuyển sang bảng "
+                       "loans_unreadable_dates để sửa tay.", bad_rows)
+
+    # Giữ bộ đếm AUTOINCREMENT cũ để không cấp lại loan_id của các phiếu đã xóa
+    sequence = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM sqlite_sequence WHERE name IN ('loans', 'loans_new')").fetchone()[0]
+    conn.execute("DROP TABLE loans") # Các chỉ mục của migration 2 bị xóa theo bảng
+    conn.execute("ALTER TABLE loans_new RENAME TO loans")
+    conn.execute("DELETE FROM sqlite_sequence WHERE name = 'loans'")
+    if sequence:
+        conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('loans', ?)", (sequence,))
+    _migration_2_add_loan_indexes(conn)
+
+def _migration_4_statistics_counters(conn):
+    """
+    Bộ đếm thống kê được duy trì ngay trong CSDL (xem counters.py):
+    - stats_totals: MỘT dòng gồm số đầu sách, số cuốn, số cuốn còn trong kho, số bạn đọc,
+      số phiếu mượn, số phiếu đang mượn;
+    - stats_loans_by_isbn / stats_loans_by_reader: số phiếu mượn theo ISBN / mã bạn đọc.
+    Trigger trên books/readers/loans cập nhật các bảng này trong CÙNG giao dịch với câu lệnh
+    ghi, từ bất kỳ kết nối nào (mọi tab, mọi quầy), nên không thể lệch khi rollback.
+    Phiếu không có ISBN / mã bạn đọc (NULL) không được đếm theo ISBN / bạn đọc.
+    """
+    conn.execute('''CREATE TABLE IF NOT EXISTS stats_totals (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        book_titles INTEGER NOT NULL DEFAULT 0,
+        book_copies INTEGER NOT NULL DEFAULT 0,
+        available_copies INTEGER NOT NULL DEFAULT 0,
+        readers INTEGER NOT NULL DEFAULT 0,
+        loans INTEGER NOT NULL DEFAULT 0,
+        active_loans INTEGER NOT NULL DEFAULT 0
+    )''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS stats_loans_by_isbn (
+        isbn TEXT PRIMARY KEY,
+        loan_count INTEGER NOT NULL
+    ) WITHOUT ROWID''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS stats_loans_by_reader (
+        reader_id TEXT PRIMARY KEY,
+        loan_count INTEGER NOT NULL
+    ) WITHOUT ROWID''')
+
+    # Số liệu ban đầu từ dữ liệu hiện có
+    conn.execute("DELETE FROM stats_totals")
+    conn.execute('''INSERT INTO stats_totals (id, book_titles, book_copies, available_copies, readers, loans, active_loans)
+        SELECT 1,
+               (SELECT COUNT(*) FROM books),
+               (SELECT COALESCE(SUM(quantity), 0) FROM books),
+               (SELECT COALESCE(SUM(available_quantity), 0) FROM books),
+               (SELECT COUNT(*) FROM readers),
+               (SELECT COUNT(*) FROM loans),
+               (SELECT COUNT(*) FROM loans WHERE status = 'Đang mượn')''')
+    conn.execute("DELETE FROM stats_loans_by_isbn")
+    conn.execute('''INSERT INTO stats_loans_by_isbn (isbn, loan_count)
+        SELECT isbn, COUNT(*) FROM loans WHERE isbn IS NOT NULL GROUP BY isbn''')
+    conn.execute("DELETE FROM stats_loans_by_reader")
+    conn.execute('''INSERT INTO stats_loans_by_reader (reader_id, loan_count)
+        SELECT reader_id, COUNT(*) FROM loans WHERE reader_id IS NOT NULL GROUP BY reader_id''')
+
+    conn.execute('''CREATE TRIGGER IF NOT EXISTS stats_books_insert AFTER INSERT ON books BEGIN
+        UPDATE stats_totals SET book_titles = book_titles + 1,
+            book_copies = book_copies + COALESCE(NEW.quantity, 0),
+            available_copies = available_copies + COALESCE(NEW.available_quantity, 0);
+    END''')
+    conn.execute('''CREATE TRIGGER IF NOT EXISTS stats_books_update AFTER UPDATE OF quantity, available_quantity ON books BEGIN
+        UPDATE stats_totals SET
+            book_copies = book_copies + COALESCE(NEW.quantity, 0) - COALESCE(OLD.quantity, 0),
+            available_copies = available_copies + COALESCE(NEW.available_quantity, 0) - COALESCE(OLD.available_quantity, 0);
+    END''')
+    conn.execute('''CREATE TRIGGER IF NOT EXISTS stats_books_delete AFTER DELETE ON books BEGIN
+        UPDATE stats_totals SET book_titles = book_titles - 1,
+            book_copies = book_copies - COALESCE(OLD.quantity, 0),
+            available_copies = available_copies - COALESCE(OLD.available_quantity, 0);
+    END''')
+    conn.execute('''CREATE TRIGGER IF NOT EXISTS stats_readers_insert AFTER INSERT ON readers BEGIN
+        UPDATE stats_totals SET readers = readers + 1;
+    END''')
+    conn.execute('''CREATE TRIGGER IF NOT EXISTS stats_readers_delete AFTER DELETE ON readers BEGIN
+        UPDATE stats_totals SET readers = readers - 1;
+    END''')
+
+    conn.execute('''CREATE TRIGGER IF NOT EXISTS stats_loans_insert AFTER INSERT ON loans BEGIN
+        UPDATE stats_totals SET loans = loans + 1, active_loans = active_loans + (NEW.status = 'Đang mượn');
+        INSERT INTO stats_loans_by_isbn (isbn, loan_count) SELECT NEW.isbn, 1 WHERE NEW.isbn IS NOT NULL
+            ON CONFLICT (isbn) DO UPDATE SET loan_count = loan_count + 1;
+        INSERT INTO stats_loans_by_reader (reader_id, loan_count) SELECT NEW.reader_id, 1 WHERE NEW.reader_id IS NOT NULL
+            ON CONFLICT (reader_id) DO UPDATE SET loan_count = loan_count + 1;
+    END''')
+    conn.execute('''CREATE TRIGGER IF NOT EXISTS stats_loans_delete AFTER DELETE ON loans BEGIN
+        UPDATE stats_totals SET loans = loans - 1, active_loans = active_loans - (OLD.status = 'Đang mượn');
+        UPDATE stats_loans_by_isbn SET loan_count = loan_count - 1 WHERE isbn = OLD.isbn;
+        DELETE FROM stats_loans_by_isbn WHERE isbn = OLD.isbn AND loan_count <= 0;
+        UPDATE stats_loans_by_reader SET loan_count = loan_count - 1 WHERE reader_id = OLD.reader_id;
+        DELETE FROM stats_loans_by_reader WHERE reader_id = OLD.reader_id AND loan_count <= 0;
+    END''')
+    conn.execute('''CREATE TRIGGER IF NOT EXISTS stats_loans_update_status AFTER UPDATE OF status ON loans BEGIN
+        UPDATE stats_totals SET active_loans = active_loans + (NEW.status = 'Đang mượn') - (OLD.status = 'Đang mượn');
+    END''')
+    # Ứng dụng không đổi ISBN / mã bạn đọc của phiếu, nhưng sửa tay trong DB Browser vẫn phải đúng
+    conn.execute('''CREATE TRIGGER IF NOT EXISTS stats_loans_update_keys AFTER UPDATE OF isbn, reader_id ON loans
+        WHEN NEW.isbn IS NOT OLD.isbn OR NEW.reader_id IS NOT OLD.reader_id BEGIN
+        UPDATE stats_loans_by_isbn SET loan_count = loan_count - 1 WHERE isbn = OLD.isbn;
+        DELETE FROM stats_loans_by_isbn WHERE isbn = OLD.isbn AND loan_count <= 0;
+        INSERT INTO stats_loans_by_isbn (isbn, loan_count) SELECT NEW.isbn, 1 WHERE NEW.isbn IS NOT NULL
+            ON CONFLICT (isbn) DO UPDATE SET loan_count = loan_count + 1;
+        UPDATE stats_loans_by_reader SET loan_count = loan_count - 1 WHERE reader_id = OLD.reader_id;
+        DELETE FROM stats_loans_by_reader WHERE reader_id = OLD.reader_id AND loan_count <= 0;
+        INSERT INTO stats_loans_by_reader (reader_id, loan_count) SELECT NEW.reader_id, 1 WHERE NEW.reader_id IS NOT NULL
+            ON CONFLICT (reader_id) DO UPDATE SET loan_count = loan_count + 1;
+    END''')
+
+def _migration_5_loans_version(conn):
+    """
+    loans_version: MỘT số tăng mỗi khi dữ liệu mà cây phiếu mượn của LoanManager hiển thị
+    thay đổi (thêm/sửa/xóa phiếu; đổi tên hoặc xóa sách/bạn đọc, vì phiếu mang theo tên sách
+    và tên bạn đọc). Trigger chạy trên mọi kết nối, nên LoanManager chỉ cần so số này để biết
+    có phải nạp lại hay không; sửa số lượng hay năm xuất bản của sách không làm nạp lại phiếu.
+    """
+    conn.execute('''CREATE TABLE IF NOT EXISTS loans_version (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        version INTEGER NOT NULL
+    )''')
+    conn.execute("INSERT OR IGNORE INTO loans_version (id, version) VALUES (1, 0)")
+    bump = "UPDATE loans_version SET version = version + 1;"
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS loans_version_insert AFTER INSERT ON loans BEGIN {bump} END")
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS loans_version_update AFTER UPDATE ON loans BEGIN {bump} END")
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS loans_version_delete AFTER DELETE ON loans BEGIN {bump} END")
+    conn.execute(f'''CREATE TRIGGER IF NOT EXISTS loans_version_book_title AFTER UPDATE OF isbn, title ON books
+        WHEN NEW.isbn IS NOT OLD.isbn OR NEW.title IS NOT OLD.title BEGIN {bump} END''')
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS loans_version_book_delete AFTER DELETE ON books BEGIN {bump} END")
+    conn.execute(f'''CREATE TRIGGER IF NOT EXISTS loans_version_reader_name AFTER UPDATE OF reader_id, name ON readers
+        WHEN NEW.reader_id IS NOT OLD.reader_id OR NEW.name IS NOT OLD.name BEGIN {bump} END''')
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS loans_version_reader_delete AFTER DELETE ON readers BEGIN {bump} END")
+
+# (phiên bản đạt được sau khi chạy, hàm migration), theo thứ tự tăng dần
+MIGRATIONS = [
+    (1, _migration_1_create_tables),
+    (2, _migration_2_add_loan_indexes),
+    (3, _migration_3_integer_loan_dates),
+    (4, _migration_4_statistics_counters),
+    (5, _migration_5_loans_version),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+def get_schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def migrate(conn, target_version=SCHEMA_VERSION):
+    """
+    Chạy lần lượt các migration còn thiếu cho tới target_version và trả về phiên bản
+    sau khi chạy. Gọi nhiều lần không sao: CSDL đã ở phiên bản mới thì không làm gì.
+    """
+    current_version = get_schema_version(conn)
+    if current_version > SCHEMA_VERSION:
+        raise ValueError(f"CSDL có phiên bản lược đồ {current_version}, mới hơn chương trình "
+                         f"(phiên bản {SCHEMA_VERSION}). Hãy cập nhật chương trình.")
+    if conn.in_transaction:
+        conn.commit()
+    for version, migration in MIGRATIONS:
+        if version <= current_version or version > target_version:
+            continue
+        # DDL không tự mở giao dịch trong sqlite3 nên BEGIN thủ công;
+        # PRAGMA user_version cũng nằm trong giao dịch nên đổi cùng lúc với lược đồ.
+        # IMMEDIATE: giữ khóa ghi ngay, rồi đọc lại phiên bản phòng khi quầy khác vừa nâng xong
+        conn.execute("BEGIN IMMEDIATE")
+        if get_schema_version(conn) >= version:
+            conn.commit()
+            current_version = version
+            continue
+        try:
+            migration(conn)
+            # Migration tự commit theo lô có thể thấy quầy khác đã nâng xong: không hạ phiên bản
+            if get_schema_version(conn) < version:
+                conn.execute(f"PRAGMA user_version = {int(version)}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        current_version = version
+    return current_version
+
+def configure_connection(conn, cache_size_kib=65536, mmap_size=268435456):
+    """
+    Các PRAGMA cho kết nối của ứng dụng:
+    - journal_mode=WAL: người đọc không chặn người ghi (tab thống kê đọc trong khi quầy
+      khác ghi), commit chỉ ghi nối tiếp vào file -wal. Lưu vĩnh viễn trong file .db.
+    - synchronous=NORMAL: ở chế độ WAL vẫn an toàn khi ứng dụng bị tắt ngang,
+      chỉ fsync lúc checkpoint thay vì mỗi lần commit.
+    - cache_size (âm = KiB) và mmap_size (byte): giữ nhiều trang hơn trong RAM,
+      đọc trực tiếp từ bộ nhớ ánh xạ thay vì gọi read().
+    - temp_store=MEMORY: bảng tạm cho ORDER BY/GROUP BY lớn nằm trong RAM.
+    Với CSDL ":memory:" journal_mode vẫn là "memory", các PRAGMA khác vẫn áp dụng.
+    """
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA cache_size=-{int(cache_size_kib)}")
+    conn.execute(f"PRAGMA mmap_size={int(mmap_size)}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+
+def open_database(path):
+    """Mở kết nối, đặt PRAGMA và đưa lược đồ lên phiên bản mới nhất."""
+    conn = sqlite3.connect(path)
+    configure_connection(conn)
+    migrate(conn)
+    return conn
@@ -0,0 +1,163 @@
+import heapq
+from operator import itemgetter
+
+# =============================
+# Merge Sort tự cài dùng chung (sách, bạn đọc, thống kê, SortedView)
+# =============================
+# Bottom-up (không đệ quy, không cắt lát arr[:mid]): ghép các đoạn đã sắp xếp cạnh nhau
+# thành đoạn dài gấp đôi, qua lại giữa danh sách hiện tại và MỘT bộ đệm cấp phát một lần.
+# Khóa được tính một lần cho mỗi phần tử và di chuyển song song với phần tử.
+# Ổn định ở cả hai chiều: khi hai khóa bằng nhau luôn lấy phần tử của đoạn bên trái.
+
+def _find_runs(keys, items, descending):
+    """
+    Chế độ natural (kiểu Timsort): ranh giới các đoạn vốn đã có thứ tự trong dữ liệu.
+    Đoạn ngược chiều NGHIÊM NGẶT được đảo lại tại chỗ (không có khóa bằng nhau nên vẫn ổn định).
+    """
+    n = len(keys)
+    bounds = [0]
+    start = 0
+    while start < n:
+        end = start + 1
+        if end < n:
+            in_order = (keys[end] <= keys[start]) if descending else (keys[start] <= keys[end])
+            if in_order:
+                while end < n and ((keys[end] <= keys[end - 1]) if descending else (keys[end - 1] <= keys[end])):
+                    end += 1
+            else:
+                while end < n and ((keys[end - 1] < keys[end]) if descending else (keys[end] < keys[end - 1])):
+                    end += 1
+                keys[start:end] = keys[start:end][::-1]
+                items[start:end] = items[start:end][::-1]
+        bounds.append(end)
+        start = end
+    return bounds
+
+def _merge(src_keys, src_items, dst_keys, dst_items, lo, mid, hi, descending):
+    """Ghép src[lo:mid] và src[mid:hi] (đều đã sắp xếp) vào dst[lo:hi]."""
+    # Hai đoạn đã nối tiếp đúng thứ tự: chép nguyên khối
+    last_left, first_right = src_keys[mid - 1], src_keys[mid]
+    if (first_right <= last_left) if descending else (last_left <= first_right):
+        dst_keys[lo:hi] = src_keys[lo:hi]
+        dst_items[lo:hi] = src_items[lo:hi]
+        return
+    i, j, k = lo, mid, lo
+    if descending:
+        while i < mid and j < hi:
+            if src_keys[i] < src_keys[j]:
+                dst_keys[k] = src_keys[j]
+                dst_items[k] = src_items[j]
+                j += 1
+            else:
+                dst_keys[k] = src_keys[i]
+                dst_items[k] = src_items[i]
+                i += 1
+            k += 1
+    else:
+        while i < mid and j < hi:
+            if src_keys[j] < src_keys[i]:
+                dst_keys[k] = src_keys[j]
+                dst_items[k] = src_items[j]
+                j += 1
+            else:
+                dst_keys[k] = src_keys[i]
+                dst_items[k] = src_items[i]
+                i += 1
+            k += 1
+    # Phần còn lại của một trong hai đoạn: chép bằng gán lát cắt (chạy trong C)
+    if i < mid:
+        dst_keys[k:hi] = src_keys[i:mid]
+        dst_items[k:hi] = src_items[i:mid]
+    else:
+        dst_keys[k:hi] = src_keys[j:hi]
+        dst_items[k:hi] = src_items[j:hi]
+
+def merge_sort(items, key=None, reverse=False, natural=False):
+    """
+    Trả về danh sách mới đã sắp xếp (không sửa items).
+    key: hàm khóa, gọi đúng một lần cho mỗi phần tử; reverse: giảm dần (vẫn ổn định);
+    natural: bắt đầu từ các đoạn đã có thứ tự sẵn thay vì từ từng phần tử, dữ liệu
+    gần như đã sắp xếp chỉ tốn O(n) đến O(n log r) với r đoạn.
+    """
+    items = list(items)
+    n = len(items)
+    if n <= 1:
+        return items
+    keys = [key(item) for item in items] if key is not None else list(items)
+    bounds = _find_runs(keys, items, reverse) if natural else list(range(n + 1))
+    buffer_keys = [None] * n
+    buffer_items = [None] * n
+    while len(bounds) > 2:
+        merged_bounds = [0]
+        for b in range(0, len(bounds) - 2, 2):
+            lo, mid, hi = bounds[b], bounds[b + 1], bounds[b + 2]
+            _merge(keys, items, buffer_keys, buffer_items, lo, mid, hi, reverse)
+            merged_bounds.append(hi)
+        if len(bounds) % 2 == 0: # Số đoạn lẻ: đoạn cuối không có cặp, chép sang nguyên vẹn
+            lo = bounds[-2]
+            buffer_keys[lo:] = keys[lo:]
+            buffer_items[lo:] = items[lo:]
+            merged_bounds.append(n)
+        # Đổi vai trò danh sách hiện tại và bộ đệm thay vì cấp phát mới
+        keys, buffer_keys = buffer_keys, keys
+        items, buffer_items = buffer_items, items
+        bounds = merged_bounds
+    return items
+
+def merge_sort_multi(items, sort_keys, natural=False):
+    """
+    Sắp xếp theo nhiều khóa, mỗi khóa một chiều riêng: sort_keys = [(hàm khóa, giảm dần?), ...]
+    theo thứ tự ưu tiên, vd. [(lambda p: p[1], True), (lambda p: p[0], False)] = số lượt
+    giảm dần, hòa thì theo mã tăng dần. Vì merge_sort ổn định nên chỉ cần sắp xếp lần
+    lượt từ khóa ít ưu tiên nhất đến khóa ưu tiên nhất.
+    """
+    result = list(items)
+    for key, descending in reversed(sort_keys):
+        result = merge_sort(result, key=key, reverse=descending, natural=natural)
+    return result
+
+def merge_sort_pairs(pairs, reverse=False):
+    """Sắp xếp các cặp (khóa, phần tử) theo khóa đã tính sẵn (dùng cho SortedView)."""
+    return merge_sort(pairs, key=itemgetter(0), reverse=reverse)
+
+# =============================
+# Chọn N phần tử đứng đầu (báo cáo Top Sách / Top Bạn Đọc)
+# =============================
+
+class _Descending:
+    """Bọc khóa để đảo chiều so sánh: chọn N phần tử NHỎ nhất bằng cùng một heap."""
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __lt__(self, other):
+        return other.value < self.value
+
+    def __le__(self, other):
+        return other.value <= self.value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+def top_n(items, n, key=None, reverse=True):
+    """
+    N phần tử đứng đầu theo key mà không sắp xếp toàn bộ: heap nhỏ nhất giữ tối đa N phần tử,
+    gốc là phần tử "kém" nhất đang giữ; mỗi phần tử mới chỉ so với gốc và chỉ vào heap khi
+    hơn gốc -> O(m log N) thay vì O(m log m), bộ nhớ O(N).
+    reverse=True: N phần tử lớn nhất, giảm dần (= merge_sort(items, key, reverse=True)[:n]);
+    reverse=False: N phần tử nhỏ nhất, tăng dần. Ổn định: hòa khóa thì phần tử gặp trước
+    được giữ và đứng trước.
+    """
+    if n <= 0:
+        return []
+    heap = []  # (khóa, -thứ tự gặp, phần tử): thứ tự gặp là duy nhất nên không bao giờ so sánh phần tử
+    for index, item in enumerate(items):
+        item_key = key(item) if key is not None else item
+        if not reverse:
+            item_key = _Descending(item_key)
+        if len(heap) < n:
+            heapq.heappush(heap, (item_key, -index, item))
+        elif heap[0][0] < item_key:
+            heapq.heapreplace(heap, (item_key, -index, item))
+    return [item for _, _, item in merge_sort(heap, key=itemgetter(0, 1), reverse=True)]
@@ -1,72 +1,1021 @@
-import time
-import tracemalloc
-from datetime import datetime, timedelta
-
-from ui_books import HashTable as BookHashTable, Book
-from ui_readers import HashTable as ReaderHashTable, Reader
-from ui_loans import LoanRecord, LoanBST
-from ui_statistics import self_implemented_merge_sort, self_implemented_count_frequencies
-
-sample_sizes = [50, 100, 1000, 10000]
-
-def measure_performance(description, func, *args, **kwargs):
-    tracemalloc.start()
-    start_time = time.perf_counter()
-    func(*args, **kwargs)
-    end_time = time.perf_counter()
-    current, peak = tracemalloc.get_traced_memory()
-    tracemalloc.stop()
-    print(f"{description:<60} | Time: {end_time - start_time:.6f} s | Peak Mem: {peak / 1024:.2f} KB")
-
-def generate_books(n):
-    return [Book(f"ISBN{i:05}", f"Title{i}", "Genre", f"Author{i}", 2000+i%20, i%10+1) for i in range(n)]
-
-def generate_readers(n):
-    return [Reader(f"RD{i:05}", f"Name{i}", "2000-01-01", f"Address{i}") for i in range(n)]
-
-def generate_loans(n):
-    today = datetime.now()
-    return [
-        LoanRecord(i, f"RD{i%100:05}", f"ISBN{i%100:05}", today - timedelta(days=i%30), today + timedelta(days=14))
-        for i in range(n)
-    ]
-
-if __name__ == "__main__":
-    for size in sample_sizes:
-        print(f"\n--- Benchmark for size: {size} ---")
-
-        # BOOK HASH TABLE
-        books = generate_books(size)
-        book_table = BookHashTable()
-        measure_performance(f"Insert {size} books to HashTable", lambda: [book_table.insert(b.isbn, b) for b in books])
-        measure_performance(f"Search {size} books in HashTable", lambda: [book_table.search(b.isbn) for b in books])
-        measure_performance(f"Delete {size} books from HashTable", lambda: [book_table.delete(b.isbn) for b in books])
-        [book_table.insert(b.isbn, b) for b in books]
-        measure_performance(f"Update {size} books in HashTable", lambda: [book_table.insert(b.isbn, b) for b in books])
-        measure_performance(f"get_all_values() with {size} books", book_table.get_all_values)
-        measure_performance(f"Sort books by title (merge sort)", lambda: self_implemented_merge_sort(book_table.get_all_values(), key_func=lambda b: b.title))
-
-        # READER HASH TABLE
-        readers = generate_readers(size)
-        reader_table = ReaderHashTable()
-        measure_performance(f"Insert {size} readers to HashTable", lambda: [reader_table.insert(r.reader_id, r) for r in readers])
-        measure_performance(f"Search {size} readers in HashTable", lambda: [reader_table.search(r.reader_id) for r in readers])
-        measure_performance(f"Delete {size} readers from HashTable", lambda: [reader_table.delete(r.reader_id) for r in readers])
-        [reader_table.insert(r.reader_id, r) for r in readers]
-        measure_performance(f"Update {size} readers in HashTable", lambda: [reader_table.insert(r.reader_id, r) for r in readers])
-        measure_performance(f"get_all_values() with {size} readers", reader_table.get_all_values)
-        measure_performance(f"Sort readers by name (merge sort)", lambda: self_implemented_merge_sort(reader_table.get_all_values(), key_func=lambda r: r.name))
-
-        # LOAN AVL TREE
-        loans = generate_loans(size)
-        loan_tree = LoanBST()
-        measure_performance(f"Insert {size} loans to AVL Tree", lambda: [loan_tree.insert(l) for l in loans])
-        measure_performance(f"Search {size} loans in AVL Tree", lambda: [loan_tree.search(l.loan_id) for l in loans])
-        measure_performance(f"Delete {size} loans from AVL Tree", lambda: [loan_tree.delete(l.loan_id) for l in loans])
-        [loan_tree.insert(l) for l in loans]
-        measure_performance(f"Inorder traversal of {size} loans", loan_tree.inorder)
-        measure_performance(f"Sort loans by due_date", lambda: self_implemented_merge_sort(loan_tree.inorder(), key_func=lambda l: l.due_date))
-
-        # STATISTICS
-        measure_performance(f"Count ISBN frequencies from {size} loans", lambda: self_implemented_count_frequencies(loans, "isbn"))
-        measure_performance(f"Count reader frequencies from {size} loans", lambda: self_implemented_count_frequencies(loans, "reader_id"))
+import os
+import random
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from hashing import HashTable, OpenAddressingHashTable, stable_hash
+from ui_books import Book, BookCatalog
+from ui_readers import Reader, ReaderCatalog, extract_vietnamese_last_name
+from ui_loans import LoanRecord, LoanBST, LoanManager, TreeNode, LoanColumns, LOANS_WITH_NAMES_QUERY, DueDateQueue, to_timestamp
+from ui_statistics import (self_implemented_merge_sort, self_implemented_count_frequencies, self_implemented_top_n,
+                           aggregate_loans, AggregateCache, AGGREGATE_DIMENSIONS, rank_key,
+                           MemoryStatisticsEngine, SqlStatisticsEngine, CounterStatisticsEngine,
+                           load_statistics_snapshot)
+import migrations
+from migrations import SCHEMA_VERSION, configure_connection, get_schema_version, migrate
+from counters import read_totals, count_overdue, reconcile_counters, loan_count_for_isbn
+from indexes import PrefixIndex, SortedView, TrigramIndex, normalize_search_text
+from sorting import merge_sort, merge_sort_multi, top_n
+from background import BackgroundTask
+
+sample_sizes = [50, 100, 1000, 10000]
+scaling_sizes = [1000, 10000, 100000, 1000000]
+
+def measure_performance(description, func, *args, **kwargs):
+    tracemalloc.start()
+    start_time = time.perf_counter()
+    func(*args, **kwargs)
+    end_time = time.perf_counter()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{description:<60} | Time: {end_time - start_time:.6f} s | Peak Mem: {peak / 1024:.2f} KB")
+
+def measure_per_op(description, func, n_ops):
+    start_time = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start_time
+    print(f"{description:<60} | Time: {elapsed:.6f} s | Per op: {elapsed / n_ops * 1e9:.0f} ns")
+
+def benchmark_hashtable_scaling(label, table_factory, sizes=scaling_sizes):
+    """Per-op latency should stay roughly flat as the number of keys grows."""
+    print(f"\n--- HashTable scaling: {label} ---")
+    for size in sizes:
+        keys = [f"ISBN{i:07}" for i in range(size)]
+        table = table_factory()
+        measure_per_op(f"Insert {size} keys", lambda: [table.insert(k, k) for k in keys], size)
+        measure_per_op(f"Search {size} keys", lambda: [table.search(k) for k in keys], size)
+        measure_per_op(f"Delete {size} keys", lambda: [table.delete(k) for k in keys], size)
+
+def legacy_char_loop_hash(key, capacity=100):
+    key = str(key)
+    hash_value = 0
+    for char in key:
+        hash_value = (hash_value * 31 + ord(char)) % capacity
+    return hash_value
+
+def benchmark_key_hashing(n=100000):
+    print("\n--- Key hashing ---")
+    keys = [f"978-604-{i % 100:02}-{i:07}-{i % 10}" for i in range(n)]
+    measure_per_op(f"Per-character loop hash of {n} ISBNs", lambda: [legacy_char_loop_hash(k) for k in keys], n)
+    measure_per_op(f"stable_hash (crc32) of {n} ISBNs", lambda: [stable_hash(k) for k in keys], n)
+    # Must print the same value on every run, whatever PYTHONHASHSEED is
+    print(f"stable_hash('{keys[0]}') = {stable_hash(keys[0])}")
+
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+
+def create_benchmark_db(n_loans, path=":memory:", schema_version=SCHEMA_VERSION):
+    """
+    Generated library database with n_loans loans over n_loans/10 books and readers.
+    Rows are inserted into the bare tables first; later migrations (indexes) run afterwards,
+    which is much faster than maintaining the indexes row by row.
+    """
+    conn = sqlite3.connect(path)
+    migrate(conn, target_version=1)
+    n_books = n_readers = max(1, n_loans // 10)
+    conn.executemany("INSERT INTO books VALUES (?, ?, ?, ?, ?, ?, ?)",
+                     ((f"ISBN{i:07}", f"Title{i}", "Khác", f"Author{i}", 2000 + i % 20, 5, 5) for i in range(n_books)))
+    conn.executemany("INSERT INTO readers VALUES (?, ?, ?, ?)",
+                     ((f"RD{i:07}", f"Name{i}", "2000-01-01", f"Address{i}") for i in range(n_readers)))
+    start = datetime(2024, 1, 1)
+
+    def loan_rows():
+        for i in range(n_loans):
+            borrow_date = start + timedelta(minutes=i)
+            due_date = borrow_date + timedelta(days=14)
+            returned = i % 3 != 0
+            yield (i + 1, f"RD{i % n_readers:07}", f"ISBN{(i * 7) % n_books:07}",
+                   borrow_date.strftime(DATE_FORMAT), due_date.strftime(DATE_FORMAT),
+                   (borrow_date + timedelta(days=7)).strftime(DATE_FORMAT) if returned else None,
+                   "Đã trả" if returned else "Đang mượn")
+    conn.executemany("INSERT INTO loans VALUES (?, ?, ?, ?, ?, ?, ?)", loan_rows())
+    conn.commit()
+    migrate(conn, target_version=schema_version)
+    return conn
+
+def legacy_load_loans(conn):
+    """Loader used before the JOIN query: one query for the loans plus two per loan."""
+    cursor = conn.cursor()
+    tree = LoanBST()
+    cursor.execute("SELECT * FROM loans")
+    for row in cursor.fetchall():
+        loan_id, reader_id, isbn, borrow_date_str, due_date_str, return_date_str, status = row
+        cursor.execute("SELECT title FROM books WHERE isbn = ?", (isbn,))
+        book_title_result = cursor.fetchone()
+        book_title = book_title_result[0] if book_title_result else "N/A"
+        cursor.execute("SELECT name FROM readers WHERE reader_id = ?", (reader_id,))
+        reader_name_result = cursor.fetchone()
+        reader_name = reader_name_result[0] if reader_name_result else "N/A"
+        borrow_date = datetime.strptime(borrow_date_str, DATE_FORMAT)
+        due_date = datetime.strptime(due_date_str, DATE_FORMAT)
+        return_date = datetime.strptime(return_date_str, DATE_FORMAT) if return_date_str else None
+        tree.insert(LoanRecord(loan_id, reader_id, isbn, borrow_date, due_date, return_date, status, book_title, reader_name))
+    return tree
+
+def benchmark_loan_loading(sizes=(1000, 10000, 100000)):
+    print("\n--- Loading loans from SQLite (on-disk database) ---")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for size in sizes:
+            # Schema v2 still stores the dates as "%Y-%m-%d %H:%M:%S.%f" strings
+            conn = create_benchmark_db(size, os.path.join(tmp_dir, f"loans_{size}.db"), schema_version=2)
+            manager = LoanManager(conn, load=False) # No loans_version table before schema v5
+            measure_per_op(f"Legacy loader (1 + 2 queries per loan, strptime), {size} loans", lambda: legacy_load_loans(conn), size)
+            measure_per_op(f"JOIN loader, text dates (fromisoformat), {size} loans", manager._read_loans, size)
+            measure_per_op(f"Migration 3 (text dates -> integer timestamps), {size} loans", lambda: migrate(conn, target_version=3), size)
+            measure_per_op(f"JOIN loader, integer dates, {size} loans", manager._read_loans, size)
+            conn.close()
+
+def check_loan_date_migration(size=1000, batch_size=100):
+    """Migration 3 commits per batch, resumes after an interruption and sets unreadable dates aside."""
+    print("\n--- Migration 3: interrupted, resumed, unreadable dates ---")
+    conn = create_benchmark_db(size, schema_version=2)
+    conn.execute("UPDATE loans SET borrow_date = 'hôm qua' WHERE loan_id = 10")
+    conn.execute("UPDATE loans SET due_date = NULL WHERE loan_id = 250")
+    conn.execute("UPDATE loans SET return_date = '31/02/2024' WHERE loan_id = 777")
+    conn.commit()
+    expected = {loan_id: (to_timestamp(datetime.fromisoformat(borrow)), to_timestamp(datetime.fromisoformat(due)))
+                for loan_id, borrow, due in conn.execute("SELECT loan_id, borrow_date, due_date FROM loans")
+                if loan_id not in (10, 250, 777)}
+    original_batch_size, original_commit_batch = migrations.LOAN_DATE_BATCH_SIZE, migrations._commit_batch
+    commits = []
+
+    def commit_then_fail(conn):
+        original_commit_batch(conn)
+        commits.append(1)
+        if len(commits) == 3:
+            raise KeyboardInterrupt # The app is closed in the middle of the migration
+
+    migrations.LOAN_DATE_BATCH_SIZE, migrations._commit_batch = batch_size, commit_then_fail
+    try:
+        try:
+            migrate(conn)
+            raise AssertionError("migration was not interrupted")
+        except KeyboardInterrupt:
+            pass
+        assert get_schema_version(conn) == 2
+        copied = conn.execute("SELECT COUNT(*) FROM loans_new").fetchone()[0]
+        assert copied + conn.execute("SELECT COUNT(*) FROM loans_unreadable_dates").fetchone()[0] == 3 * batch_size
+        migrations._commit_batch = original_commit_batch
+        assert migrate(conn) == SCHEMA_VERSION
+    finally:
+        migrations.LOAN_DATE_BATCH_SIZE, migrations._commit_batch = original_batch_size, original_commit_batch
+    assert {loan_id: (borrow, due) for loan_id, borrow, due in conn.execute("SELECT loan_id, borrow_date, due_date FROM loans")} == expected
+    assert [row[0] for row in conn.execute("SELECT loan_id FROM loans_unreadable_dates ORDER BY loan_id")] == [10, 250, 777]
+    assert conn.execute("SELECT borrow_date FROM loans_unreadable_dates WHERE loan_id = 10").fetchone()[0] == "hôm qua"
+    assert LoanManager(conn).loans.size == size - 3
+    conn.close()
+    print(f"{size} loans in batches of {batch_size}: {copied} copied before the interruption, rest resumed, 3 set aside")
+
+def run_schema_queries(conn, reader_ids, isbns, as_of):
+    for reader_id in reader_ids:
+        conn.execute("SELECT * FROM loans WHERE reader_id = ?", (reader_id,)).fetchall()
+        conn.execute("SELECT 1 FROM loans WHERE reader_id = ? AND status = 'Đang mượn' LIMIT 1", (reader_id,)).fetchone()
+    for isbn in isbns:
+        conn.execute("SELECT * FROM loans WHERE isbn = ?", (isbn,)).fetchall()
+        conn.execute("SELECT 1 FROM loans WHERE isbn = ? AND status = 'Đang mượn' LIMIT 1", (isbn,)).fetchone()
+    conn.execute("SELECT * FROM loans WHERE status = 'Đang mượn' AND due_date < ?", (as_of,)).fetchall()
+
+def benchmark_schema_migrations(size=1000000, n_queries=100):
+    """Same SQL on schema v1 (no secondary indexes, text dates, default PRAGMAs) and after migrating."""
+    print(f"\n--- SQL lookups on a {size}-loan database before/after migrations ({n_queries} queries each) ---")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "loans.db")
+        create_benchmark_db(size, path, schema_version=1).close()
+        reader_ids = [f"RD{i * 37 % (size // 10):07}" for i in range(n_queries)]
+        isbns = [f"ISBN{i * 53 % (size // 10):07}" for i in range(n_queries)]
+        as_of = datetime(2024, 1, 15)
+        text_as_of, integer_as_of = as_of.strftime(DATE_FORMAT), to_timestamp(as_of)
+        n_ops = 4 * n_queries + 1
+
+        conn = sqlite3.connect(path)
+        measure_per_op(f"Schema v{migrate(conn, target_version=1)}, default PRAGMAs",
+                       lambda: run_schema_queries(conn, reader_ids, isbns, text_as_of), n_ops)
+        configure_connection(conn)
+        measure_per_op("Schema v1, WAL + cache/mmap PRAGMAs",
+                       lambda: run_schema_queries(conn, reader_ids, isbns, text_as_of), n_ops)
+        measure_per_op(f"Migrating to schema v{SCHEMA_VERSION} (indexes, integer dates, counters)", lambda: migrate(conn), 1)
+        measure_per_op(f"Schema v{SCHEMA_VERSION}, WAL + cache/mmap PRAGMAs",
+                       lambda: run_schema_queries(conn, reader_ids, isbns, integer_as_of), n_ops)
+        plan = conn.execute("EXPLAIN QUERY PLAN SELECT * FROM loans WHERE status = 'Đang mượn' AND due_date < ?",
+                            (integer_as_of,)).fetchall()
+        print(f"Overdue query plan: {plan[0][-1]}")
+        conn.close()
+
+def check_due_date_queue():
+    """A loan pushed twice, or removed and pushed again with the same due date, is reported once."""
+    print("\n--- Due date queue: duplicate pushes ---")
+    queue = DueDateQueue()
+    loans = [LoanRecord(i, f"RD{i}", f"ISBN{i}", 0, 100 + i, None, "Đang mượn") for i in range(10)]
+    for loan in loans:
+        queue.push(loan)
+    queue.push(loans[3])
+    queue.remove(loans[5].loan_id)
+    queue.push(loans[5])
+    moved = LoanRecord(7, "RD7", "ISBN7", 0, 50, None, "Đang mượn") # Due date changed: the old entry is stale
+    queue.push(moved)
+    expected = sorted([loan for loan in loans if loan.loan_id != 7] + [moved], key=lambda loan: (loan.due_ts, loan.loan_id))
+    assert len(queue) == 10
+    assert [loan.loan_id for loan in queue.due_before(1000)] == [loan.loan_id for loan in expected]
+    assert [loan.loan_id for loan in queue.due_before(104)] == [7, 0, 1, 2, 3]
+    print("duplicate and re-pushed loans are returned once by due_before")
+
+def check_loan_manager_sync():
+    """Deleting a loan that another desk changed in the meantime must not drop it from the tree only."""
+    print("\n--- LoanManager: delete vs. a concurrent change at another desk ---")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "sync.db")
+        create_benchmark_db(1000, path).close()
+        conn, other = sqlite3.connect(path), sqlite3.connect(path)
+        manager = LoanManager(conn)
+        returned = [loan.loan_id for loan in manager.get_all_loans() if loan.status == "Đã trả"]
+
+        assert manager.delete_loan(returned[0])
+        assert manager.get_loan_details(returned[0]) is None
+        # Another desk puts the loan back on loan after this desk last synced
+        manager._refresh_if_stale = lambda: None
+        other.execute("UPDATE loans SET status = 'Đang mượn', return_date = NULL WHERE loan_id = ?", (returned[1],))
+        other.commit()
+        assert not manager.delete_loan(returned[1])
+        del manager._refresh_if_stale
+        assert manager.get_loan_details(returned[1]).status == "Đang mượn"
+        assert conn.execute("SELECT COUNT(*) FROM loans WHERE loan_id = ?", (returned[1],)).fetchone()[0] == 1
+        assert [loan.loan_id for loan in manager.get_all_loans()] == \
+            [row[0] for row in conn.execute("SELECT loan_id FROM loans ORDER BY loan_id")]
+
+        # Staleness is keyed on loan data only: book/reader edits on the shared connection
+        # (books and readers tabs) must not reload every loan, renames and other desks' loans must
+        reloads = []
+        read_loans = manager._read_loans
+        manager._read_loans = lambda progress=None: (reloads.append(1), read_loans(progress))[1]
+        loan = manager.get_loan_details(returned[2])
+        conn.execute("UPDATE books SET quantity = quantity + 1, available_quantity = available_quantity + 1 WHERE isbn = ?", (loan.isbn,))
+        conn.execute("UPDATE readers SET address = 'Huế' WHERE reader_id = ?", (loan.reader_id,))
+        conn.commit()
+        manager.get_all_loans()
+        assert reloads == []
+        conn.execute("UPDATE books SET title = 'Tên mới' WHERE isbn = ?", (loan.isbn,))
+        conn.commit()
+        assert manager.get_loan_details(returned[2]).book_title == "Tên mới" and reloads == [1]
+        other.execute("INSERT INTO loans (reader_id, isbn, borrow_date, due_date, status) VALUES (?, ?, 0, 86400, 'Đã trả')",
+                      (loan.reader_id, loan.isbn))
+        other.commit()
+        assert len(manager.get_all_loans()) == conn.execute("SELECT COUNT(*) FROM loans").fetchone()[0] and reloads == [1, 1]
+        conn.close()
+        other.close()
+    print("a loan changed by another desk is kept and the tree reloaded; book/reader edits do not reload loans")
+
+def benchmark_loan_lookups(size=100000, n_queries=200):
+    print(f"\n--- Loan lookups over {size} loans ({n_queries} queries) ---")
+    conn = create_benchmark_db(size)
+    manager = LoanManager(conn)
+    reader_ids = [f"RD{i:07}" for i in range(n_queries)]
+    isbns = [f"ISBN{i:07}" for i in range(n_queries)]
+    measure_per_op("History by reader, full inorder() scan",
+                   lambda: [[l for l in manager.loans.inorder() if l.reader_id == r] for r in reader_ids], n_queries)
+    measure_per_op("History by reader, reader_id index", lambda: [manager.get_loan_history_by_reader(r) for r in reader_ids], n_queries)
+    measure_per_op("History by ISBN, isbn index", lambda: [manager.get_loan_history_by_isbn(i) for i in isbns], n_queries)
+    measure_per_op("Duplicate-borrow check, (reader_id, isbn, status) index",
+                   lambda: [manager._is_book_currently_borrowed_by_reader(r, i) for r, i in zip(reader_ids, isbns)], n_queries)
+    middle_id = size // 2
+    measure_per_op("Page of 100 loans from the middle, inorder() slice",
+                   lambda: manager.loans.inorder()[middle_id:middle_id + 100], 1)
+    measure_per_op("Page of 100 loans from the middle, keyset get_loans_page",
+                   lambda: manager.get_loans_page(after_id=middle_id), 1)
+    march_start, march_end = datetime(2024, 3, 1), datetime(2024, 4, 1)
+    march_start_ts, march_end_ts = to_timestamp(march_start), to_timestamp(march_end)
+    march_count = manager.count_loans_borrowed_between(march_start, march_end)
+    measure_per_op(f"Loans borrowed in March 2024 ({march_count}), full scan",
+                   lambda: [l for l in manager.loans.inorder() if march_start_ts <= l.borrow_ts < march_end_ts], 1)
+    measure_per_op(f"Loans borrowed in March 2024 ({march_count}), borrow_date index",
+                   lambda: manager.get_loans_borrowed_between(march_start, march_end), 1)
+    as_of = datetime(2024, 1, 20)
+    as_of_ts = to_timestamp(as_of)
+    overdue_count = len(manager.get_overdue_loans(as_of))
+    measure_per_op(f"Overdue as of {as_of:%Y-%m-%d} ({overdue_count} loans), full scan",
+                   lambda: [l for l in manager.loans.inorder() if l.status == "Đang mượn" and l.due_ts < as_of_ts], 1)
+    measure_per_op(f"Overdue as of {as_of:%Y-%m-%d} ({overdue_count} loans), due-date queue",
+                   lambda: manager.get_overdue_loans(as_of), 1)
+    conn.close()
+
+TITLE_ONSETS = ["b", "c", "ch", "d", "đ", "g", "h", "kh", "l", "m", "n", "ng", "nh", "ph", "qu", "s", "t", "th", "tr", "v", "x"]
+TITLE_RIMES = ["a", "ai", "an", "ang", "ành", "ào", "âm", "ất", "e", "ên", "i", "iệt", "inh", "o", "óa", "ông",
+               "ơn", "u", "uân", "ức", "ương", "ướt", "y", "ọc", "ịch", "ử", "ữ", "ếu", "ản", "ình"]
+TITLE_WORDS = [onset + rime for onset in TITLE_ONSETS for rime in TITLE_RIMES]
+
+def generate_titles(n, seed=42):
+    rnd = random.Random(seed)
+    return [" ".join(rnd.choice(TITLE_WORDS) for _ in range(rnd.randint(3, 6))).capitalize() + f" tập {i % 97}"
+            for i in range(n)]
+
+def benchmark_title_search(sizes=(10000, 100000, 1000000), n_queries=100):
+    print(f"\n--- Substring title search ({n_queries} queries) ---")
+    rnd = random.Random(7)
+    for size in sizes:
+        titles = generate_titles(size)
+        queries = []
+        for _ in range(n_queries):
+            title = rnd.choice(titles)
+            start = rnd.randrange(max(1, len(title) - 8))
+            queries.append(title[start:start + rnd.randint(4, 8)].upper())
+        index = TrigramIndex()
+        measure_per_op(f"Build trigram index, {size} titles", lambda: [index.add(i, t) for i, t in enumerate(titles)], size)
+        scan_hits = [0]
+        index_hits = [0]
+
+        def scan():
+            for q in queries:
+                keyword = q.lower()
+                scan_hits[0] += sum(1 for t in titles if keyword in t.lower())
+
+        def indexed():
+            for q in queries:
+                index_hits[0] += len(index.search(q))
+        measure_per_op(f"Search {size} titles, lower() + `in` scan", scan, n_queries)
+        measure_per_op(f"Search {size} titles, trigram index", indexed, n_queries)
+        assert scan_hits == index_hits, (scan_hits, index_hits)
+
+SURNAMES = ["Nguyễn", "Trần", "Lê", "Phạm", "Hoàng", "Huỳnh", "Phan", "Vũ", "Võ", "Đặng", "Bùi", "Đỗ", "Hồ", "Ngô", "Dương"]
+MIDDLE_NAMES = ["Văn", "Thị", "Hữu", "Minh", "Ngọc", "Đức", "Thanh", "Quốc", "Thu", "Gia"]
+GIVEN_NAMES = ["An", "Bình", "Châu", "Dũng", "Đạt", "Hà", "Hạnh", "Hùng", "Lan", "Long", "Mai", "Nam", "Phương",
+               "Quân", "Thảo", "Trang", "Tuấn", "Yến", "Khoa", "Linh", "Nhung", "Sơn", "Tâm", "Vy", "Xuân"]
+
+def generate_reader_names(n, seed=3):
+    rnd = random.Random(seed)
+    return [f"{rnd.choice(SURNAMES)} {rnd.choice(MIDDLE_NAMES)} {rnd.choice(GIVEN_NAMES)}" for _ in range(n)]
+
+def benchmark_accent_insensitive_search(sizes=(10000, 100000, 1000000), n_queries=100):
+    """Patrons type names without diacritics: compare recall and cost of the old scan and the folded index."""
+    print(f"\n--- Reader name search, queries typed without diacritics ({n_queries} queries) ---")
+    rnd = random.Random(11)
+    for size in sizes:
+        readers = [Reader(f"RD{i:07}", name, "2000-01-01", "Hà Nội") for i, name in enumerate(generate_reader_names(size))]
+        queries = [normalize_search_text(" ".join(rnd.choice(readers).name.split()[-2:])) for _ in range(n_queries)]
+        index = TrigramIndex(normalize=normalize_search_text)
+        measure_per_op(f"Build folded index from precomputed keys, {size} readers",
+                       lambda: [index.add_normalized(r.reader_id, r.name_key) for r in readers], size)
+        scan_hits = [0]
+        index_hits = [0]
+
+        def scan():
+            for q in queries:
+                scan_hits[0] += sum(1 for r in readers if q in r.name.lower())
+
+        def indexed():
+            for q in queries:
+                index_hits[0] += len(index.search(q))
+        measure_per_op(f"Search {size} readers, lower() + `in` scan", scan, n_queries)
+        measure_per_op(f"Search {size} readers, folded trigram index", indexed, n_queries)
+        expected = sum(sum(1 for r in readers if q in r.name_key) for q in queries)
+        assert index_hits[0] == expected
+        print(f"Matches found: scan {scan_hits[0]}, folded index {index_hits[0]}")
+
+def benchmark_prefix_completion(sizes=(10000, 100000, 1000000), n_queries=1000, limit=20):
+    """Autocomplete as the clerk types: every prefix of an ISBN is one query."""
+    print(f"\n--- ISBN prefix completion (limit {limit}) ---")
+    rnd = random.Random(13)
+    for size in sizes:
+        isbns = [f"978-604-{i % 1000:03}-{i:07}" for i in range(size)]
+        prefixes = []
+        while len(prefixes) < n_queries:
+            isbn = rnd.choice(isbns)
+            prefixes.extend(isbn[:length] for length in range(1, len(isbn) + 1))
+        prefixes = prefixes[:n_queries]
+        index = measure_retained_memory(f"PrefixIndex over {size} ISBNs", lambda: PrefixIndex(isbns), size)
+        measure_per_op(f"Complete 50 prefixes over {size} ISBNs, startswith() scan",
+                       lambda: [[k for k in isbns if k.startswith(p)][:limit] for p in prefixes[:50]], 50)
+        measure_per_op(f"Complete {n_queries} prefixes over {size} ISBNs, bisect",
+                       lambda: [index.complete(p, limit) for p in prefixes], n_queries)
+
+def legacy_sort_books(books, key_func, reverse=False):
+    """The merge sort nested in sort_books before sorted views: key_func runs 4 times per comparison."""
+    def merge_sort(arr):
+        if len(arr) <= 1:
+            return arr
+        mid = len(arr) // 2
+        return merge(merge_sort(arr[:mid]), merge_sort(arr[mid:]))
+
+    def merge(left, right):
+        result = []
+        i = j = 0
+        while i < len(left) and j < len(right):
+            if (key_func(left[i]) <= key_func(right[j]) and not reverse) or \
+               (key_func(left[i]) > key_func(right[j]) and reverse):
+                result.append(left[i])
+                i += 1
+            else:
+                result.append(right[j])
+                j += 1
+        result.extend(left[i:])
+        result.extend(right[j:])
+        return result
+    return merge_sort(books)
+
+def benchmark_book_sorting(sizes=(10000, 100000), n_updates=1000):
+    print("\n--- Sorting books by title ---")
+    rnd = random.Random(17)
+    for size in sizes:
+        books = [Book(f"ISBN{i:07}", title, "Khác", "Tác giả", 2000, 1) for i, title in enumerate(generate_titles(size))]
+        title_key = lambda book: book.title.lower()
+        measure_per_op(f"Legacy nested merge sort, {size} books", lambda: legacy_sort_books(books, title_key), size)
+        measure_per_op(f"merge_sort (key once per book), {size} books",
+                       lambda: merge_sort(books, key=title_key), size)
+        view = SortedView(title_key, lambda book: book.isbn)
+        measure_per_op(f"SortedView.reset (initial load), {size} books", lambda: view.reset(books), size)
+        measure_per_op(f"Sort click with SortedView (read the view), {size} books", lambda: view.values(reverse=True), 1)
+        changed = rnd.sample(books, n_updates)
+
+        def retitle():
+            for book in changed:
+                book.title = book.title[::-1]
+                view.update(book)
+        measure_per_op(f"Keep view sorted across {n_updates} title updates, {size} books", retitle, n_updates)
+        assert view.values() == merge_sort(books, key=lambda book: (title_key(book), book.isbn))
+
+def check_catalog_delete(size=20000, n_deletes=500):
+    """Deleting books/readers must update the sorted views in place: SortedView.reset runs only on a full load."""
+    conn = create_benchmark_db(size * 10) # size books, size readers
+    catalogs = [
+        # (tab, catalog, records, id of a record, shared id index, id search mode,
+        #  sorted view -> merge_sort key it must match)
+        ("books", BookCatalog(), lambda catalog: catalog.books, lambda book: book.isbn,
+         lambda catalog: catalog.isbn_index, "ISBN",
+         {"isbn": lambda book: book.isbn, "title": lambda book: (book.title.lower(), book.isbn)}),
+        ("readers", ReaderCatalog(), lambda catalog: catalog.readers, lambda reader: reader.reader_id,
+         lambda catalog: catalog.reader_id_index, "Mã bạn đọc",
+         {"reader_id": lambda reader: reader.reader_id,
+          "name": lambda reader: (extract_vietnamese_last_name(reader.name), reader.reader_id)}),
+    ]
+    resets = []
+    original_reset = SortedView.reset
+
+    def counting_reset(view, records):
+        resets.append(view)
+        original_reset(view, records)
+
+    for tab, catalog, records_of, id_of, id_index_of, id_search_mode, view_keys in catalogs:
+        print(f"\n--- Deleting {tab} from the catalog ---")
+        SortedView.reset = counting_reset
+        try:
+            measure_per_op(f"Full catalog load ({tab} tab reload), {size} {tab}", lambda: catalog.load(conn.cursor()), 1)
+            assert len(resets) == len(catalog.sorted_views)
+            resets.clear()
+            victims = random.Random(19).sample(sorted(id_of(record) for record in records_of(catalog).get_all_values()), n_deletes)
+            measure_per_op(f"Delete {n_deletes} {tab} one at a time, {size} {tab}",
+                           lambda: [catalog.remove(record_id) for record_id in victims], n_deletes)
+            assert not resets, "a delete re-sorted a SortedView"
+        finally:
+            SortedView.reset = original_reset
+        gone = set(victims)
+        remaining = records_of(catalog).get_all_values()
+        assert len(remaining) == size - n_deletes and not gone & {id_of(record) for record in remaining}
+        for view_name, key in view_keys.items():
+            assert catalog.sorted_views[view_name].values() == merge_sort(remaining, key=key), view_name
+        assert not any(record_id in id_index_of(catalog) or catalog.search_indexes[id_search_mode].search(record_id)
+                       for record_id in victims)
+        assert not catalog.remove(victims[0])
+    conn.close()
+
+def legacy_recursive_merge_sort(data_list, key_func=None, reverse=False):
+    """self_implemented_merge_sort before sorting.py: slices on every level, key_func twice per comparison."""
+    def sort(arr):
+        if len(arr) <= 1:
+            return arr
+        mid = len(arr) // 2
+        return merge(sort(arr[:mid]), sort(arr[mid:]))
+
+    def merge(left, right):
+        merged = []
+        i = j = 0
+        while i < len(left) and j < len(right):
+            a = key_func(left[i]) if key_func else left[i]
+            b = key_func(right[j]) if key_func else right[j]
+            if (a <= b) ^ reverse:
+                merged.append(left[i])
+                i += 1
+            else:
+                merged.append(right[j])
+                j += 1
+        merged.extend(left[i:])
+        merged.extend(right[j:])
+        return merged
+    return sort(data_list)
+
+def benchmark_merge_sort(sizes=(10000, 100000, 1000000), legacy_limit=100000):
+    print("\n--- Shared merge sort (sorting.py) vs the old copies ---")
+    rnd = random.Random(20)
+    for size in sizes:
+        books = [Book(f"ISBN{i:07}", title, "Khác", "Tác giả", 1900 + rnd.randrange(125), 1)
+                 for i, title in enumerate(generate_titles(size))]
+        rnd.shuffle(books)
+        title_key = lambda book: book.title.lower()
+        if size <= legacy_limit:
+            measure_per_op(f"Legacy nested sort (sort_books), {size} books", lambda: legacy_sort_books(books, title_key), size)
+            measure_per_op(f"Legacy recursive sort (statistics), {size} books",
+                           lambda: legacy_recursive_merge_sort(books, title_key), size)
+        measure_per_op(f"Bottom-up merge_sort, {size} books", lambda: merge_sort(books, key=title_key), size)
+        measure_per_op(f"Built-in sorted (reference), {size} books", lambda: sorted(books, key=title_key), size)
+
+        by_title = merge_sort(books, key=title_key)
+        assert by_title == sorted(books, key=title_key)
+        nearly_sorted = list(by_title)
+        for _ in range(size // 100):  # 1% of the books moved to a random position
+            nearly_sorted.insert(rnd.randrange(size), nearly_sorted.pop(rnd.randrange(size)))
+        measure_per_op(f"merge_sort on nearly sorted data, {size} books",
+                       lambda: merge_sort(nearly_sorted, key=title_key), size)
+        measure_per_op(f"merge_sort natural=True on nearly sorted data, {size} books",
+                       lambda: merge_sort(nearly_sorted, key=title_key, natural=True), size)
+
+        counts = [(book.isbn, rnd.randrange(50)) for book in books]
+        sort_keys = [(lambda pair: pair[1], True), (lambda pair: pair[0], False)]
+        measure_per_op(f"merge_sort_multi (count desc, isbn asc), {size} pairs",
+                       lambda: merge_sort_multi(counts, sort_keys), size)
+        assert merge_sort_multi(counts, sort_keys) == sorted(counts, key=lambda pair: (-pair[1], pair[0]))
+        assert merge_sort(counts, key=lambda pair: pair[1], reverse=True) == \
+            sorted(counts, key=lambda pair: pair[1], reverse=True)
+
+def benchmark_top_n(sizes=(10000, 100000, 1000000), ns=(10, 100)):
+    print("\n--- Top-N report: full merge sort vs bounded heap ---")
+    rnd = random.Random(21)
+    for size in sizes:
+        # One (isbn, loan count) pair per distinct ISBN, skewed like real borrowing
+        counts = [(f"ISBN{i:07}", int(rnd.paretovariate(1.2))) for i in range(size)]
+        for n in ns:
+            measure_per_op(f"Top {n} by full merge sort, {size} ISBNs",
+                           lambda: self_implemented_merge_sort(counts, key_func=lambda pair: pair[1], reverse=True)[:n], size)
+            measure_per_op(f"Top {n} by bounded heap, {size} ISBNs", lambda: self_implemented_top_n(counts, n), size)
+            assert self_implemented_top_n(counts, n) == merge_sort(counts, key=rank_key)[:n]
+            assert top_n(counts, n, key=lambda pair: pair[1], reverse=False) == merge_sort(counts, key=lambda pair: pair[1])[:n]
+
+def legacy_count_frequencies(keys):
+    """self_implemented_count_frequencies before HashTable.increment: search + insert hashes every key twice."""
+    frequency_table = HashTable()
+    for key in keys:
+        current_count = frequency_table.search(key)
+        if current_count is None:
+            frequency_table.insert(key, 1)
+        else:
+            frequency_table.insert(key, current_count + 1)
+    return frequency_table.get_all_items()
+
+def legacy_loan_reports(loans, books):
+    """One full pass per report, as each statistics button used to do."""
+    def genre_of(loan):
+        book = books.search(loan.isbn)
+        return book.genre if book else None
+    return {
+        "isbn": legacy_count_frequencies(loan.isbn for loan in loans),
+        "reader_id": legacy_count_frequencies(loan.reader_id for loan in loans),
+        "status": legacy_count_frequencies(loan.status for loan in loans),
+        "genre": legacy_count_frequencies(genre_of(loan) for loan in loans),
+        "month": legacy_count_frequencies(loan.borrow_date.strftime("%Y-%m") for loan in loans),
+    }
+
+def benchmark_aggregation(sizes=(10000, 100000, 1000000)):
+    print("\n--- Statistics: one pass per report vs single-pass aggregation ---")
+    for size in sizes:
+        conn = create_benchmark_db(size)
+        loans = [LoanRecord(*row) for row in conn.execute(LOANS_WITH_NAMES_QUERY)]
+        books = HashTable()
+        for row in conn.execute("SELECT isbn, title, genre, author, year, quantity FROM books"):
+            books.insert(row[0], Book(*row))
+        conn.close()
+        measure_per_op(f"5 reports, one search+insert pass each, {size} loans", lambda: legacy_loan_reports(loans, books), size)
+        measure_per_op(f"count_frequencies by isbn (increment), {size} loans",
+                       lambda: self_implemented_count_frequencies(loans, "isbn"), size)
+        for engine in ("chaining", "open_addressing"):
+            measure_per_op(f"aggregate_loans, 5 dimensions, {engine}, {size} loans",
+                           lambda: aggregate_loans(loans, books, engine), size)
+        cache = AggregateCache(lambda: aggregate_loans(loans, books))
+        cache.get(0)
+        measure_per_op(f"5 report reads from AggregateCache, {size} loans",
+                       lambda: [cache.get(0).items(dimension) for dimension in AGGREGATE_DIMENSIONS], 5)
+        aggregates = cache.get(0)
+        for dimension, items in legacy_loan_reports(loans, books).items():
+            assert sorted(aggregates.items(dimension)) == sorted(items), dimension
+
+def run_borrow_return_cycles(conn, n_ops, n_books, n_readers, rnd):
+    """The SQL of LoanManager.add_loan / return_loan, one transaction per operation."""
+    now = to_timestamp(datetime(2024, 6, 1))
+    active = []
+    for _ in range(n_ops):
+        if active and rnd.random() < 0.5:
+            loan_id, isbn = active.pop(rnd.randrange(len(active)))
+            conn.execute("UPDATE loans SET return_date=?, status=? WHERE loan_id=? AND status=?", (now, "Đã trả", loan_id, "Đang mượn"))
+            conn.execute("UPDATE books SET available_quantity = available_quantity + 1 WHERE isbn = ?", (isbn,))
+        else:
+            isbn = f"ISBN{rnd.randrange(n_books):07}"
+            if conn.execute("UPDATE books SET available_quantity = available_quantity - 1 WHERE isbn = ? AND available_quantity > 0",
+                            (isbn,)).rowcount == 0:
+                conn.rollback()
+                continue
+            cursor = conn.execute("INSERT INTO loans (reader_id, isbn, borrow_date, due_date, status) VALUES (?, ?, ?, ?, ?)",
+                                  (f"RD{rnd.randrange(n_readers):07}", isbn, now, now + 14 * 86400, "Đang mượn"))
+            active.append((cursor.lastrowid, isbn))
+        conn.commit()
+
+def legacy_refresh_totals(conn):
+    """What "Làm mới" did before reading any total: load every book, reader and loan."""
+    books = [Book(*row[:6]) for row in conn.execute("SELECT * FROM books")]
+    readers = [Reader(*row) for row in conn.execute("SELECT * FROM readers")]
+    loans = [LoanRecord(*row) for row in conn.execute(LOANS_WITH_NAMES_QUERY)]
+    return len(books), sum(book.quantity for book in books), len(readers), sum(1 for loan in loans if loan.status == "Đang mượn")
+
+def benchmark_statistics_counters(sizes=(10000, 100000, 1000000), n_ops=2000):
+    print("\n--- Statistics counters maintained by triggers ---")
+    rnd = random.Random(23)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for size in sizes:
+            n_books = n_readers = size // 10
+            for version in (3, SCHEMA_VERSION):
+                conn = create_benchmark_db(size, os.path.join(tmp_dir, f"counters_{size}_v{version}.db"), schema_version=version)
+                configure_connection(conn)
+                label = "with counter triggers" if version >= 4 else "without triggers"
+                measure_per_op(f"Borrow/return {n_ops} times {label}, {size} loans",
+                               lambda: run_borrow_return_cycles(conn, n_ops, n_books, n_readers, rnd), n_ops)
+                if version >= 4:
+                    measure_per_op(f"Totals by full reload (Làm mới), {size} loans", lambda: legacy_refresh_totals(conn), 1)
+                    measure_per_op(f"Totals from stats_totals (1000 reads), {size} loans", lambda: [read_totals(conn) for _ in range(1000)], 1000)
+                    as_of = to_timestamp(datetime(2024, 6, 1))
+                    measure_per_op(f"Overdue count on (status, due_date) index, {size} loans", lambda: count_overdue(conn, as_of), 1)
+                    assert reconcile_counters(conn) == {}
+                    assert loan_count_for_isbn(conn, "ISBN0000000") == \
+                        conn.execute("SELECT COUNT(*) FROM loans WHERE isbn = 'ISBN0000000'").fetchone()[0]
+                    measure_per_op(f"reconcile_counters (full recount), {size} loans", lambda: reconcile_counters(conn), 1)
+                conn.close()
+
+def create_statistics_db(size, rnd, path=":memory:"):
+    """Benchmark database plus what the reports must cope with: mixed/missing genres, loans without ISBN or reader, returns."""
+    conn = create_benchmark_db(size, path)
+    conn.execute("UPDATE books SET genre = CASE rowid % 4 WHEN 0 THEN 'Văn học' WHEN 1 THEN 'Khoa học' WHEN 2 THEN '' ELSE NULL END")
+    conn.executemany("INSERT INTO loans (reader_id, isbn, borrow_date, due_date, status) VALUES (?, ?, ?, ?, ?)",
+                     [(None, "ISBN0000001", 0, 86400, "Đang mượn"), ("RD0000001", None, 0, 86400, "Đã trả")])
+    conn.commit()
+    run_borrow_return_cycles(conn, max(10, size // 10), max(1, size // 10), max(1, size // 10), rnd)
+    return conn
+
+def check_statistics_engine_parity(sizes=(1000, 20000), n_top=25):
+    """Every report must give the same answer on the RAM, SQL and counter engines."""
+    print("\n--- Statistics engines parity (RAM / SQL / counters) ---")
+    rnd = random.Random(24)
+    as_of_dates = [to_timestamp(datetime(year, month, 1)) for year, month in ((2023, 1), (2024, 1), (2024, 2), (2024, 6), (2025, 1))]
+    for size in sizes:
+        conn = create_statistics_db(size, rnd)
+        memory = MemoryStatisticsEngine(conn)
+        memory.reload()
+        engines = [memory, SqlStatisticsEngine(conn), CounterStatisticsEngine(conn)]
+        loans = memory.loan_manager.loans.inorder()
+        # Same shape as self_implemented_count_frequencies (loans without an ISBN are not ranked)
+        assert sorted(memory.count_by("isbn")) == sorted(pair for pair in self_implemented_count_frequencies(loans, "isbn")
+                                                         if pair[0] is not None)
+        for engine in engines:
+            for n in (1, n_top, size):
+                assert engine.top_books(n) == memory.top_books(n), (engine.name, n)
+                assert engine.top_readers(n) == memory.top_readers(n), (engine.name, n)
+            for dimension in AGGREGATE_DIMENSIONS:
+                assert sorted(engine.count_by(dimension)) == sorted(memory.count_by(dimension)), (engine.name, dimension)
+            assert engine.totals() == memory.totals(), engine.name
+            for as_of in as_of_dates:
+                assert engine.count_overdue(as_of) == memory.count_overdue(as_of), (engine.name, as_of)
+            for start, end in zip(as_of_dates, as_of_dates[1:]):
+                assert engine.count_in_date_range(start, end) == memory.count_in_date_range(start, end), (engine.name, start)
+            isbns = [isbn for isbn, _ in memory.top_books(n_top)] + ["ISBN-missing"]
+            assert engine.book_titles(isbns) == memory.book_titles(isbns), engine.name
+            reader_ids = [reader_id for reader_id, _ in memory.top_readers(n_top)]
+            assert engine.reader_names(reader_ids) == memory.reader_names(reader_ids), engine.name
+        print(f"{size} loans: RAM, SQL and counter engines agree on every report")
+        conn.close()
+
+def benchmark_statistics_engines(sizes=(10000, 100000, 1000000), n_top=100):
+    print("\n--- Statistics engines: RAM vs SQL pushdown vs counters ---")
+    rnd = random.Random(24)
+    as_of = to_timestamp(datetime(2024, 2, 1))
+    for size in sizes:
+        conn = create_statistics_db(size, rnd)
+        memory = MemoryStatisticsEngine(conn)
+        measure_per_op(f"RAM: reload books/readers/loans (Làm mới), {size} loans", memory.reload, 1)
+        measure_per_op(f"RAM: first report (single-pass aggregation), {size} loans", lambda: memory.top_books(n_top), 1)
+        for engine in (memory, SqlStatisticsEngine(conn), CounterStatisticsEngine(conn)):
+            measure_per_op(f"{engine.name}: top {n_top} books + readers, {size} loans",
+                           lambda: (engine.top_books(n_top), engine.top_readers(n_top)), 1)
+            measure_per_op(f"{engine.name}: status + genre + month, {size} loans",
+                           lambda: [engine.count_by(dimension) for dimension in ("status", "genre", "month")], 1)
+            measure_per_op(f"{engine.name}: totals + overdue, {size} loans",
+                           lambda: (engine.totals(), engine.count_overdue(as_of)), 1)
+        conn.close()
+
+class PollingLoop:
+    """Stands in for the Tk event loop: runs after() callbacks and records the longest stall between iterations."""
+    def __init__(self, tick=0.005):
+        self.tick = tick
+        self.pending = []
+
+    def after(self, ms, callback):
+        self.pending.append(callback)
+
+    def run(self):
+        longest_stall = 0.0
+        while self.pending:
+            start = time.perf_counter()
+            callbacks, self.pending = self.pending, []
+            for callback in callbacks:
+                callback()
+            time.sleep(self.tick)
+            longest_stall = max(longest_stall, time.perf_counter() - start - self.tick)
+        return longest_stall
+
+def check_background_refresh(size=20000):
+    """A refresh on the worker thread must load exactly what the main thread would, and stop when cancelled."""
+    print("\n--- Background statistics refresh ---")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        conn = create_statistics_db(size, random.Random(25), os.path.join(tmp_dir, "stats.db"))
+        reference = MemoryStatisticsEngine(conn)
+        reference.reload()
+        loop, results, progress, cancelled = PollingLoop(), [], [], []
+
+        BackgroundTask(loop, conn, load_statistics_snapshot, results.append, on_progress=progress.append).start()
+        loop.run()
+        snapshot, counts = results.pop()
+        snapshot.loan_manager.attach(conn)
+        assert counts == (reference.books.size, reference.readers.size, reference.loan_manager.loans.size)
+        assert snapshot.top_books(size) == reference.top_books(size)
+        assert snapshot.top_readers(size) == reference.top_readers(size)
+        assert snapshot.totals() == reference.totals()
+        for dimension in AGGREGATE_DIMENSIONS:
+            assert sorted(snapshot.count_by(dimension)) == sorted(reference.count_by(dimension)), dimension
+        assert progress, "no progress reported"
+
+        # Cancelled while loading Python objects, and in the middle of a long SQL statement
+        slow_query = "WITH RECURSIVE r(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM r) SELECT COUNT(*) FROM r"
+        for work in (load_statistics_snapshot, lambda task: task.conn.execute(slow_query).fetchone()):
+            task = BackgroundTask(loop, conn, work, results.append, on_cancelled=lambda: cancelled.append(True)).start()
+            time.sleep(0.05)
+            task.cancel()
+            loop.run()
+        assert cancelled == [True, True] and not results
+
+        # RAM reports only read Python objects: no worker connection, and "Hủy" still stops them
+        task = BackgroundTask(loop, conn, lambda task: reference.top_books(10), results.append).start()
+        loop.run()
+        assert results.pop() == reference.top_books(10) and task._conn is None
+        loans, consumed = list(reference.loan_manager.get_all_loans()) * 20, []
+        def counted_loans():
+            for loan in loans:
+                consumed.append(loan)
+                yield loan
+        task = BackgroundTask(loop, conn, lambda task: aggregate_loans(counted_loans(), reference.books), results.append,
+                              on_cancelled=lambda: cancelled.append(True)).start()
+        time.sleep(0.05)
+        task.cancel()
+        loop.run()
+        assert cancelled == [True, True, True] and not results and task._conn is None
+        assert len(consumed) < len(loans), "RAM aggregation ignored the cancel"
+        conn.close()
+    print(f"{size} loans: worker-thread refresh matches the main thread, cancellation stops it")
+
+def benchmark_background_refresh(sizes=(100000, 1000000)):
+    print("\n--- Statistics refresh: Tk thread vs worker thread (longest UI stall) ---")
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, f"refresh_{size}.db")
+            create_benchmark_db(size, path).close()
+            conn = sqlite3.connect(path)
+            start = time.perf_counter()
+            MemoryStatisticsEngine(conn, load=False).reload()
+            elapsed = time.perf_counter() - start
+            print(f"{f'Refresh on the Tk thread, {size} loans':<60} | Time: {elapsed:.3f} s | Longest UI stall: {elapsed:.3f} s")
+            loop, results = PollingLoop(), []
+            start = time.perf_counter()
+            BackgroundTask(loop, conn, load_statistics_snapshot, results.append).start()
+            longest_stall = loop.run()
+            elapsed = time.perf_counter() - start
+            assert results
+            print(f"{f'Refresh on a worker thread, {size} loans':<60} | Time: {elapsed:.3f} s | Longest UI stall: {longest_stall:.3f} s")
+            conn.close()
+
+class DictLoanRecord:
+    """LoanRecord before __slots__: per-instance __dict__, status string, no interning."""
+    def __init__(self, loan_id, reader_id, isbn, borrow_ts, due_ts, return_ts, status, book_title, reader_name):
+        self.loan_id = loan_id
+        self.reader_id = reader_id
+        self.isbn = isbn
+        self.borrow_ts = borrow_ts
+        self.due_ts = due_ts
+        self.return_ts = return_ts
+        self.status = status
+        self.book_title = book_title
+        self.reader_name = reader_name
+
+class DictBook:
+    def __init__(self, isbn, title, genre, author, year, quantity):
+        self.isbn = isbn
+        self.title = title
+        self.genre = genre
+        self.author = author
+        self.year = year
+        self.quantity = quantity
+        self.available_quantity = quantity
+
+class DictReader:
+    def __init__(self, reader_id, name, birth_date, address):
+        self.reader_id = reader_id
+        self.name = name
+        self.birth_date = birth_date
+        self.address = address
+
+def measure_retained_memory(description, build, n_records):
+    """Memory still held by what build() returns, rows streamed from a cursor inside build()."""
+    tracemalloc.start()
+    result = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{description:<60} | Retained: {current / 1024 / 1024:.1f} MB | Per record: {current / n_records:.0f} B")
+    return result
+
+def benchmark_record_memory(size=200000):
+    print(f"\n--- Memory per record ({size} loans, {size // 10} books and readers) ---")
+    conn = create_benchmark_db(size)
+    measure_retained_memory("Loans, __dict__ records",
+                            lambda: [DictLoanRecord(*row) for row in conn.execute(LOANS_WITH_NAMES_QUERY)], size)
+    loans = measure_retained_memory("Loans, __slots__ LoanRecord (status code, interned strings)",
+                                    lambda: [LoanRecord(*row) for row in conn.execute(LOANS_WITH_NAMES_QUERY)], size)
+    measure_retained_memory("Loans, LoanColumns (parallel arrays)", lambda: LoanColumns.from_records(loans), size)
+    book_query = "SELECT isbn, title, genre, author, year, quantity FROM books"
+    measure_retained_memory("Books, __dict__ records", lambda: [DictBook(*row) for row in conn.execute(book_query)], size // 10)
+    measure_retained_memory("Books, __slots__ Book", lambda: [Book(*row) for row in conn.execute(book_query)], size // 10)
+    reader_query = "SELECT reader_id, name, birth_date, address FROM readers"
+    measure_retained_memory("Readers, __dict__ records", lambda: [DictReader(*row) for row in conn.execute(reader_query)], size // 10)
+    measure_retained_memory("Readers, __slots__ Reader", lambda: [Reader(*row) for row in conn.execute(reader_query)], size // 10)
+    conn.close()
+
+class LegacyRecursiveLoanBST(LoanBST):
+    """The recursive insert/search LoanBST used before the iterative rewrite."""
+    def insert(self, loan_record):
+        self.root = self._insert_recursive(self.root, loan_record.loan_id, loan_record)
+
+    def _insert_recursive(self, node, key, record):
+        if node is None:
+            return TreeNode(key, record)
+        if key < node.key:
+            node.left = self._insert_recursive(node.left, key, record)
+        else:
+            node.right = self._insert_recursive(node.right, key, record)
+        node.height = 1 + max(self._get_height(node.left), self._get_height(node.right))
+        balance = self._get_balance(node)
+        if balance > 1 and key < node.left.key:
+            return self._rotate_right(node)
+        if balance < -1 and key > node.right.key:
+            return self._rotate_left(node)
+        if balance > 1 and key > node.left.key:
+            node.left = self._rotate_left(node.left)
+            return self._rotate_right(node)
+        if balance < -1 and key < node.right.key:
+            node.right = self._rotate_right(node.right)
+            return self._rotate_left(node)
+        return node
+
+    def search(self, key):
+        return self._search_recursive(self.root, key)
+
+    def _search_recursive(self, node, key):
+        if node is None or node.key == key:
+            return node.value if node else None
+        return self._search_recursive(node.left, key) if key < node.key else self._search_recursive(node.right, key)
+
+def benchmark_loan_tree_build(sizes=(10000, 100000, 500000)):
+    print("\n--- Building LoanBST from loans sorted by loan_id ---")
+    today = datetime.now()
+    for size in sizes:
+        loans = [LoanRecord(i, "RD00001", "ISBN00001", today, today) for i in range(size)]
+        legacy_tree = LegacyRecursiveLoanBST()
+        measure_per_op(f"Recursive insert loop, {size} loans", lambda: [legacy_tree.insert(l) for l in loans], size)
+        tree = LoanBST()
+        measure_per_op(f"Iterative insert loop, {size} loans", lambda: [tree.insert(l) for l in loans], size)
+        bulk_tree = LoanBST()
+        measure_per_op(f"bulk_load, {size} loans", lambda: bulk_tree.bulk_load(loans), size)
+        measure_per_op(f"Recursive search, {size} loans", lambda: [legacy_tree.search(l.loan_id) for l in loans], size)
+        measure_per_op(f"Iterative search, {size} loans", lambda: [bulk_tree.search(l.loan_id) for l in loans], size)
+
+def benchmark_avl_churn(n_ops=2000000, live_keys=100000, check_every=250000):
+    """Interleaved inserts/deletes; the tree height must stay within the AVL bound."""
+    print(f"\n--- AVL churn: {n_ops} interleaved inserts/deletes ---")
+    rng = random.Random(42)
+    today = datetime.now()
+    tree = LoanBST()
+    present = []
+    next_id = 0
+    max_height_seen = 0
+    start_time = time.perf_counter()
+    for op in range(1, n_ops + 1):
+        if len(present) < live_keys and (not present or rng.random() < 0.55):
+            # Mostly ascending IDs like real loans, the worst case for rotations
+            tree.insert(LoanRecord(next_id, "RD00001", "ISBN00001", today, today))
+            present.append(next_id)
+            next_id += 1
+        else:
+            index = rng.randrange(len(present))
+            present[index], present[-1] = present[-1], present[index]
+            tree.delete(present.pop())
+        if op % check_every == 0:
+            stats = tree.stats()
+            max_height_seen = max(max_height_seen, stats["height"])
+            assert stats["height"] <= stats["avl_height_bound"], stats
+            print(f"  after {op} ops: size={stats['size']} height={stats['height']} "
+                  f"bound={stats['avl_height_bound']:.1f} balance=[{stats['min_balance']}, {stats['max_balance']}]")
+    elapsed = time.perf_counter() - start_time
+    tree.validate()
+    print(f"{'AVL churn total':<60} | Time: {elapsed:.6f} s | Per op: {elapsed / n_ops * 1e9:.0f} ns | Max height: {max_height_seen}")
+
+def generate_books(n):
+    return [Book(f"ISBN{i:05}", f"Title{i}", "Genre", f"Author{i}", 2000+i%20, i%10+1) for i in range(n)]
+
+def generate_readers(n):
+    return [Reader(f"RD{i:05}", f"Name{i}", "2000-01-01", f"Address{i}") for i in range(n)]
+
+def generate_loans(n):
+    today = datetime.now()
+    return [
+        LoanRecord(i, f"RD{i%100:05}", f"ISBN{i%100:05}", today - timedelta(days=i%30), today + timedelta(days=14))
+        for i in range(n)
+    ]
+
+if __name__ == "__main__":
+    for size in sample_sizes:
+        print(f"\n--- Benchmark for size: {size} ---")
+
+        # BOOK HASH TABLE
+        books = generate_books(size)
+        book_table = HashTable()
+        measure_performance(f"Insert {size} books to HashTable", lambda: [book_table.insert(b.isbn, b) for b in books])
+        measure_performance(f"Search {size} books in HashTable", lambda: [book_table.search(b.isbn) for b in books])
+        measure_performance(f"Delete {size} books from HashTable", lambda: [book_table.delete(b.isbn) for b in books])
+        [book_table.insert(b.isbn, b) for b in books]
+        measure_performance(f"Update {size} books in HashTable", lambda: [book_table.insert(b.isbn, b) for b in books])
+        measure_performance(f"get_all_values() with {size} books", book_table.get_all_values)
+        measure_performance(f"Sort books by title (merge sort)", lambda: self_implemented_merge_sort(book_table.get_all_values(), key_func=lambda b: b.title))
+
+        # BOOK OPEN-ADDRESSING HASH TABLE
+        oa_book_table = OpenAddressingHashTable()
+        measure_performance(f"Insert {size} books to OpenAddressingHashTable", lambda: [oa_book_table.insert(b.isbn, b) for b in books])
+        measure_performance(f"Search {size} books in OpenAddressingHashTable", lambda: [oa_book_table.search(b.isbn) for b in books])
+        measure_performance(f"Delete {size} books from OpenAddressingHashTable", lambda: [oa_book_table.delete(b.isbn) for b in books])
+        [oa_book_table.insert(b.isbn, b) for b in books]
+        measure_performance(f"Update {size} books in OpenAddressingHashTable", lambda: [oa_book_table.insert(b.isbn, b) for b in books])
+
+        # READER HASH TABLE
+        readers = generate_readers(size)
+        reader_table = HashTable()
+        measure_performance(f"Insert {size} readers to HashTable", lambda: [reader_table.insert(r.reader_id, r) for r in readers])
+        measure_performance(f"Search {size} readers in HashTable", lambda: [reader_table.search(r.reader_id) for r in readers])
+        measure_performance(f"Delete {size} readers from HashTable", lambda: [reader_table.delete(r.reader_id) for r in readers])
+        [reader_table.insert(r.reader_id, r) for r in readers]
+        measure_performance(f"Update {size} readers in HashTable", lambda: [reader_table.insert(r.reader_id, r) for r in readers])
+        measure_performance(f"get_all_values() with {size} readers", reader_table.get_all_values)
+        measure_performance(f"Sort readers by name (merge sort)", lambda: self_implemented_merge_sort(reader_table.get_all_values(), key_func=lambda r: r.name))
+
+        # LOAN AVL TREE
+        loans = generate_loans(size)
+        loan_tree = LoanBST()
+        measure_performance(f"Insert {size} loans to AVL Tree", lambda: [loan_tree.insert(l) for l in loans])
+        measure_performance(f"Search {size} loans in AVL Tree", lambda: [loan_tree.search(l.loan_id) for l in loans])
+        measure_performance(f"Delete {size} loans from AVL Tree", lambda: [loan_tree.delete(l.loan_id) for l in loans])
+        [loan_tree.insert(l) for l in loans]
+        measure_performance(f"Inorder traversal of {size} loans", loan_tree.inorder)
+        measure_performance(f"Sort loans by due_date", lambda: self_implemented_merge_sort(loan_tree.inorder(), key_func=lambda l: l.due_ts))
+
+        # STATISTICS
+        measure_performance(f"Count ISBN frequencies from {size} loans", lambda: self_implemented_count_frequencies(loans, "isbn"))
+        measure_performance(f"Count reader frequencies from {size} loans", lambda: self_implemented_count_frequencies(loans, "reader_id"))
+        measure_performance(f"Count ISBN frequencies (open addressing)", lambda: self_implemented_count_frequencies(loans, "isbn", hash_engine="open_addressing"))
+
+    benchmark_key_hashing()
+    benchmark_loan_loading()
+    benchmark_schema_migrations()
+    check_loan_date_migration()
+    check_due_date_queue()
+    check_loan_manager_sync()
+    benchmark_loan_lookups()
+    benchmark_record_memory()
+    benchmark_title_search()
+    benchmark_accent_insensitive_search()
+    benchmark_prefix_completion()
+    benchmark_book_sorting()
+    check_catalog_delete()
+    benchmark_merge_sort()
+    benchmark_top_n()
+    benchmark_aggregation()
+    benchmark_statistics_counters()
+    check_statistics_engine_parity()
+    benchmark_statistics_engines()
+    check_background_refresh()
+    benchmark_background_refresh()
+    benchmark_loan_tree_build()
+    benchmark_avl_churn()
+
+    # Resizing table vs. fixed capacity (fixed only up to 10k: its chains
+    # degenerate into linear scans at larger sizes)
+    benchmark_hashtable_scaling("resizing (load_factor=0.75)", HashTable)
+    benchmark_hashtable_scaling("resizing + shrink (min_load_factor=0.2)", lambda: HashTable(min_load_factor=0.2))
+    benchmark_hashtable_scaling("open addressing (load_factor=0.6)", OpenAddressingHashTable)
+    benchmark_hashtable_scaling("fixed capacity=100", lambda: HashTable(load_factor=float("inf")), sizes=[1000, 10000])
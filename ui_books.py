@@ -1,370 +1,323 @@
-import tkinter as tk
-from tkinter import ttk, messagebox
-from tkinter import font
-import sqlite3
-import csv
-
-# =============================
-# HashTable và Book Class để quản lý nội bộ
-# =============================
-
-class HashNode:
-    def __init__(self, key, value):
-        self.key = key
-        self.value = value
-        self.next = None
-
-class LinkedListForHash:
-    def __init__(self):
-        self.head = None
-
-    def insert(self, key, value):
-        node = self.head
-        while node:
-            if node.key == key:
-                node.value = value
-                return
-            node = node.next
-        new_node = HashNode(key, value)
-        new_node.next = self.head
-        self.head = new_node
-
-    def search(self, key):
-        node = self.head
-        while node:
-            if node.key == key:
-                return node.value
-            node = node.next
-        return None
-
-    def delete(self, key):
-        prev = None
-        node = self.head
-        while node:
-            if node.key == key:
-                if prev:
-                    prev.next = node.next
-                else:
-                    self.head = node.next
-                return
-            prev = node
-            node = node.next
-
-    def get_all_key_value_pairs(self):
-        result = []
-        node = self.head
-        while node:
-            result.append((node.key, node.value))
-            node = node.next
-        return result
-
-class HashTable:
-    def __init__(self, capacity=100):
-        self.capacity = capacity
-        self.size = 0
-        self.table = [LinkedListForHash() for _ in range(capacity)]
-
-    def _hash_function(self, key):
-        key = str(key)  # Ensure key is a string
-        hash_value = 0
-        for char in key:
-            hash_value = (hash_value * 31 + ord(char)) % self.capacity
-        return hash_value
-
-    def insert(self, key, value):
-        index = self._hash_function(key)
-        if self.table[index].search(key) is None:
-            self.size += 1
-        self.table[index].insert(key, value)
-
-    def search(self, key):
-        index = self._hash_function(key)
-        return self.table[index].search(key)
-
-    def delete(self, key):
-        index = self._hash_function(key)
-        if self.table[index].search(key) is not None:
-            self.size -= 1
-        self.table[index].delete(key)
-
-    def get_all_values(self):
-        result = []
-        for bucket in self.table:
-            result.extend([value for _, value in bucket.get_all_key_value_pairs()])
-        return result
-
-class Book:
-    def __init__(self, isbn, title, genre, author, year, quantity):
-        self.isbn = isbn
-        self.title = title
-        self.genre = genre
-        self.author = author
-        self.year = year
-        self.quantity = quantity
-        self.available_quantity = quantity
-
-    def __str__(self):
-        return f"{self.isbn} | {self.title} | {self.genre}| {self.author} | {self.year} | {self.quantity} | {self.available_quantity}"
-
-    def __eq__(self, other):
-        return isinstance(other, Book) and self.isbn == other.isbn
-
-    def __hash__(self):
-        return hash(self.isbn)
-
-# =============================
-# Giao diện quản lý sách
-# =============================
-
-def create_book_tab(notebook, conn):
-    tab = ttk.Frame(notebook)
-    notebook.add(tab, text="📚 Quản lý Sách")
-
-    book_table = HashTable()
-
-    cursor = conn.cursor()
-    for row in cursor.execute("SELECT * FROM books"):
-        book = Book(row[0], row[1], row[2], row[3], row[4], row[5])
-        book.available_quantity = row[6]
-        book_table.insert(book.isbn, book)
-
-    labels = ["ISBN", "Tiêu đề", "Thể loại","Tác giả", "Năm xuất bản", "Số lượng"]
-    entries = {}
-    for i, label in enumerate(labels):
-        tk.Label(tab, text=label).grid(row=i, column=0, padx=5, pady=5, sticky="e")
-        entry = tk.Entry(tab)
-        entry.grid(row=i, column=1, padx=5, pady=5, sticky="ew") # Changed sticky to "ew" for entries
-        entries[label] = entry
-        if i == 2:
-            genres = ["Khoa học", "Văn học", "Thiếu nhi", "Giáo trình", "Tiểu thuyết", "Lịch sử", "Tâm lý", "Khác"]
-            tk.Label(tab, text="Thể loại").grid(row=2, column=0, padx=5, pady=5, sticky="e")
-            genre_combobox = ttk.Combobox(tab, values=genres, state="readonly")
-            genre_combobox.grid(row=2, column=1, padx=5, pady=5, sticky="ew")
-            entries["Thể loại"] = genre_combobox
-
-
-    tree = ttk.Treeview(tab, columns=("ISBN", "Tiêu đề","Thể loại", "Tác giả", "Năm xuất bản", "SL", "Còn"), show="headings")
-    for col in tree["columns"]:
-        tree.heading(col, text=col, anchor="center")
-        # Set a minimum width for columns to prevent them from becoming too narrow
-        tree.column(col, width=tk.font.Font().measure(col) + 20, minwidth=50, stretch=True) # Added minwidth and stretch
-    
-    # Configure the column where the treeview is placed to expand horizontally
-    tab.grid_columnconfigure(2, weight=1) # The treeview is in column 2
-    
-    tree.grid(row=0, column=2, rowspan=15, padx=15, pady=5, sticky="nsew") # Adjusted rowspan and row to 0 to align with top
-    
-    # Add scrollbar to the Treeview
-    scrollbar_y = ttk.Scrollbar(tab, orient="vertical", command=tree.yview)
-    scrollbar_y.grid(row=0, column=3, rowspan=15, sticky="ns")
-    tree.configure(yscrollcommand=scrollbar_y.set)
-
-    scrollbar_x = ttk.Scrollbar(tab, orient="horizontal", command=tree.xview)
-    scrollbar_x.grid(row=15, column=2, sticky="ew") # Placed scrollbar_x in a new row below the treeview
-    tree.configure(xscrollcommand=scrollbar_x.set)
-
-    def reload_from_database():
-        # Xóa toàn bộ dữ liệu trong bảng băm
-        for i in range(book_table.capacity):
-            book_table.table[i] = LinkedListForHash()
-        book_table.size = 0
-        cur = conn.cursor()
-        # Truy vấn lại dữ liệu từ SQLite và chèn vào bảng băm
-        for row in cursor.execute("SELECT * FROM books"):
-            book = Book(*row[:6])
-            book.available_quantity = row[6]
-            book_table.insert(book.isbn, book)
-
-        # Cập nhật lại Treeview
-        refresh_tree()
-
-    def refresh_tree():
-        tree.delete(*tree.get_children())
-        for book in book_table.get_all_values():
-            tree.insert("", "end", values=(book.isbn, book.title, book.genre, book.author, book.year, book.quantity, book.available_quantity))
-
-    def add_book():
-        isbn = entries["ISBN"].get().strip()
-        title = entries["Tiêu đề"].get().strip()
-        genre = entries["Thể loại"].get().strip() or "Khác"
-        author = entries["Tác giả"].get().strip()
-        try:
-            year = int(entries["Năm xuất bản"].get().strip())
-            quantity = int(entries["Số lượng"].get().strip())
-        except ValueError:
-            messagebox.showerror("Lỗi", "Năm xuất bản và Số lượng phải là số nguyên")
-            return
-
-        if book_table.search(isbn):
-            messagebox.showerror("Lỗi", "Sách đã tồn tại trong hệ thống")
-            return
-
-        book = Book(isbn, title,genre, author, year, quantity)
-        book_table.insert(isbn, book)
-        cursor.execute("INSERT INTO books VALUES (?, ?, ?,?, ?, ?, ?)", (isbn, title, genre, author, year, quantity, quantity))
-        conn.commit()
-        messagebox.showinfo("Thành công", "Đã thêm sách")
-        refresh_tree()
-
-    def delete_book():
-        selected = tree.selection()
-        if not selected:
-            messagebox.showerror("Lỗi", "Vui lòng chọn sách để xóa.")
-            return
-        isbn = str(tree.item(selected[0])["values"][0])
-         # Duyệt toàn bộ bảng loans để kiểm tra sách đang được mượn
-        cursor.execute("SELECT * FROM loans")
-        loan_rows = cursor.fetchall()
-        for row in loan_rows:
-            loan_isbn = str(row[2])      # cột thứ 3 là isbn
-            loan_status = str(row[6])    # cột thứ 7 là status
-            if loan_isbn == isbn and loan_status == "Đang mượn":
-                messagebox.showwarning("Không thể xóa", "Sách này hiện đang được mượn và không thể xóa.")
-                return
-        if book_table.search(isbn):
-            book_table.delete(isbn)
-        cursor.execute("DELETE FROM books WHERE isbn = ?", (isbn,))
-        conn.commit()
-        reload_from_database()
-        messagebox.showinfo("Thành công", "Đã xóa sách")
-
-    def update_book():
-        selected = tree.selection()
-        if not selected:
-            messagebox.showerror("Lỗi", "Chọn sách để cập nhật")
-            return
-        isbn = entries["ISBN"].get().strip()
-        genre = entries["Thể loại"].get().strip() or "Khác"
-        title = entries["Tiêu đề"].get().strip()
-        author = entries["Tác giả"].get().strip()
-        try:
-            year = int(entries["Năm xuất bản"].get().strip())
-            quantity = int(entries["Số lượng"].get().strip())
-        except ValueError:
-            messagebox.showerror("Lỗi", "Năm xuất bản và Số lượng phải là số")
-            return
-        book = book_table.search(isbn)
-        if not book:
-            messagebox.showerror("Lỗi", "Không tìm thấy sách để cập nhật")
-            return
-
-        diff = quantity - book.quantity
-        book.title = title
-        book.genre = entries.get("Thể loại", "Không xác định")  # Optional field, default to "Không xác định"
-        book.author = author
-        book.year = year
-        book.quantity = quantity
-        book.available_quantity += diff
-        book_table.insert(isbn, book) # Re-insert to update in hash table if key is the same
-
-        cursor.execute("UPDATE books SET title=?, genre=?, author=?, year=?, quantity=?, available_quantity=? WHERE isbn=?",
-                       (title, genre, author, year, quantity, book.available_quantity, isbn))
-        conn.commit()
-        refresh_tree()
-        messagebox.showinfo("Thành công", "Đã cập nhật sách")
-    
-    def load_selected_book(event):
-        selected = tree.selection()
-        if selected:
-            values = tree.item(selected[0])["values"]
-            for i, key in enumerate(labels):
-                entries[key].delete(0, tk.END)
-                entries[key].insert(0, values[i])
-
-    def search_books(table):
-        keyword = search_entry.get().strip().lower()
-        mode = search_type.get()
-        result = []
-        for book in table.get_all_values():
-            if mode == "ISBN" and keyword in book.isbn.lower():
-                result.append(book)
-            elif mode == "Tiêu đề" and keyword in book.title.lower():
-                result.append(book)
-            elif mode == "Tác giả" and keyword in book.author.lower():
-                result.append(book)
-
-        tree.delete(*tree.get_children())
-        for book in result:
-            tree.insert("", "end", values=(book.isbn, book.title, book.genre, book.author, book.year, book.quantity, book.available_quantity))
-
-    def sort_books(table,tree):
-        books = table.get_all_values()
-        mode = sort_type.get()
-        reverse = False
-        if mode == "Tiêu đề (A-Z)":
-            key_func = lambda book: book.title.lower()
-        elif mode == "Tiêu đề (Z-A)":
-            key_func = lambda book: book.title.lower()
-            reverse = True
-        elif mode == "ISBN (tăng dần)":
-            key_func = lambda book: book.isbn
-        elif mode == "ISBN (giảm dần)":
-            key_func = lambda book: book.isbn
-            reverse = True
-        else:
-            key_func = lambda book: book.title.lower()   # fallback
-
-        def merge_sort(arr):
-            if len(arr) <= 1:
-                return arr
-            mid = len(arr) // 2
-            left = merge_sort(arr[:mid])
-            right = merge_sort(arr[mid:])
-            return merge(left, right)
-
-        def merge(left, right):
-            result = []
-            i = j = 0
-            while i < len(left) and j < len(right):
-                if (key_func(left[i]) <= key_func(right[j]) and not reverse) or \
-           (key_func(left[i]) > key_func(right[j]) and reverse):
-                    result.append(left[i])
-                    i += 1
-                else:
-                    result.append(right[j])
-                    j += 1
-            result.extend(left[i:])
-            result.extend(right[j:])
-            return result
-            return result
-        sorted_books = merge_sort(books)
-        print(sorted_books)
-        tree.delete(*tree.get_children())
-        for book in sorted_books:
-            tree.insert("", "end", values=(book.isbn, book.title, book.genre, book.author, book.year, book.quantity, book.available_quantity))       
-    def export_to_csv():
-        with open("books_export.csv", "w", newline="", encoding="utf-8") as f:
-            writer = csv.writer(f)
-            writer.writerow(["ISBN", "Tiêu đề", "Tác giả", "Năm xuất bản", "Số lượng", "Còn lại"])
-            for book in book_table.get_all_values():
-                writer.writerow([book.isbn, book.title, book.genre, book.author, book.year, book.quantity, book.available_quantity])
-        messagebox.showinfo("Xuất CSV", "Đã lưu file books_export.csv")
-
-    # Layout buttons
-    tk.Button(tab, text="Thêm",bg="white", command=add_book).grid(row=6, column=0, pady=10, sticky="ew", columnspan=2)
-    tk.Button(tab, text="Xóa", bg="white",command=delete_book).grid(row=7, column=0, pady=5, sticky="ew", columnspan=2)
-    tk.Button(tab, text="Cập nhật", bg="white",command=update_book).grid(row=8, column=0, pady=5, sticky="ew", columnspan=2)
-    tk.Button(tab, text="Xuất CSV", bg="white",command=export_to_csv).grid(row=9, column=0, pady=5, sticky="ew", columnspan=2)
-    tk.Button(tab, text="Làm mới",bg="white", command=reload_from_database).grid(row=10, column=0, pady=5, sticky="ew", columnspan=2)
-
-    # Search section
-    tk.Label(tab, text="Tìm theo:").grid(row=11, column=0, sticky="e", padx=5, pady=5)
-    search_type = ttk.Combobox(tab, values=["ISBN", "Tiêu đề", "Tác giả"])
-    search_type.set("Tiêu đề")
-    search_type.grid(row=11, column=1, pady=5, sticky="ew")
-    
-    tk.Label(tab, text="Từ khóa:").grid(row=12, column=0, sticky="e", padx=5, pady=5)
-    search_entry = tk.Entry(tab)
-    search_entry.grid(row=12, column=1, pady=5, sticky="ew")
-    tk.Button(tab, text="Tìm kiếm", bg="white", command=lambda: search_books(book_table)).grid(row=13, column=0, pady=5, sticky="ew", columnspan=2)
-
-    # Sort section
-    tk.Label(tab, text="Sắp xếp theo:").grid(row=14, column=0, sticky="e", padx=5, pady=5)
-    sort_type = ttk.Combobox(tab, values=["Tiêu đề (A-Z)", "Tiêu đề (Z-A)", "ISBN (tăng dần)", "ISBN (giảm dần)"])
-    sort_type.set("Tiêu đề (A-Z)")
-    sort_type.grid(row=14, column=1, pady=5, sticky="ew")
-    tk.Button(tab, text="Sắp xếp", bg="white", command=lambda: sort_books(book_table,tree)).grid(row=15, column=0, pady=5, sticky="ew", columnspan=2)
-
-
-    tree.bind("<ButtonRelease-1>", load_selected_book)
-    refresh_tree()
+import tkinter as tk
+from tkinter import ttk, messagebox
+from tkinter import font
+import sqlite3
+import csv
+
+from hashing import create_hash_table, intern_text
+from indexes import PrefixIndex, SortedView, TrigramIndex, normalize_search_text
+
+# =============================
+# Book Class để quản lý nội bộ
+# =============================
+
+class Book:
+    # __slots__: không có __dict__ riêng cho mỗi đối tượng, tiết kiệm bộ nhớ khi catalog lớn
+    __slots__ = ("isbn", "title", "genre", "author", "year", "quantity", "available_quantity",
+                 "title_key", "author_key")
+
+    def __init__(self, isbn, title, genre, author, year, quantity):
+        self.isbn = isbn
+        self.title = intern_text(title)
+        self.genre = intern_text(genre)
+        self.author = intern_text(author)
+        self.year = year
+        self.quantity = quantity
+        self.available_quantity = quantity
+        self.refresh_search_keys()
+
+    def refresh_search_keys(self):
+        """Khóa tìm kiếm không dấu, tính một lần khi nạp/sửa thay vì lower() ở mỗi lần tìm."""
+        self.title_key = normalize_search_text(self.title)
+        self.author_key = normalize_search_text(self.author)
+
+    def __str__(self):
+        return f"{self.isbn} | {self.title} | {self.genre}| {self.author} | {self.year} | {self.quantity} | {self.available_quantity}"
+
+    def __eq__(self, other):
+        return isinstance(other, Book) and self.isbn == other.isbn
+
+    def __hash__(self):
+        return hash(self.isbn)
+
+# Kiểu sắp xếp (giá trị của combobox) -> (tên danh sách đã sắp xếp, giảm dần?)
+BOOK_SORT_MODES = {
+    "Tiêu đề (A-Z)": ("title", False),
+    "Tiêu đề (Z-A)": ("title", True),
+    "ISBN (tăng dần)": ("isbn", False),
+    "ISBN (giảm dần)": ("isbn", True),
+}
+
+# Kiểu tìm kiếm (giá trị của combobox) -> trường được đánh chỉ mục n-gram
+# (khóa đã chuẩn hóa bằng normalize_search_text)
+BOOK_SEARCH_FIELDS = {
+    "ISBN": lambda book: normalize_search_text(book.isbn),
+    "Tiêu đề": lambda book: book.title_key,
+    "Tác giả": lambda book: book.author_key,
+}
+
+class BookCatalog:
+    """
+    Bảng băm sách cùng các chỉ mục luôn được cập nhật theo: n-gram cho từng kiểu tìm kiếm,
+    danh sách đã sắp xếp theo từng tiêu chí (SortedView) và chỉ mục ISBN dùng chung.
+    add/remove chỉ cập nhật đúng cuốn sách đó; chỉ load() mới dựng lại toàn bộ.
+    """
+    def __init__(self, hash_engine="chaining", isbn_index=None):
+        self.books = create_hash_table(hash_engine)
+        # Danh sách ISBN đã sắp xếp, dùng chung với tab Mượn/Trả để gợi ý khi nhập (xem Home.py.py)
+        self.isbn_index = isbn_index if isbn_index is not None else PrefixIndex()
+        # Tìm không phân biệt dấu: "nguyen" khớp "Nguyễn"
+        self.search_indexes = {mode: TrigramIndex(normalize=normalize_search_text) for mode in BOOK_SEARCH_FIELDS}
+        self.sorted_views = {
+            "title": SortedView(lambda book: book.title.lower(), lambda book: book.isbn),
+            "isbn": SortedView(lambda book: book.isbn, lambda book: book.isbn),
+        }
+
+    def _index_for_search(self, book):
+        for mode, get_key in BOOK_SEARCH_FIELDS.items():
+            self.search_indexes[mode].add_normalized(book.isbn, get_key(book))
+
+    def load(self, cursor):
+        """Nạp lại toàn bộ từ bảng books: sắp xếp một lần, sau đó cập nhật dần."""
+        self.books.clear()
+        for index in self.search_indexes.values():
+            index.clear()
+        for row in cursor.execute("SELECT * FROM books"):
+            book = Book(*row[:6])
+            book.available_quantity = row[6]
+            self.books.insert(book.isbn, book)
+            self._index_for_search(book)
+        self.isbn_index.reset(book.isbn for book in self.books.get_all_values())
+        for view in self.sorted_views.values():
+            view.reset(self.books.get_all_values())
+
+    def add(self, book):
+        """Thêm sách, hoặc đưa sách vừa sửa (tiêu đề/tác giả có thể đã đổi) về đúng chỗ trong các chỉ mục."""
+        self.books.insert(book.isbn, book)
+        self._index_for_search(book)
+        for view in self.sorted_views.values():
+            view.add(book)
+        self.isbn_index.add(book.isbn)
+
+    update = add
+
+    def remove(self, isbn):
+        """Bỏ một cuốn sách khỏi bảng băm và mọi chỉ mục. Trả về False nếu không có."""
+        if not self.books.search(isbn):
+            return False
+        self.books.delete(isbn)
+        for index in self.search_indexes.values():
+            index.remove(isbn)
+        for view in self.sorted_views.values():
+            view.remove(isbn)
+        self.isbn_index.remove(isbn)
+        return True
+
+# =============================
+# Giao diện quản lý sách
+# =============================
+
+def create_book_tab(notebook, conn, hash_engine="chaining", isbn_index=None):
+    tab = ttk.Frame(notebook)
+    notebook.add(tab, text="📚 Quản lý Sách")
+
+    # Bảng băm sách + chỉ mục tìm kiếm + danh sách đã sắp xếp, luôn cập nhật cùng nhau
+    catalog = BookCatalog(hash_engine, isbn_index)
+    book_table = catalog.books
+    search_indexes = catalog.search_indexes
+    sorted_views = catalog.sorted_views
+
+    cursor = conn.cursor()
+    catalog.load(cursor)
+
+    labels = ["ISBN", "Tiêu đề", "Thể loại","Tác giả", "Năm xuất bản", "Số lượng"]
+    entries = {}
+    for i, label in enumerate(labels):
+        tk.Label(tab, text=label).grid(row=i, column=0, padx=5, pady=5, sticky="e")
+        entry = tk.Entry(tab)
+        entry.grid(row=i, column=1, padx=5, pady=5, sticky="ew") # Changed sticky to "ew" for entries
+        entries[label] = entry
+        if i == 2:
+            genres = ["Khoa học", "Văn học", "Thiếu nhi", "Giáo trình", "Tiểu thuyết", "Lịch sử", "Tâm lý", "Khác"]
+            tk.Label(tab, text="Thể loại").grid(row=2, column=0, padx=5, pady=5, sticky="e")
+            genre_combobox = ttk.Combobox(tab, values=genres, state="readonly")
+            genre_combobox.grid(row=2, column=1, padx=5, pady=5, sticky="ew")
+            entries["Thể loại"] = genre_combobox
+
+
+    tree = ttk.Treeview(tab, columns=("ISBN", "Tiêu đề","Thể loại", "Tác giả", "Năm xuất bản", "SL", "Còn"), show="headings")
+    for col in tree["columns"]:
+        tree.heading(col, text=col, anchor="center")
+        # Set a minimum width for columns to prevent them from becoming too narrow
+        tree.column(col, width=tk.font.Font().measure(col) + 20, minwidth=50, stretch=True) # Added minwidth and stretch
+    
+    # Configure the column where the treeview is placed to expand horizontally
+    tab.grid_columnconfigure(2, weight=1) # The treeview is in column 2
+    
+    tree.grid(row=0, column=2, rowspan=15, padx=15, pady=5, sticky="nsew") # Adjusted rowspan and row to 0 to align with top
+    
+    # Add scrollbar to the Treeview
+    scrollbar_y = ttk.Scrollbar(tab, orient="vertical", command=tree.yview)
+    scrollbar_y.grid(row=0, column=3, rowspan=15, sticky="ns")
+    tree.configure(yscrollcommand=scrollbar_y.set)
+
+    scrollbar_x = ttk.Scrollbar(tab, orient="horizontal", command=tree.xview)
+    scrollbar_x.grid(row=15, column=2, sticky="ew") # Placed scrollbar_x in a new row below the treeview
+    tree.configure(xscrollcommand=scrollbar_x.set)
+
+    def reload_from_database():
+        # Truy vấn lại dữ liệu từ SQLite, dựng lại bảng băm và mọi chỉ mục
+        catalog.load(cursor)
+
+        # Cập nhật lại Treeview
+        refresh_tree()
+
+    def refresh_tree():
+        tree.delete(*tree.get_children())
+        for book in book_table.get_all_values():
+            tree.insert("", "end", values=(book.isbn, book.title, book.genre, book.author, book.year, book.quantity, book.available_quantity))
+
+    def add_book():
+        isbn = entries["ISBN"].get().strip()
+        title = entries["Tiêu đề"].get().strip()
+        genre = entries["Thể loại"].get().strip() or "Khác"
+        author = entries["Tác giả"].get().strip()
+        try:
+            year = int(entries["Năm xuất bản"].get().strip())
+            quantity = int(entries["Số lượng"].get().strip())
+        except ValueError:
+            messagebox.showerror("Lỗi", "Năm xuất bản và Số lượng phải là số nguyên")
+            return
+
+        if book_table.search(isbn):
+            messagebox.showerror("Lỗi", "Sách đã tồn tại trong hệ thống")
+            return
+
+        book = Book(isbn, title,genre, author, year, quantity)
+        catalog.add(book)
+        cursor.execute("INSERT INTO books VALUES (?, ?, ?,?, ?, ?, ?)", (isbn, title, genre, author, year, quantity, quantity))
+        conn.commit()
+        messagebox.showinfo("Thành công", "Đã thêm sách")
+        refresh_tree()
+
+    def delete_book():
+        selected = tree.selection()
+        if not selected:
+            messagebox.showerror("Lỗi", "Vui lòng chọn sách để xóa.")
+            return
+        isbn = str(tree.item(selected[0])["values"][0])
+        # Tra qua chỉ mục idx_loans_isbn, dừng ở phiếu "Đang mượn" đầu tiên thay vì đọc cả bảng loans
+        cursor.execute("SELECT 1 FROM loans WHERE isbn = ? AND status = 'Đang mượn' LIMIT 1", (isbn,))
+        if cursor.fetchone():
+            messagebox.showwarning("Không thể xóa", "Sách này hiện đang được mượn và không thể xóa.")
+            return
+        # Chỉ bỏ đúng cuốn sách này khỏi bảng băm, chỉ mục tìm kiếm, danh sách đã sắp xếp
+        # và chỉ mục ISBN dùng chung, không nạp lại cả bảng books
+        catalog.remove(isbn)
+        cursor.execute("DELETE FROM books WHERE isbn = ?", (isbn,))
+        conn.commit()
+        refresh_tree()
+        messagebox.showinfo("Thành công", "Đã xóa sách")
+
+    def update_book():
+        selected = tree.selection()
+        if not selected:
+            messagebox.showerror("Lỗi", "Chọn sách để cập nhật")
+            return
+        isbn = entries["ISBN"].get().strip()
+        genre = entries["Thể loại"].get().strip() or "Khác"
+        title = entries["Tiêu đề"].get().strip()
+        author = entries["Tác giả"].get().strip()
+        try:
+            year = int(entries["Năm xuất bản"].get().strip())
+            quantity = int(entries["Số lượng"].get().strip())
+        except ValueError:
+            messagebox.showerror("Lỗi", "Năm xuất bản và Số lượng phải là số")
+            return
+        book = book_table.search(isbn)
+        if not book:
+            messagebox.showerror("Lỗi", "Không tìm thấy sách để cập nhật")
+            return
+
+        diff = quantity - book.quantity
+        book.title = intern_text(title)
+        book.genre = intern_text(genre)  # Giá trị của combobox (mặc định "Khác"), không phải bản thân widget
+        book.author = intern_text(author)
+        book.refresh_search_keys()
+        book.year = year
+        book.quantity = quantity
+        book.available_quantity += diff
+        catalog.update(book) # Tiêu đề/tác giả có thể đã đổi
+
+        cursor.execute("UPDATE books SET title=?, genre=?, author=?, year=?, quantity=?, available_quantity=? WHERE isbn=?",
+                       (title, genre, author, year, quantity, book.available_quantity, isbn))
+        conn.commit()
+        refresh_tree()
+        messagebox.showinfo("Thành công", "Đã cập nhật sách")
+    
+    def load_selected_book(event):
+        selected = tree.selection()
+        if selected:
+            values = tree.item(selected[0])["values"]
+            for i, key in enumerate(labels):
+                entries[key].delete(0, tk.END)
+                entries[key].insert(0, values[i])
+
+    def search_books(table):
+        keyword = search_entry.get().strip()
+        mode = search_type.get()
+        result = []
+        if mode in search_indexes:
+            # Giao các posting list n-gram thay vì duyệt và lower() toàn bộ catalog
+            for isbn in search_indexes[mode].search(keyword):
+                book = table.search(isbn)
+                if book:
+                    result.append(book)
+
+        tree.delete(*tree.get_children())
+        for book in result:
+            tree.insert("", "end", values=(book.isbn, book.title, book.genre, book.author, book.year, book.quantity, book.available_quantity))
+
+    def sort_books(table,tree):
+        # Danh sách đã được giữ sẵn theo thứ tự: chỉ cần hiển thị, không sắp xếp lại
+        view_name, reverse = BOOK_SORT_MODES.get(sort_type.get(), ("title", False))
+        sorted_books = sorted_views[view_name].values(reverse)
+        tree.delete(*tree.get_children())
+        for book in sorted_books:
+            tree.insert("", "end", values=(book.isbn, book.title, book.genre, book.author, book.year, book.quantity, book.available_quantity))
+    def export_to_csv():
+        with open("books_export.csv", "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["ISBN", "Tiêu đề", "Tác giả", "Năm xuất bản", "Số lượng", "Còn lại"])
+            for book in book_table.get_all_values():
+                writer.writerow([book.isbn, book.title, book.genre, book.author, book.year, book.quantity, book.available_quantity])
+        messagebox.showinfo("Xuất CSV", "Đã lưu file books_export.csv")
+
+    # Layout buttons
+    tk.Button(tab, text="Thêm",bg="white", command=add_book).grid(row=6, column=0, pady=10, sticky="ew", columnspan=2)
+    tk.Button(tab, text="Xóa", bg="white",command=delete_book).grid(row=7, column=0, pady=5, sticky="ew", columnspan=2)
+    tk.Button(tab, text="Cập nhật", bg="white",command=update_book).grid(row=8, column=0, pady=5, sticky="ew", columnspan=2)
+    tk.Button(tab, text="Xuất CSV", bg="white",command=export_to_csv).grid(row=9, column=0, pady=5, sticky="ew", columnspan=2)
+    tk.Button(tab, text="Làm mới",bg="white", command=reload_from_database).grid(row=10, column=0, pady=5, sticky="ew", columnspan=2)
+
+    # Search section
+    tk.Label(tab, text="Tìm theo:").grid(row=11, column=0, sticky="e", padx=5, pady=5)
+    search_type = ttk.Combobox(tab, values=["ISBN", "Tiêu đề", "Tác giả"])
+    search_type.set("Tiêu đề")
+    search_type.grid(row=11, column=1, pady=5, sticky="ew")
+    
+    tk.Label(tab, text="Từ khóa:").grid(row=12, column=0, sticky="e", padx=5, pady=5)
+    search_entry = tk.Entry(tab)
+    search_entry.grid(row=12, column=1, pady=5, sticky="ew")
+    tk.Button(tab, text="Tìm kiếm", bg="white", command=lambda: search_books(book_table)).grid(row=13, column=0, pady=5, sticky="ew", columnspan=2)
+
+    # Sort section
+    tk.Label(tab, text="Sắp xếp theo:").grid(row=14, column=0, sticky="e", padx=5, pady=5)
+    sort_type = ttk.Combobox(tab, values=["Tiêu đề (A-Z)", "Tiêu đề (Z-A)", "ISBN (tăng dần)", "ISBN (giảm dần)"])
+    sort_type.set("Tiêu đề (A-Z)")
+    sort_type.grid(row=14, column=1, pady=5, sticky="ew")
+    tk.Button(tab, text="Sắp xếp", bg="white", command=lambda: sort_books(book_table,tree)).grid(row=15, column=0, pady=5, sticky="ew", columnspan=2)
+
+
+    tree.bind("<ButtonRelease-1>", load_selected_book)
+    refresh_tree()
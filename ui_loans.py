@@ -1,534 +1,1217 @@
-import tkinter as tk
-from tkinter import ttk, messagebox
-import sqlite3
-from datetime import datetime, timedelta
-import sys
-import io
-
-# Cấu hình in Unicode ra console nếu chạy trên Windows
-sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
-
-# ===================================================
-# Cấu trúc dữ liệu: Phiếu mượn sách & BST (có AVL logic)
-# ===================================================
-
-class LoanRecord:
-    def __init__(self, loan_id, reader_id, isbn, borrow_date, due_date, return_date=None, status="Đang mượn", book_title=None, reader_name=None):
-        self.loan_id = loan_id
-        self.reader_id = reader_id
-        self.isbn = isbn
-        self.borrow_date = datetime.strptime(borrow_date, "%Y-%m-%d %H:%M:%S.%f") if isinstance(borrow_date, str) else borrow_date
-        self.due_date = datetime.strptime(due_date, "%Y-%m-%d %H:%M:%S.%f") if isinstance(due_date, str) else due_date
-        self.return_date = datetime.strptime(return_date, "%Y-%m-%d %H:%M:%S.%f") if isinstance(return_date, str) and return_date != "None" else return_date
-        self.status = status
-        self.book_title = book_title
-        self.reader_name = reader_name
-
-    def to_tuple(self):
-        return (self.loan_id, self.reader_id, self.isbn,
-                self.borrow_date.strftime("%Y-%m-%d %H:%M:%S.%f") if self.borrow_date else None,
-                self.due_date.strftime("%Y-%m-%d %H:%M:%S.%f") if self.due_date else None,
-                self.return_date.strftime("%Y-%m-%d %H:%M:%S.%f") if self.return_date else None,
-                self.status)
-
-    def __str__(self):
-        return (f"ID Phiếu: {self.loan_id}, Bạn đọc ID: {self.reader_id} ({self.reader_name}), "
-                f"ISBN: {self.isbn} ({self.book_title}), "
-                f"Ngày mượn: {self.borrow_date.strftime('%Y-%m-%d')}, Ngày trả: {self.due_date.strftime('%Y-%m-%d')}, "
-                f"Ngày thực trả: {self.return_date.strftime('%Y-%m-%d') if self.return_date else 'N/A'}, "
-                f"Trạng thái: {self.status}")
-
-class TreeNode:
-    def __init__(self, key, value):
-        self.key = key
-        self.value = value
-        self.left = None
-        self.right = None
-        self.height = 1
-
-class LoanBST:
-    def __init__(self):
-        self.root = None
-
-    def _get_height(self, node):
-        return node.height if node else 0
-
-    def _get_balance(self, node):
-        return self._get_height(node.left) - self._get_height(node.right) if node else 0
-
-    def _rotate_left(self, z):
-        y = z.right
-        T2 = y.left
-        y.left = z
-        z.right = T2
-        z.height = 1 + max(self._get_height(z.left), self._get_height(z.right))
-        y.height = 1 + max(self._get_height(y.left), self._get_height(y.right))
-        return y
-
-    def _rotate_right(self, y):
-        x = y.left
-        T2 = x.right
-        x.right = y
-        y.left = T2
-        y.height = 1 + max(self._get_height(y.left), self._get_height(y.right))
-        x.height = 1 + max(self._get_height(x.left), self._get_height(x.right))
-        return x
-
-    def insert(self, loan_record):
-        self.root = self._insert_recursive(self.root, loan_record.loan_id, loan_record)
-
-    def _insert_recursive(self, node, key, record):
-        if node is None:
-            return TreeNode(key, record)
-
-        if key < node.key:
-            node.left = self._insert_recursive(node.left, key, record)
-        else:
-            node.right = self._insert_recursive(node.right, key, record)
-
-        node.height = 1 + max(self._get_height(node.left), self._get_height(node.right))
-        balance = self._get_balance(node)
-
-        # AVL Balancing
-        if balance > 1 and key < node.left.key:
-            return self._rotate_right(node)
-        if balance < -1 and key > node.right.key:
-            return self._rotate_left(node)
-        if balance > 1 and key > node.left.key:
-            node.left = self._rotate_left(node.left)
-            return self._rotate_right(node)
-        if balance < -1 and key < node.right.key:
-            node.right = self._rotate_right(node.right)
-            return self._rotate_left(node)
-
-        return node
-
-    def search(self, key):
-        return self._search_recursive(self.root, key)
-
-    def _search_recursive(self, node, key):
-        if node is None or node.key == key:
-            return node.value if node else None
-        return self._search_recursive(node.left, key) if key < node.key else self._search_recursive(node.right, key)
-
-    def delete(self, key):
-        self.root = self._delete_recursive(self.root, key)
-
-    def _delete_recursive(self, node, key):
-        if not node:
-            return node
-        if key < node.key:
-            node.left = self._delete_recursive(node.left, key)
-        elif key > node.key:
-            node.right = self._delete_recursive(node.right, key)
-        else:
-            if not node.left:
-                return node.right
-            elif not node.right:
-                return node.left
-            temp = self._min_value_node(node.right)
-            node.key, node.value = temp.key, temp.value
-            node.right = self._delete_recursive(node.right, temp.key)
-        node.height = 1 + max(self._get_height(node.left), self._get_height(node.right))
-        return node
-
-    def _min_value_node(self, node):
-        while node.left:
-            node = node.left
-        return node
-
-    def inorder(self):
-        result = []
-        self._inorder_recursive(self.root, result)
-        return result
-
-    def _inorder_recursive(self, node, result):
-        if node:
-            self._inorder_recursive(node.left, result)
-            result.append(node.value)
-            self._inorder_recursive(node.right, result)
-
-class LoanManager:
-    def __init__(self, conn):
-        self.conn = conn
-        self.cursor = conn.cursor()
-        self.loans = LoanBST()
-        self._load_loans_from_db()
-
-    def _load_loans_from_db(self):
-        self.loans = LoanBST() # Reset BST
-        self.cursor.execute("SELECT * FROM loans")
-        rows = self.cursor.fetchall()
-        for row in rows:
-            loan_id, reader_id, isbn, borrow_date_str, due_date_str, return_date_str, status = row
-            
-            # Lấy tên sách và tên bạn đọc
-            self.cursor.execute("SELECT title FROM books WHERE isbn = ?", (isbn,))
-            book_title_result = self.cursor.fetchone()
-            book_title = book_title_result[0] if book_title_result else "N/A"
-
-            self.cursor.execute("SELECT name FROM readers WHERE reader_id = ?", (reader_id,))
-            reader_name_result = self.cursor.fetchone()
-            reader_name = reader_name_result[0] if reader_name_result else "N/A"
-
-            borrow_date = datetime.strptime(borrow_date_str, "%Y-%m-%d %H:%M:%S.%f")
-            due_date = datetime.strptime(due_date_str, "%Y-%m-%d %H:%M:%S.%f")
-            return_date = datetime.strptime(return_date_str, "%Y-%m-%d %H:%M:%S.%f") if return_date_str else None
-            
-            # Truyền thêm book_title và reader_name vào LoanRecord
-            loan = LoanRecord(loan_id, reader_id, isbn, borrow_date, due_date, return_date, status, book_title, reader_name)
-            self.loans.insert(loan)
-
-    def _get_next_loan_id(self):
-        self.cursor.execute("SELECT loan_id FROM loans")
-        rows = self.cursor.fetchall()
-        max_id = 0
-        for row in rows:
-            loan_id = row[0]
-            if loan_id > max_id:
-                max_id = loan_id
-        return max_id + 1
-
-
-    def _reader_exists(self, reader_id):
-        self.cursor.execute("SELECT 1 FROM readers WHERE reader_id = ?", (reader_id,))
-        return self.cursor.fetchone() is not None
-
-    def _book_exists(self, isbn):
-        self.cursor.execute("SELECT 1 FROM books WHERE isbn = ?", (isbn,))
-        return self.cursor.fetchone() is not None
-
-    # Hàm bổ sung để kiểm tra sách đang được mượn bởi bạn đọc
-    def _is_book_currently_borrowed_by_reader(self, reader_id, isbn):
-        # Không dùng SQLite, chỉ duyệt qua dữ liệu trong RAM (BST)
-        all_loans = self.loans.inorder()
-        for loan in all_loans:
-            if loan.reader_id == reader_id and loan.isbn == isbn and loan.status == "Đang mượn":
-                return True
-        return False
-
-    def add_loan(self, reader_id, isbn, duedays):
-        # Tải lại dữ liệu để đảm bảo BST có trạng thái mới nhất từ DB
-        # (quan trọng vì các thao tác ở các tab khác có thể thay đổi DB)
-        self._load_loans_from_db() 
-
-        if not self._reader_exists(reader_id):
-            messagebox.showerror("Lỗi", f"Mã bạn đọc '{reader_id}' không tồn tại.")
-            return False
-        if not self._book_exists(isbn):
-            messagebox.showerror("Lỗi", f"Mã ISBN '{isbn}' không tồn tại.")
-            return False
-        
-        # --- BỔ SUNG LOGIC KIỂM TRA TẠI ĐÂY ---
-        if self._is_book_currently_borrowed_by_reader(reader_id, isbn):
-            messagebox.showerror("Lỗi", f"Bạn đọc '{reader_id}' đang mượn sách có ISBN '{isbn}' và chưa trả.")
-            return False
-        # ------------------------------------
-
-        self.cursor.execute("SELECT available_quantity FROM books WHERE isbn = ?", (isbn,))
-        result = self.cursor.fetchone()
-        if result and result[0] > 0:
-            loan_id = self._get_next_loan_id()
-            borrow_date = datetime.now()
-            due_date = borrow_date + timedelta(days=duedays)
-
-            # Lấy tên sách và tên bạn đọc ngay khi tạo phiếu mượn
-            self.cursor.execute("SELECT title FROM books WHERE isbn = ?", (isbn,))
-            book_title_result = self.cursor.fetchone()
-            book_title = book_title_result[0] if book_title_result else "N/A"
-
-            self.cursor.execute("SELECT name FROM readers WHERE reader_id = ?", (reader_id,))
-            reader_name_result = self.cursor.fetchone()
-            reader_name = reader_name_result[0] if reader_name_result else "N/A"
-
-            loan = LoanRecord(loan_id, reader_id, isbn, borrow_date, due_date, book_title=book_title, reader_name=reader_name)
-            self.loans.insert(loan)
-            self.cursor.execute("INSERT INTO loans (loan_id, reader_id, isbn, borrow_date, due_date, status) VALUES (?, ?, ?, ?, ?, ?)",
-                (loan_id, reader_id, isbn, borrow_date.strftime("%Y-%m-%d %H:%M:%S.%f"),
-                 due_date.strftime("%Y-%m-%d %H:%M:%S.%f"), "Đang mượn"))
-            self.cursor.execute("UPDATE books SET available_quantity = available_quantity - 1 WHERE isbn = ?", (isbn,))
-            self.conn.commit()
-            messagebox.showinfo("Thành công", "Đã tạo phiếu mượn.")
-            return True
-        else:
-            messagebox.showerror("Lỗi", "Không còn sách để cho mượn.")
-            return False
-
-    def return_loan(self, loan_id):
-        record = self.loans.search(loan_id)
-        if record and record.status == "Đang mượn":
-            record.return_date = datetime.now()
-            record.status = "Đã trả"
-            self.cursor.execute("UPDATE loans SET return_date=?, status=? WHERE loan_id=?",
-                (record.return_date.strftime("%Y-%m-%d %H:%M:%S.%f"), record.status, loan_id))
-            self.cursor.execute("UPDATE books SET available_quantity = available_quantity + 1 WHERE isbn = ?", (record.isbn,))
-            self.conn.commit()
-            # Cập nhật lại BST trong RAM sau khi trả sách thành công
-            self._load_loans_from_db() 
-            return True
-        return False
-
-    def get_all_loans(self):
-        self._load_loans_from_db() # Reload to ensure latest book/reader names are fetched
-        return self.loans.inorder()
-
-    def get_loan_history_by_reader(self, reader_id):
-        self._load_loans_from_db() # Reload
-        return [loan for loan in self.get_all_loans() if loan.reader_id == reader_id]
-
-    def get_loan_history_by_isbn(self, isbn):
-        self._load_loans_from_db() # Reload
-        return [loan for loan in self.get_all_loans() if loan.isbn == isbn]
-
-    def get_current_loans_by_reader(self, reader_id):
-        self._load_loans_from_db() # Reload
-        return [loan for loan in self.get_all_loans() if loan.reader_id == reader_id and loan.status == "Đang mượn"]
-
-    def get_overdue_loans(self):
-        self._load_loans_from_db() # Reload
-        today = datetime.now()
-        return [loan for loan in self.get_all_loans() if loan.status == "Đang mượn" and loan.due_date < today]
-
-    def count_loans_by_isbn(self):
-        self._load_loans_from_db() # Reload
-        stats = {}
-        for loan in self.get_all_loans():
-            stats[f"{loan.isbn} - {loan.book_title}"] = stats.get(f"{loan.isbn} - {loan.book_title}", 0) + 1 # Bao gồm tên sách
-        return stats
-
-    def delete_loan(self, loan_id):
-        record = self.loans.search(loan_id)
-        if record and record.status != "Đang mượn":
-            self.loans.delete(loan_id)
-            self.cursor.execute("DELETE FROM loans WHERE loan_id = ?", (loan_id,))
-            self.conn.commit()
-            # Cập nhật lại BST trong RAM sau khi xóa thành công
-            self._load_loans_from_db()
-            return True
-        return False
-
-    def get_loan_details(self, loan_id):
-        self._load_loans_from_db() # Reload
-        return self.loans.search(loan_id)
-
-
-# ============================\
-# Giao diện quản lý mượn/trả sách (hoàn chỉnh)
-# ============================\
-
-def create_loan_tab(notebook, loan_manager):
-    tab = ttk.Frame(notebook)
-    notebook.add(tab, text="📬 Quản lý Mượn/Trả")
-
-    # Khung nhập liệu
-    input_frame = ttk.LabelFrame(tab, text="Thông tin phiếu mượn")
-    input_frame.grid(row=0, column=0, columnspan=2, padx=10, pady=10, sticky="ew")
-
-    tk.Label(input_frame, text="Mã bạn đọc:").grid(row=0, column=0, padx=5, pady=5, sticky="w")
-    reader_id_entry = tk.Entry(input_frame)
-    reader_id_entry.grid(row=0, column=1, padx=5, pady=5, sticky="ew")
-
-    tk.Label(input_frame, text="Mã ISBN sách:").grid(row=1, column=0, padx=5, pady=5, sticky="w")
-    isbn_entry = tk.Entry(input_frame)
-    isbn_entry.grid(row=1, column=1, padx=5, pady=5, sticky="ew")
-
-    tk.Label(input_frame, text="ID Phiếu Mượn:").grid(row=2, column=0, padx=5, pady=5, sticky="w")
-    loan_id_entry = tk.Entry(input_frame)
-    loan_id_entry.grid(row=2, column=1, padx=5, pady=5, sticky="ew")
-    tk.Label(input_frame, text="Số ngày mượn:").grid(row=3, column=0, padx=5, pady=5, sticky="w")
-
-# Ô nhập số ngày mượn
-    duedays_entry = tk.Entry(input_frame)
-    duedays_entry.grid(row=3, column=1, padx=5, pady=5, sticky="ew")
-    # Khung hiển thị kết quả
-    output_frame = ttk.LabelFrame(tab, text="Kết quả")
-    output_frame.grid(row=1, column=0, columnspan=2, padx=10, pady=10, sticky="nsew")
-    tab.grid_rowconfigure(1, weight=1)
-    tab.grid_columnconfigure(0, weight=1)
-
-    columns = ("loan_id", "reader_id", "reader_name", "isbn", "book_title", "borrow_date", "due_date", "return_date", "status")
-    tree = ttk.Treeview(output_frame, columns=columns, show="headings")
-
-    # Thiết lập tên cột và độ rộng
-    tree.heading("loan_id", text="ID")
-    tree.column("loan_id", width=50, anchor="center")
-
-    tree.heading("reader_id", text="Mã bạn đọc")
-    tree.column("reader_id", width=100)
-
-    tree.heading("reader_name", text="Tên bạn đọc")
-    tree.column("reader_name", width=150)
-
-    tree.heading("isbn", text="ISBN")
-    tree.column("isbn", width=120)
-
-    tree.heading("book_title", text="Tên sách")
-    tree.column("book_title", width=200)
-
-    tree.heading("borrow_date", text="Ngày mượn")
-    tree.column("borrow_date", width=100)
-
-    tree.heading("due_date", text="Hạn trả")
-    tree.column("due_date", width=100)
-
-    tree.heading("return_date", text="Ngày trả")
-    tree.column("return_date", width=100)
-
-    tree.heading("status", text="Trạng thái")
-    tree.column("status", width=100)
-
-    # Thêm thanh cuộn
-    scrollbar_y = ttk.Scrollbar(output_frame, orient="vertical", command=tree.yview)
-    scrollbar_y.pack(side="right", fill="y")
-    tree.configure(yscroll=scrollbar_y.set)
-
-    scrollbar_x = ttk.Scrollbar(output_frame, orient="horizontal", command=tree.xview)
-    scrollbar_x.pack(side="bottom", fill="x")
-    tree.configure(xscroll=scrollbar_x.set)
-
-    tree.pack(fill="both", expand=True)
-
-
-    def display_loans(loans):
-        for row in tree.get_children():
-            tree.delete(row)
-        if not loans:
-            messagebox.showinfo("Thông báo", "Không có dữ liệu.")
-            return
-        for loan in loans:
-            tree.insert("", "end", values=(
-                loan.loan_id,
-                loan.reader_id,
-                loan.reader_name,
-                loan.isbn,
-                loan.book_title,
-                loan.borrow_date.strftime('%Y-%m-%d'),
-                loan.due_date.strftime('%Y-%m-%d'),
-                loan.return_date.strftime('%Y-%m-%d') if loan.return_date else "N/A",
-                loan.status
-        ))
-
-
-    def display_loan_counts(counts):
-        # Xóa tất cả cột cũ
-        for col in tree["columns"]:
-            tree.heading(col, text="")
-            tree.column(col, width=0)
-        tree["columns"] = ("isbn_title", "count")
-
-        tree.heading("isbn_title", text="ISBN - Tên sách")
-        tree.column("isbn_title", width=400)
-
-        tree.heading("count", text="Số lượt mượn")
-        tree.column("count", width=100, anchor="center")
-
-        # Xóa dữ liệu cũ
-        for row in tree.get_children():
-            tree.delete(row)
-
-        if not counts:
-            messagebox.showinfo("Thông báo", "Không có dữ liệu.")
-            return
-
-    # Thêm dữ liệu mới
-        for isbn_title, count in counts.items():
-            tree.insert("", "end", values=(isbn_title, count))
-
-
-    def create_loan():
-        # Đảm bảo các giá trị được strip để tránh khoảng trắng
-        reader_id = reader_id_entry.get().strip()
-        isbn = isbn_entry.get().strip()
-        value = duedays_entry.get().strip()
-        duedays = int(value) if value else 30
-        if loan_manager.add_loan(reader_id, isbn,duedays):
-            # Sau khi thêm thành công, cần cập nhật lại Treeview
-            display_loans(loan_manager.get_all_loans())
-
-    def return_book():
-        try:
-            loan_id = int(loan_id_entry.get().strip())
-            if loan_manager.return_loan(loan_id):
-                messagebox.showinfo("Thành công", "Đã trả sách.")
-                display_loans(loan_manager.get_all_loans()) # Refresh list after successful return
-            else:
-                messagebox.showerror("Lỗi", "Không thể trả sách. Có thể phiếu mượn không tồn tại hoặc đã được trả.")
-        except ValueError:
-            messagebox.showerror("Lỗi", "ID phiếu mượn không hợp lệ.")
-
-    def delete_loan():
-        selected = tree.selection()
-        if selected:
-            try:
-            # Lấy loan_id từ dòng đang chọn trên TreeView
-                loan_id = int(tree.item(selected[0])["values"][0])
-            except (IndexError, ValueError):
-                messagebox.showerror("Lỗi", "Không thể đọc ID phiếu mượn từ bảng.")
-                return
-        else:
-            # Nếu không chọn dòng nào, lấy từ ô nhập liệu
-            try:
-                loan_id = int(loan_id_entry.get().strip())
-            except ValueError:
-                messagebox.showerror("Lỗi", "ID phiếu mượn không hợp lệ.")
-                return
-        # Gọi hàm xóa
-        if loan_manager.delete_loan(loan_id):
-            messagebox.showinfo("Thành công", "Đã xoá phiếu mượn.")
-            display_loans(loan_manager.get_all_loans()) # Refresh list after successful deletion
-        else:
-            messagebox.showerror("Lỗi", "Không thể xoá phiếu mượn. Chỉ có thể xoá phiếu đã trả.")
-
-
-    def search_by_reader():
-        display_loans(loan_manager.get_loan_history_by_reader(reader_id_entry.get().strip()))
-
-    def search_by_isbn():
-        display_loans(loan_manager.get_loan_history_by_isbn(isbn_entry.get().strip()))
-
-    def show_current_loans():
-        display_loans(loan_manager.get_current_loans_by_reader(reader_id_entry.get().strip()))
-
-    def show_overdue():
-        display_loans(loan_manager.get_overdue_loans())
-
-    def show_statistics():
-        display_loan_counts(loan_manager.count_loans_by_isbn())
-    original_columns = columns  # columns = ("loan_id", "reader_id", ..., "status")
-    original_column_config = {
-    "loan_id": {"text": "ID", "width": 50, "anchor": "center"},
-    "reader_id": {"text": "Mã bạn đọc", "width": 100},
-    "reader_name": {"text": "Tên bạn đọc", "width": 150},
-    "isbn": {"text": "ISBN", "width": 120},
-    "book_title": {"text": "Tên sách", "width": 200},
-    "borrow_date": {"text": "Ngày mượn", "width": 100},
-    "due_date": {"text": "Hạn trả", "width": 100},
-    "return_date": {"text": "Ngày trả", "width": 100},
-    "status": {"text": "Trạng thái", "width": 100},
-}
-    def reset_treeview_columns():
-        tree["columns"] = original_columns
-        for col in original_columns:
-            cfg = original_column_config[col]
-            tree.heading(col, text=cfg["text"])
-            tree.column(col, width=cfg.get("width", 100), anchor=cfg.get("anchor", "w"))
-
-    def show_all():
-        reset_treeview_columns()  # Reset lại cấu hình cột
-        display_loans(loan_manager.get_all_loans())
-
-    # Các nút chức năng
-    button_frame = ttk.Frame(tab)
-    button_frame.grid(row=2, column=0, columnspan=2, pady=5)
-
-    ttk.Button(button_frame, text="Tạo phiếu mượn", command=create_loan).grid(row=0, column=0, padx=2)
-    ttk.Button(button_frame, text="Trả sách", command=return_book).grid(row=0, column=1, padx=2)
-    ttk.Button(button_frame, text="Xoá phiếu mượn", command=delete_loan).grid(row=0, column=2, padx=2)
-    ttk.Button(button_frame, text="Tìm theo bạn đọc", command=search_by_reader).grid(row=1, column=0, padx=2)
-    ttk.Button(button_frame, text="Tìm theo ISBN", command=search_by_isbn).grid(row=1, column=1, padx=2)
-    ttk.Button(button_frame, text="Sách đang mượn", command=show_current_loans).grid(row=1, column=2, padx=2)
-    ttk.Button(button_frame, text="Sách quá hạn", command=show_overdue).grid(row=2, column=0, padx=2)
-    ttk.Button(button_frame, text="Thống kê mượn theo ISBN", command=show_statistics).grid(row=2, column=1, padx=2)
-    ttk.Button(button_frame, text="Reset dữ liệu", command=show_all).grid(row=2, column=2, padx=2)
-
-    show_all()
+import tkinter as tk
+from tkinter import ttk, messagebox
+import sqlite3
+from datetime import datetime, timedelta
+import sys
+import io
+import heapq
+import math
+from itertools import islice
+from array import array
+
+from hashing import intern_text
+from indexes import PrefixIndex
+from counters import loan_counts_by_isbn, read_loans_version
+
+# Cấu hình in Unicode ra console nếu chạy trên Windows
+sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+# ===================================================
+# Cấu trúc dữ liệu: Phiếu mượn sách & BST (có AVL logic)
+# ===================================================
+
+# Ngày giờ của phiếu mượn được lưu (trong CSDL và trong LoanRecord) dưới dạng số nguyên:
+# số giây tính từ 1970-01-01 00:00:00 theo giờ địa phương "như ghi trên lịch", không đổi múi giờ.
+# Đây đúng là giá trị CAST(strftime('%s', chuỗi_ngày) AS INTEGER) của SQLite, nên migration 3
+# chuyển dữ liệu cũ ngay trong SQL và các truy vấn SQL có thể dùng date(cột, 'unixepoch').
+# So sánh quá hạn / khoảng ngày là so sánh số nguyên, không phải parse chuỗi mỗi dòng.
+EPOCH = datetime(1970, 1, 1)
+ONE_SECOND = timedelta(seconds=1)
+LEGACY_DATE_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+
+def to_timestamp(value):
+    """int (đã là timestamp), datetime hoặc chuỗi ngày -> số giây kể từ EPOCH; None -> None."""
+    if value is None or type(value) is int:
+        return value
+    if isinstance(value, datetime):
+        return (value - EPOCH) // ONE_SECOND
+    if isinstance(value, str):
+        if value == "None": # Dữ liệu cũ từng ghi chuỗi "None" cho ngày trả
+            return None
+        try:
+            parsed = datetime.fromisoformat(value) # Cài bằng C, nhanh hơn strptime nhiều lần
+        except ValueError:
+            parsed = datetime.strptime(value, LEGACY_DATE_FORMAT)
+        return (parsed - EPOCH) // ONE_SECOND
+    return int(value)
+
+def from_timestamp(timestamp):
+    return EPOCH + timedelta(seconds=timestamp) if timestamp is not None else None
+
+# Trạng thái phiếu lưu trong LoanRecord dưới dạng mã số nhỏ (chỉ số trong LOAN_STATUSES)
+# thay vì một chuỗi tiếng Việt trên mỗi phiếu; thuộc tính status vẫn trả về chuỗi.
+LOAN_STATUSES = ["Đang mượn", "Đã trả", "Quá hạn"]
+_LOAN_STATUS_CODES = {status: code for code, status in enumerate(LOAN_STATUSES)}
+
+def loan_status_code(status):
+    code = _LOAN_STATUS_CODES.get(status)
+    if code is None: # Trạng thái lạ trong CSDL: cấp mã mới thay vì làm mất dữ liệu
+        code = len(LOAN_STATUSES)
+        LOAN_STATUSES.append(status)
+        _LOAN_STATUS_CODES[status] = code
+    return code
+
+class LoanRecord:
+    __slots__ = ("loan_id", "reader_id", "isbn", "borrow_ts", "due_ts", "return_ts",
+                 "status_code", "book_title", "reader_name")
+
+    def __init__(self, loan_id, reader_id, isbn, borrow_date, due_date, return_date=None, status="Đang mượn", book_title=None, reader_name=None):
+        self.loan_id = loan_id
+        self.reader_id = intern_text(reader_id)
+        self.isbn = intern_text(isbn)
+        # Nhận int (từ CSDL), datetime hoặc chuỗi; luôn lưu timestamp nguyên
+        self.borrow_ts = to_timestamp(borrow_date)
+        self.due_ts = to_timestamp(due_date)
+        self.return_ts = to_timestamp(return_date)
+        self.status_code = loan_status_code(status)
+        self.book_title = intern_text(book_title)
+        self.reader_name = intern_text(reader_name)
+
+    @property
+    def status(self):
+        return LOAN_STATUSES[self.status_code]
+
+    @status.setter
+    def status(self, value):
+        self.status_code = loan_status_code(value)
+
+    # datetime chỉ được tạo khi cần hiển thị
+    @property
+    def borrow_date(self):
+        return from_timestamp(self.borrow_ts)
+
+    @property
+    def due_date(self):
+        return from_timestamp(self.due_ts)
+
+    @property
+    def return_date(self):
+        return from_timestamp(self.return_ts)
+
+    @return_date.setter
+    def return_date(self, value):
+        self.return_ts = to_timestamp(value)
+
+    def to_tuple(self):
+        return (self.loan_id, self.reader_id, self.isbn, self.borrow_ts, self.due_ts, self.return_ts, self.status)
+
+    def __str__(self):
+        return (f"ID Phiếu: {self.loan_id}, Bạn đọc ID: {self.reader_id} ({self.reader_name}), "
+                f"ISBN: {self.isbn} ({self.book_title}), "
+                f"Ngày mượn: {self.borrow_date.strftime('%Y-%m-%d')}, Ngày trả: {self.due_date.strftime('%Y-%m-%d')}, "
+                f"Ngày thực trả: {self.return_date.strftime('%Y-%m-%d') if self.return_date else 'N/A'}, "
+                f"Trạng thái: {self.status}")
+
+class LoanColumns:
+    """
+    Kho phiếu mượn dạng cột cho thống kê: mỗi trường là một array kiểu C liền mạch
+    (8 byte/giá trị thay vì một đối tượng Python), mã bạn đọc/ISBN được mã hóa thành
+    chỉ số trong bảng chuỗi riêng. Chỉ để đọc/đếm; thêm/sửa/xóa vẫn qua LoanManager.
+    """
+    NO_TIMESTAMP = -(2 ** 63) # Giá trị thay cho None ở cột return_ts
+
+    def __init__(self):
+        self.loan_ids = array("q")
+        self.borrow_ts = array("q")
+        self.due_ts = array("q")
+        self.return_ts = array("q")
+        self.status_codes = array("b")
+        self.reader_codes = array("l")
+        self.isbn_codes = array("l")
+        self.reader_ids = []   # mã -> reader_id
+        self.isbns = []        # mã -> isbn
+        self._reader_code_of = {}
+        self._isbn_code_of = {}
+
+    @classmethod
+    def from_records(cls, records):
+        columns = cls()
+        for loan in records:
+            columns.append(loan)
+        return columns
+
+    def __len__(self):
+        return len(self.loan_ids)
+
+    @staticmethod
+    def _encode(value, values, code_of):
+        code = code_of.get(value)
+        if code is None:
+            code = code_of[value] = len(values)
+            values.append(value)
+        return code
+
+    def append(self, loan):
+        self.loan_ids.append(loan.loan_id)
+        self.borrow_ts.append(loan.borrow_ts)
+        self.due_ts.append(loan.due_ts)
+        self.return_ts.append(loan.return_ts if loan.return_ts is not None else self.NO_TIMESTAMP)
+        self.status_codes.append(loan.status_code)
+        self.reader_codes.append(self._encode(loan.reader_id, self.reader_ids, self._reader_code_of))
+        self.isbn_codes.append(self._encode(loan.isbn, self.isbns, self._isbn_code_of))
+
+    @staticmethod
+    def _count_codes(codes, labels):
+        counts = [0] * len(labels)
+        for code in codes:
+            counts[code] += 1
+        return {label: count for label, count in zip(labels, counts) if count}
+
+    def count_by_status(self):
+        return self._count_codes(self.status_codes, LOAN_STATUSES)
+
+    def count_by_reader(self):
+        return self._count_codes(self.reader_codes, self.reader_ids)
+
+    def count_by_isbn(self):
+        return self._count_codes(self.isbn_codes, self.isbns)
+
+    def count_due_before(self, as_of, status="Đang mượn"):
+        """Số phiếu có trạng thái status và hạn trả < as_of (datetime hoặc timestamp)."""
+        as_of = to_timestamp(as_of)
+        code = _LOAN_STATUS_CODES.get(status)
+        return sum(1 for due_ts, status_code in zip(self.due_ts, self.status_codes)
+                   if status_code == code and due_ts < as_of)
+
+class TreeNode:
+    def __init__(self, key, value):
+        self.key = key
+        self.value = value
+        self.left = None
+        self.right = None
+        self.height = 1
+
+class LoanBST:
+    def __init__(self, key_func=None):
+        # key_func: hàm lấy khóa từ phiếu mượn, mặc định là loan_id.
+        # Khóa phải duy nhất, ví dụ chỉ mục theo ngày dùng (ngày, loan_id).
+        self.key_func = key_func
+        self.root = None
+        self.size = 0
+
+    def _key_of(self, loan_record):
+        return self.key_func(loan_record) if self.key_func else loan_record.loan_id
+
+    def _get_height(self, node):
+        return node.height if node else 0
+
+    def _get_balance(self, node):
+        return self._get_height(node.left) - self._get_height(node.right) if node else 0
+
+    def _update_height(self, node):
+        left_height = node.left.height if node.left else 0
+        right_height = node.right.height if node.right else 0
+        node.height = 1 + (left_height if left_height > right_height else right_height)
+
+    def _rotate_left(self, z):
+        y = z.right
+        T2 = y.left
+        y.left = z
+        z.right = T2
+        z.height = 1 + max(self._get_height(z.left), self._get_height(z.right))
+        y.height = 1 + max(self._get_height(y.left), self._get_height(y.right))
+        return y
+
+    def _rotate_right(self, y):
+        x = y.left
+        T2 = x.right
+        x.right = y
+        y.left = T2
+        y.height = 1 + max(self._get_height(y.left), self._get_height(y.right))
+        x.height = 1 + max(self._get_height(x.left), self._get_height(x.right))
+        return x
+
+    def _rebalance(self, node):
+        """Cập nhật chiều cao và xoay nếu lệch; trả về gốc mới của cây con."""
+        self._update_height(node)
+        balance = self._get_balance(node)
+        if balance > 1:
+            if self._get_balance(node.left) < 0:  # Trường hợp Left-Right
+                node.left = self._rotate_left(node.left)
+            return self._rotate_right(node)
+        if balance < -1:
+            if self._get_balance(node.right) > 0:  # Trường hợp Right-Left
+                node.right = self._rotate_right(node.right)
+            return self._rotate_left(node)
+        return node
+
+    def _replace_child(self, parent, old_child, new_child):
+        if parent is None:
+            self.root = new_child
+        elif parent.left is old_child:
+            parent.left = new_child
+        else:
+            parent.right = new_child
+
+    def _retrace(self, path):
+        """
+        Đi ngược đường dẫn từ nút sâu nhất lên gốc, cân bằng lại từng nút.
+        Dừng sớm khi một cây con không đổi gốc và không đổi chiều cao vì khi đó
+        các tổ tiên phía trên cũng không thay đổi.
+        """
+        for i in range(len(path) - 1, -1, -1):
+            node = path[i]
+            old_height = node.height
+            new_subtree_root = self._rebalance(node)
+            if new_subtree_root is not node:
+                self._replace_child(path[i - 1] if i > 0 else None, node, new_subtree_root)
+            elif node.height == old_height:
+                break
+
+    def insert(self, loan_record):
+        key = self._key_of(loan_record)
+        new_node = TreeNode(key, loan_record)
+        self.size += 1
+        if self.root is None:
+            self.root = new_node
+            return
+        # Tìm vị trí chèn bằng vòng lặp, ghi lại đường đi để cân bằng lại
+        path = []
+        node = self.root
+        while node:
+            path.append(node)
+            node = node.left if key < node.key else node.right
+        parent = path[-1]
+        if key < parent.key:
+            parent.left = new_node
+        else:
+            parent.right = new_node
+        self._retrace(path)
+
+    def search(self, key):
+        node = self.root
+        while node:
+            if key == node.key:
+                return node.value
+            node = node.left if key < node.key else node.right
+        return None
+
+    def delete(self, key):
+        path = []
+        node = self.root
+        while node and node.key != key:
+            path.append(node)
+            node = node.left if key < node.key else node.right
+        if node is None:
+            return
+        self.size -= 1
+        if node.left and node.right:
+            # Hai con: chép nút kế tiếp (nhỏ nhất bên phải) lên rồi xóa nút đó
+            path.append(node)
+            successor = node.right
+            while successor.left:
+                path.append(successor)
+                successor = successor.left
+            node.key, node.value = successor.key, successor.value
+            node = successor
+        child = node.left if node.left else node.right
+        self._replace_child(path[-1] if path else None, node, child)
+        # Cân bằng lại trên đường đi: khác với chèn, sau khi xóa có thể phải
+        # xoay ở nhiều tầng nên _retrace chỉ dừng khi chiều cao không đổi
+        self._retrace(path)
+
+    def _min_value_node(self, node):
+        while node.left:
+            node = node.left
+        return node
+
+    def inorder(self):
+        result = []
+        stack = []
+        node = self.root
+        while stack or node:
+            while node:
+                stack.append(node)
+                node = node.left
+            node = stack.pop()
+            result.append(node.value)
+            node = node.right
+        return result
+
+    def iter_range(self, lo=None, hi=None, reverse=False):
+        """
+        Sinh (lazy) các phiếu mượn có lo <= khóa <= hi (None = không giới hạn),
+        theo thứ tự tăng dần hoặc giảm dần nếu reverse=True.
+        Chỉ giữ một ngăn xếp O(log n); lấy k phần tử đầu tốn O(log n + k).
+        Không được sửa cây trong lúc đang duyệt.
+        """
+        stack = []
+        node = self.root
+        if not reverse:
+            # Xuống nhánh trái, bỏ qua các cây con nằm hoàn toàn dưới lo
+            while node:
+                if lo is not None and node.key < lo:
+                    node = node.right
+                else:
+                    stack.append(node)
+                    node = node.left
+            while stack:
+                node = stack.pop()
+                if hi is not None and node.key > hi:
+                    return
+                yield node.value
+                node = node.right
+                while node:
+                    stack.append(node)
+                    node = node.left
+        else:
+            while node:
+                if hi is not None and node.key > hi:
+                    node = node.left
+                else:
+                    stack.append(node)
+                    node = node.right
+            while stack:
+                node = stack.pop()
+                if lo is not None and node.key < lo:
+                    return
+                yield node.value
+                node = node.left
+                while node:
+                    stack.append(node)
+                    node = node.right
+
+    def count_range(self, lo=None, hi=None):
+        """Số phiếu mượn có lo <= khóa <= hi: O(log n + k)."""
+        count = 0
+        for _ in self.iter_range(lo, hi):
+            count += 1
+        return count
+
+    def iter_from(self, key, reverse=False):
+        """Duyệt từ key trở đi (reverse=True: từ key trở về trước), bao gồm key."""
+        if reverse:
+            return self.iter_range(hi=key, reverse=True)
+        return self.iter_range(lo=key)
+
+    def bulk_load(self, sorted_records):
+        """
+        Thay toàn bộ cây bằng một cây cân bằng hoàn hảo dựng từ các phiếu mượn
+        đã sắp xếp tăng dần theo khóa: O(n), không cần xoay.
+        """
+        records = list(sorted_records)
+        keys = [self._key_of(record) for record in records]
+        for i in range(1, len(keys)):
+            if keys[i] < keys[i - 1]:
+                raise ValueError("bulk_load cần danh sách phiếu mượn đã sắp xếp theo khóa")
+        self.root = self._build_balanced(records, keys, 0, len(records) - 1)
+        self.size = len(records)
+
+    def _build_balanced(self, records, keys, lo, hi):
+        if lo > hi:
+            return None
+        mid = (lo + hi + 1) // 2
+        node = TreeNode(keys[mid], records[mid])
+        node.left = self._build_balanced(records, keys, lo, mid - 1)
+        node.right = self._build_balanced(records, keys, mid + 1, hi)
+        self._update_height(node)
+        return node
+
+    @staticmethod
+    def avl_height_bound(size):
+        """Chiều cao tối đa của một cây AVL có size nút: < 1.4405 * log2(size + 2) - 0.3277."""
+        return 1.4405 * math.log2(size + 2) - 0.3277
+
+    def validate(self):
+        """
+        Kiểm tra toàn bộ bất biến của cây: thứ tự khóa, chiều cao lưu trong nút,
+        hệ số cân bằng trong [-1, 1] và size. Trả về True hoặc raise ValueError.
+        """
+        count = 0
+        previous_key = None
+        stack = []
+        node = self.root
+        while stack or node:
+            while node:
+                stack.append(node)
+                node = node.left
+            node = stack.pop()
+            count += 1
+            if previous_key is not None and node.key < previous_key:
+                raise ValueError(f"Sai thứ tự khóa tại nút {node.key}")
+            previous_key = node.key
+            left_height = self._get_height(node.left)
+            right_height = self._get_height(node.right)
+            if node.height != 1 + max(left_height, right_height):
+                raise ValueError(f"Chiều cao lưu sai tại nút {node.key}")
+            if abs(left_height - right_height) > 1:
+                raise ValueError(f"Nút {node.key} mất cân bằng ({left_height - right_height})")
+            node = node.right
+        if count != self.size:
+            raise ValueError(f"size = {self.size} nhưng cây có {count} nút")
+        return True
+
+    def stats(self):
+        """Chiều cao, số nút và hệ số cân bằng nhỏ nhất/lớn nhất của cây."""
+        min_balance = max_balance = 0
+        stack = [self.root] if self.root else []
+        while stack:
+            node = stack.pop()
+            balance = self._get_balance(node)
+            min_balance = min(min_balance, balance)
+            max_balance = max(max_balance, balance)
+            if node.left:
+                stack.append(node.left)
+            if node.right:
+                stack.append(node.right)
+        height = self._get_height(self.root)
+        return {
+            "size": self.size,
+            "height": height,
+            "avl_height_bound": self.avl_height_bound(self.size),
+            "min_balance": min_balance,
+            "max_balance": max_balance,
+            "is_balanced": min_balance >= -1 and max_balance <= 1,
+        }
+
+# LEFT JOIN để phiếu mượn của sách/bạn đọc đã bị xóa vẫn được nạp (tên = "N/A")
+LOANS_WITH_NAMES_QUERY = """
+    SELECT l.loan_id, l.reader_id, l.isbn, l.borrow_date, l.due_date, l.return_date, l.status,
+           COALESCE(b.title, 'N/A'), COALESCE(r.name, 'N/A')
+    FROM loans l
+    LEFT JOIN books b ON b.isbn = l.isbn
+    LEFT JOIN readers r ON r.reader_id = l.reader_id
+    ORDER BY l.loan_id
+"""
+
+class DueDateQueue:
+    """
+    Hàng đợi ưu tiên (min-heap) các phiếu đang mượn, khóa theo hạn trả.
+    Xóa lười: khi phiếu được trả/xóa chỉ bỏ khỏi _active, phần tử cũ trong heap
+    bị bỏ qua khi duyệt và được dọn khi heap lớn gấp đôi số phiếu đang mượn.
+    """
+    def __init__(self):
+        self._heap = []    # (due_ts, loan_id)
+        self._active = {}  # loan_id -> LoanRecord
+
+    def __len__(self):
+        return len(self._active)
+
+    def push(self, loan):
+        active = self._active.get(loan.loan_id)
+        self._active[loan.loan_id] = loan
+        if active is not None and active.due_ts == loan.due_ts:
+            return # Đã có phần tử (due_ts, loan_id) còn hiệu lực trong heap
+        heapq.heappush(self._heap, (loan.due_ts, loan.loan_id))
+
+    def remove(self, loan_id):
+        if self._active.pop(loan_id, None) is not None and len(self._heap) > 2 * len(self._active) + 64:
+            self._heap = [(loan.due_ts, loan.loan_id) for loan in self._active.values()]
+            heapq.heapify(self._heap)
+
+    def due_before(self, as_of):
+        """
+        Các phiếu đang mượn có hạn trả < as_of (datetime hoặc timestamp), sắp xếp theo hạn trả.
+        Chỉ duyệt phần đầu của heap: con của một nút chỉ được xét khi nút đó
+        đã quá hạn, nên chi phí là O(k log n) với k phiếu quá hạn.
+        """
+        as_of = to_timestamp(as_of)
+        heap = self._heap
+        result = []
+        seen = set() # Phiếu bị xóa rồi thêm lại cùng hạn trả còn phần tử cũ trong heap
+        stack = [0] if heap else []
+        while stack:
+            i = stack.pop()
+            due_ts, loan_id = heap[i]
+            if not due_ts < as_of:
+                continue
+            loan = self._active.get(loan_id)
+            if loan is not None and loan.due_ts == due_ts and loan_id not in seen:
+                seen.add(loan_id)
+                result.append(loan)
+            left = 2 * i + 1
+            if left < len(heap):
+                stack.append(left)
+                if left + 1 < len(heap):
+                    stack.append(left + 1)
+        result.sort(key=due_date_key)
+        return result
+
+LOAN_PAGE_SIZE = 100 # Số phiếu mượn trên một trang của tab Mượn/Trả
+
+def borrow_date_key(loan):
+    return (loan.borrow_ts, loan.loan_id)
+
+def due_date_key(loan):
+    return (loan.due_ts, loan.loan_id)
+
+def date_range_keys(start, end):
+    """
+    Cặp (lo, hi) cho iter_range/count_range trên chỉ mục khóa (ngày, loan_id),
+    ứng với start <= ngày < end: (start,) nhỏ hơn mọi (start, id) và
+    (end,) nhỏ hơn mọi (end, id), nên phiếu đúng ngày end bị loại.
+    start/end là datetime hoặc timestamp.
+    """
+    return (to_timestamp(start),), (to_timestamp(end),)
+
+LOAD_PROGRESS_EVERY = 10000 # Số dòng giữa hai lần báo tiến độ khi nạp dữ liệu
+
+class LoanManager:
+    def __init__(self, conn, load=True):
+        """load=False: chưa nạp phiếu mượn (cây rỗng), để nạp sau bằng reload()."""
+        self.conn = conn
+        self.cursor = conn.cursor()
+        self.loans = LoanBST()
+        self._reset_indexes()
+        # Tăng mỗi khi tập phiếu trong RAM thay đổi (nạp lại, thêm, xóa, đổi trạng thái);
+        # các bộ đệm thống kê dựa trên cây so sánh số này để biết khi nào phải tính lại
+        self.revision = 0
+        self._synced_version = None # Chưa đồng bộ: lần ghi đầu tiên sẽ nạp lại
+        if load:
+            self._load_loans_from_db()
+
+    def reload(self, progress=None):
+        """
+        Nạp lại toàn bộ phiếu mượn từ CSDL (bỏ qua kiểm tra loans_version).
+        progress(số phiếu đã đọc) được gọi sau mỗi LOAD_PROGRESS_EVERY phiếu; ném ngoại lệ
+        trong progress để dừng giữa chừng (khi đó cây dở dang, không dùng tiếp được).
+        """
+        self._load_loans_from_db(progress)
+
+    def attach(self, conn):
+        """
+        Chuyển sang dùng kết nối conn, vd. cây vừa được nạp ở luồng nền trên kết nối riêng.
+        Không biết conn đã thấy thay đổi nào sau lúc nạp nên coi như chưa đồng bộ.
+        """
+        self.conn = conn
+        self.cursor = conn.cursor()
+        self._synced_version = None
+
+    def _reset_indexes(self):
+        # Chỉ mục phụ nằm cạnh cây AVL, giá trị là dict {loan_id: LoanRecord}
+        # (giữ thứ tự chèn = thứ tự loan_id tăng dần)
+        self._loans_by_reader = {}             # reader_id -> {loan_id: record}
+        self._loans_by_isbn = {}               # isbn -> {loan_id: record}
+        self._loans_by_reader_isbn_status = {} # (reader_id, isbn, status) -> {loan_id: record}
+        self.active_loans_by_due = DueDateQueue() # Phiếu "Đang mượn" theo hạn trả
+        # Chỉ mục có thứ tự theo ngày mượn / hạn trả cho truy vấn theo khoảng ngày
+        self.loans_by_borrow_date = LoanBST(key_func=borrow_date_key)
+        self.loans_by_due_date = LoanBST(key_func=due_date_key)
+
+    @staticmethod
+    def _index_add(index, key, loan):
+        bucket = index.get(key)
+        if bucket is None:
+            bucket = index[key] = {}
+        bucket[loan.loan_id] = loan
+
+    @staticmethod
+    def _index_remove(index, key, loan):
+        bucket = index.get(key)
+        if bucket is not None:
+            bucket.pop(loan.loan_id, None)
+            if not bucket:
+                del index[key]
+
+    def _track_loan(self, loan):
+        """Thêm phiếu mượn vào cây và các chỉ mục phụ."""
+        self.revision += 1
+        self.loans.insert(loan)
+        self.loans_by_borrow_date.insert(loan)
+        self.loans_by_due_date.insert(loan)
+        self._index_loan(loan)
+
+    def _index_loan(self, loan):
+        self._index_add(self._loans_by_reader, loan.reader_id, loan)
+        self._index_add(self._loans_by_isbn, loan.isbn, loan)
+        self._index_add(self._loans_by_reader_isbn_status, (loan.reader_id, loan.isbn, loan.status), loan)
+        if loan.status == "Đang mượn":
+            self.active_loans_by_due.push(loan)
+
+    def _untrack_loan(self, loan):
+        """Xóa phiếu mượn khỏi cây và các chỉ mục phụ."""
+        self.revision += 1
+        self.loans.delete(loan.loan_id)
+        self.loans_by_borrow_date.delete(borrow_date_key(loan))
+        self.loans_by_due_date.delete(due_date_key(loan))
+        self._index_remove(self._loans_by_reader, loan.reader_id, loan)
+        self._index_remove(self._loans_by_isbn, loan.isbn, loan)
+        self._index_remove(self._loans_by_reader_isbn_status, (loan.reader_id, loan.isbn, loan.status), loan)
+        self.active_loans_by_due.remove(loan.loan_id)
+
+    def _set_loan_status(self, loan, status):
+        self.revision += 1
+        self._index_remove(self._loans_by_reader_isbn_status, (loan.reader_id, loan.isbn, loan.status), loan)
+        loan.status = status
+        self._index_add(self._loans_by_reader_isbn_status, (loan.reader_id, loan.isbn, loan.status), loan)
+        if status == "Đang mượn":
+            self.active_loans_by_due.push(loan)
+        else:
+            self.active_loans_by_due.remove(loan.loan_id)
+
+    def _load_loans_from_db(self, progress=None):
+        self._read_loans(progress)
+        self._mark_synced()
+
+    def _read_loans(self, progress=None):
+        """Dựng lại cây và các chỉ mục từ bảng loans (không ghi nhận phiên bản đồng bộ)."""
+        self.loans = LoanBST() # Reset BST
+        self._reset_indexes()
+        self.revision += 1
+        # Một truy vấn duy nhất lấy phiếu mượn kèm tên sách và tên bạn đọc.
+        # Duyệt trực tiếp trên cursor (không fetchall) để không giữ toàn bộ
+        # kết quả trong RAM. Dùng cursor riêng vì self.cursor có thể được
+        # dùng lại trong lúc đang duyệt.
+        cursor = self.conn.cursor()
+        cursor.execute(LOANS_WITH_NAMES_QUERY)
+        records = [] # Đã sắp theo loan_id (ORDER BY) nên dựng cây bằng bulk_load
+        for row in cursor:
+            loan_id, reader_id, isbn, borrow_date, due_date, return_date, status, book_title, reader_name = row
+            # Ngày đã là số nguyên (migration 3), LoanRecord giữ nguyên không cần parse.
+            # Truyền thêm book_title và reader_name vào LoanRecord
+            loan = LoanRecord(loan_id, reader_id, isbn, borrow_date, due_date, return_date, status, book_title, reader_name)
+            records.append(loan)
+            self._index_loan(loan)
+            if progress is not None and len(records) % LOAD_PROGRESS_EVERY == 0:
+                progress(len(records))
+        self.loans.bulk_load(records)
+        self.loans_by_borrow_date.bulk_load(sorted(records, key=borrow_date_key))
+        self.loans_by_due_date.bulk_load(sorted(records, key=due_date_key))
+
+    def _db_version(self):
+        # Trigger của migration 5 tăng số này khi phiếu mượn (hoặc tên sách/bạn đọc mà phiếu
+        # hiển thị) thay đổi, từ bất kỳ kết nối nào. Sửa sách/bạn đọc ở các tab dùng chung
+        # conn không đổi số này nên không làm nạp lại toàn bộ phiếu.
+        return read_loans_version(self.conn)
+
+    def _mark_synced(self, version_before_write=None):
+        """
+        Ghi nhận cây đang khớp với CSDL. Sau một lần ghi (đúng một dòng loans), truyền
+        phiên bản đã đồng bộ trước khi ghi: nếu giờ nó tăng hơn 1 thì một quầy khác vừa
+        commit xen vào, cây thiếu thay đổi của họ nên để nguyên trạng thái "cũ" cho lần
+        đọc sau nạp lại.
+        """
+        version = self._db_version()
+        if version_before_write is None or version == version_before_write + 1:
+            self._synced_version = version
+
+    def _refresh_if_stale(self):
+        """Chỉ nạp lại cây khi dữ liệu phiếu mượn đã bị thay đổi từ bên ngoài LoanManager."""
+        if self._db_version() != self._synced_version:
+            self._load_loans_from_db()
+
+    def _reader_exists(self, reader_id):
+        self.cursor.execute("SELECT 1 FROM readers WHERE reader_id = ?", (reader_id,))
+        return self.cursor.fetchone() is not None
+
+    def _book_exists(self, isbn):
+        self.cursor.execute("SELECT 1 FROM books WHERE isbn = ?", (isbn,))
+        return self.cursor.fetchone() is not None
+
+    # Hàm bổ sung để kiểm tra sách đang được mượn bởi bạn đọc
+    def _is_book_currently_borrowed_by_reader(self, reader_id, isbn):
+        # Không dùng SQLite, tra chỉ mục (reader_id, isbn, status) trong RAM: O(1)
+        return (reader_id, isbn, "Đang mượn") in self._loans_by_reader_isbn_status
+
+    def add_loan(self, reader_id, isbn, duedays):
+        # Đồng bộ lại nếu các tab khác / quầy khác đã thay đổi DB
+        self._refresh_if_stale()
+
+        if not self._reader_exists(reader_id):
+            messagebox.showerror("Lỗi", f"Mã bạn đọc '{reader_id}' không tồn tại.")
+            return False
+        if not self._book_exists(isbn):
+            messagebox.showerror("Lỗi", f"Mã ISBN '{isbn}' không tồn tại.")
+            return False
+        
+        # --- BỔ SUNG LOGIC KIỂM TRA TẠI ĐÂY ---
+        if self._is_book_currently_borrowed_by_reader(reader_id, isbn):
+            messagebox.showerror("Lỗi", f"Bạn đọc '{reader_id}' đang mượn sách có ISBN '{isbn}' và chưa trả.")
+            return False
+        # ------------------------------------
+
+        synced_version = self._synced_version
+        # Trừ kho có điều kiện ngay trong câu UPDATE: nếu quầy khác vừa cho mượn cuốn cuối
+        # thì rowcount = 0, không bao giờ để available_quantity xuống âm
+        self.cursor.execute("UPDATE books SET available_quantity = available_quantity - 1 WHERE isbn = ? AND available_quantity > 0", (isbn,))
+        if self.cursor.rowcount == 0:
+            self.conn.rollback()
+            messagebox.showerror("Lỗi", "Không còn sách để cho mượn.")
+            return False
+
+        borrow_ts = to_timestamp(datetime.now())
+        due_ts = borrow_ts + duedays * 86400
+        # Không tự tính loan_id: để SQLite cấp qua AUTOINCREMENT (O(1), không trùng
+        # kể cả khi nhiều quầy cùng ghi vì SQLite tuần tự hóa các giao dịch ghi)
+        self.cursor.execute("INSERT INTO loans (reader_id, isbn, borrow_date, due_date, status) VALUES (?, ?, ?, ?, ?)",
+            (reader_id, isbn, borrow_ts, due_ts, "Đang mượn"))
+        loan_id = self.cursor.lastrowid
+
+        # Lấy tên sách và tên bạn đọc ngay khi tạo phiếu mượn
+        self.cursor.execute("SELECT title FROM books WHERE isbn = ?", (isbn,))
+        book_title_result = self.cursor.fetchone()
+        book_title = book_title_result[0] if book_title_result else "N/A"
+
+        self.cursor.execute("SELECT name FROM readers WHERE reader_id = ?", (reader_id,))
+        reader_name_result = self.cursor.fetchone()
+        reader_name = reader_name_result[0] if reader_name_result else "N/A"
+        self.conn.commit()
+
+        loan = LoanRecord(loan_id, reader_id, isbn, borrow_ts, due_ts, book_title=book_title, reader_name=reader_name)
+        self._track_loan(loan)
+        self._mark_synced(synced_version) # Cây đã được cập nhật trực tiếp, không cần nạp lại
+        messagebox.showinfo("Thành công", "Đã tạo phiếu mượn.")
+        return True
+
+    def return_loan(self, loan_id):
+        self._refresh_if_stale()
+        record = self.loans.search(loan_id)
+        if record and record.status == "Đang mượn":
+            synced_version = self._synced_version
+            return_ts = to_timestamp(datetime.now())
+            # Chỉ trả được phiếu còn "Đang mượn": nếu quầy khác đã trả trước thì rowcount = 0
+            # và không cộng kho lần thứ hai
+            self.cursor.execute("UPDATE loans SET return_date=?, status=? WHERE loan_id=? AND status=?",
+                (return_ts, "Đã trả", loan_id, "Đang mượn"))
+            if self.cursor.rowcount == 0:
+                self.conn.rollback()
+                self._load_loans_from_db()
+                return False
+            self.cursor.execute("UPDATE books SET available_quantity = available_quantity + 1 WHERE isbn = ?", (record.isbn,))
+            self.conn.commit()
+            # record nằm trong cây nên được cập nhật tại chỗ
+            record.return_ts = return_ts
+            self._set_loan_status(record, "Đã trả")
+            self._mark_synced(synced_version)
+            return True
+        return False
+
+    def get_loans_page(self, after_id=None, before_id=None, limit=LOAN_PAGE_SIZE):
+        """
+        Một trang phiếu mượn (tăng dần theo loan_id) theo kiểu keyset pagination:
+        after_id: trang ngay sau phiếu này, before_id: trang ngay trước phiếu này,
+        không truyền: trang đầu tiên. Chi phí O(log n + limit) dù lịch sử lớn đến đâu.
+        """
+        self._refresh_if_stale()
+        if before_id is not None:
+            page = list(islice(self.loans.iter_range(hi=before_id - 1, reverse=True), limit))
+            page.reverse()
+            return page
+        lo = after_id + 1 if after_id is not None else None
+        return list(islice(self.loans.iter_range(lo=lo), limit))
+
+    def get_last_loans_page(self, limit=LOAN_PAGE_SIZE):
+        """Trang chứa các phiếu mượn mới nhất."""
+        self._refresh_if_stale()
+        page = list(islice(self.loans.iter_range(reverse=True), limit))
+        page.reverse()
+        return page
+
+    def get_loans_borrowed_between(self, start, end):
+        """Phiếu mượn có start <= borrow_date < end, theo ngày mượn: O(log n + k)."""
+        self._refresh_if_stale()
+        return list(self.loans_by_borrow_date.iter_range(*date_range_keys(start, end)))
+
+    def count_loans_borrowed_between(self, start, end):
+        self._refresh_if_stale()
+        return self.loans_by_borrow_date.count_range(*date_range_keys(start, end))
+
+    def get_loans_due_between(self, start, end):
+        """Phiếu mượn có start <= due_date < end, theo hạn trả: O(log n + k)."""
+        self._refresh_if_stale()
+        return list(self.loans_by_due_date.iter_range(*date_range_keys(start, end)))
+
+    def count_loans_due_between(self, start, end):
+        self._refresh_if_stale()
+        return self.loans_by_due_date.count_range(*date_range_keys(start, end))
+
+    def get_all_loans(self):
+        self._refresh_if_stale() # Tên sách/bạn đọc có thể đã đổi ở tab khác
+        return self.loans.inorder()
+
+    def to_columns(self):
+        """Ảnh chụp dạng cột (LoanColumns) của toàn bộ phiếu mượn, cho các phép đếm/thống kê."""
+        self._refresh_if_stale()
+        return LoanColumns.from_records(self.loans.iter_range())
+
+    def get_loan_history_by_reader(self, reader_id):
+        self._refresh_if_stale()
+        return list(self._loans_by_reader.get(reader_id, {}).values())
+
+    def get_loan_history_by_isbn(self, isbn):
+        self._refresh_if_stale()
+        return list(self._loans_by_isbn.get(isbn, {}).values())
+
+    def get_current_loans_by_reader(self, reader_id):
+        self._refresh_if_stale()
+        return [loan for loan in self._loans_by_reader.get(reader_id, {}).values() if loan.status == "Đang mượn"]
+
+    def get_overdue_loans(self, as_of=None):
+        """Phiếu đang mượn có hạn trả trước as_of (mặc định: bây giờ), sắp theo hạn trả."""
+        self._refresh_if_stale()
+        return self.active_loans_by_due.due_before(as_of if as_of is not None else datetime.now())
+
+    def count_active_loans(self):
+        self._refresh_if_stale()
+        return len(self.active_loans_by_due)
+
+    def count_loans_by_isbn(self):
+        # Đọc bộ đếm theo ISBN do trigger duy trì (counters.py), không duyệt toàn bộ phiếu
+        return {f"{isbn} - {title}": count for isbn, title, count in loan_counts_by_isbn(self.conn)} # Bao gồm tên sách
+
+    def delete_loan(self, loan_id):
+        self._refresh_if_stale()
+        record = self.loans.search(loan_id)
+        if record and record.status != "Đang mượn":
+            synced_version = self._synced_version
+            # Chỉ xóa phiếu không còn "Đang mượn": nếu quầy khác vừa sửa/xóa phiếu này thì
+            # rowcount = 0, nạp lại cây thay vì xóa phiếu khỏi cây mà DB vẫn còn
+            self.cursor.execute("DELETE FROM loans WHERE loan_id = ? AND status IS NOT ?", (loan_id, "Đang mượn"))
+            if self.cursor.rowcount == 0:
+                self.conn.rollback()
+                self._load_loans_from_db()
+                return False
+            self.conn.commit()
+            # Chỉ bỏ khỏi cây sau khi DB đã xóa xong, không cần nạp lại
+            self._untrack_loan(record)
+            self._mark_synced(synced_version)
+            return True
+        return False
+
+    def get_loan_details(self, loan_id):
+        self._refresh_if_stale()
+        return self.loans.search(loan_id)
+
+
+# ============================\
+# Giao diện quản lý mượn/trả sách (hoàn chỉnh)
+# ============================\
+
+AUTOCOMPLETE_LIMIT = 20 # Số gợi ý tối đa trong danh sách thả xuống
+
+def create_loan_tab(notebook, loan_manager, isbn_index=None, reader_id_index=None):
+    tab = ttk.Frame(notebook)
+    notebook.add(tab, text="📬 Quản lý Mượn/Trả")
+
+    # Khung nhập liệu
+    input_frame = ttk.LabelFrame(tab, text="Thông tin phiếu mượn")
+    input_frame.grid(row=0, column=0, columnspan=2, padx=10, pady=10, sticky="ew")
+
+    # Chỉ mục tiền tố dùng chung với tab Sách / Bạn đọc (Home.py.py);
+    # chạy riêng tab này thì tự nạp từ CSDL
+    if isbn_index is None:
+        isbn_index = PrefixIndex(row[0] for row in loan_manager.conn.execute("SELECT isbn FROM books"))
+    if reader_id_index is None:
+        reader_id_index = PrefixIndex(row[0] for row in loan_manager.conn.execute("SELECT reader_id FROM readers"))
+
+    tk.Label(input_frame, text="Mã bạn đọc:").grid(row=0, column=0, padx=5, pady=5, sticky="w")
+    reader_id_entry = ttk.Combobox(input_frame)
+    reader_id_entry.grid(row=0, column=1, padx=5, pady=5, sticky="ew")
+    reader_id_status = tk.Label(input_frame, text="", width=16, anchor="w")
+    reader_id_status.grid(row=0, column=2, padx=5, pady=5, sticky="w")
+
+    tk.Label(input_frame, text="Mã ISBN sách:").grid(row=1, column=0, padx=5, pady=5, sticky="w")
+    isbn_entry = ttk.Combobox(input_frame)
+    isbn_entry.grid(row=1, column=1, padx=5, pady=5, sticky="ew")
+    isbn_status = tk.Label(input_frame, text="", width=16, anchor="w")
+    isbn_status.grid(row=1, column=2, padx=5, pady=5, sticky="w")
+
+    def attach_autocomplete(combobox, prefix_index, status_label):
+        """
+        Mỗi lần gõ phím: cập nhật danh sách gợi ý theo tiền tố đã nhập (O(log n + k))
+        và báo ngay mã có tồn tại hay không, trước khi bấm "Tạo phiếu mượn".
+        """
+        def on_change(event=None):
+            text = combobox.get().strip()
+            suggestions = prefix_index.complete(text, AUTOCOMPLETE_LIMIT) if text else []
+            combobox["values"] = suggestions
+            if not text:
+                status_label.config(text="")
+            elif text in prefix_index:
+                status_label.config(text="✔ Hợp lệ", fg="green")
+            elif suggestions:
+                status_label.config(text=f"{len(suggestions)} gợi ý...", fg="gray")
+            else:
+                status_label.config(text="✘ Không tồn tại", fg="red")
+        combobox.bind("<KeyRelease>", on_change)
+        combobox.bind("<<ComboboxSelected>>", on_change)
+
+    attach_autocomplete(reader_id_entry, reader_id_index, reader_id_status)
+    attach_autocomplete(isbn_entry, isbn_index, isbn_status)
+
+    tk.Label(input_frame, text="ID Phiếu Mượn:").grid(row=2, column=0, padx=5, pady=5, sticky="w")
+    loan_id_entry = tk.Entry(input_frame)
+    loan_id_entry.grid(row=2, column=1, padx=5, pady=5, sticky="ew")
+    tk.Label(input_frame, text="Số ngày mượn:").grid(row=3, column=0, padx=5, pady=5, sticky="w")
+
+# Ô nhập số ngày mượn
+    duedays_entry = tk.Entry(input_frame)
+    duedays_entry.grid(row=3, column=1, padx=5, pady=5, sticky="ew")
+
+    # Ô nhập khoảng ngày để lọc theo ngày mượn / hạn trả
+    tk.Label(input_frame, text="Từ ngày (YYYY-MM-DD):").grid(row=4, column=0, padx=5, pady=5, sticky="w")
+    from_date_entry = tk.Entry(input_frame)
+    from_date_entry.grid(row=4, column=1, padx=5, pady=5, sticky="ew")
+    tk.Label(input_frame, text="Đến ngày (YYYY-MM-DD):").grid(row=5, column=0, padx=5, pady=5, sticky="w")
+    to_date_entry = tk.Entry(input_frame)
+    to_date_entry.grid(row=5, column=1, padx=5, pady=5, sticky="ew")
+    # Khung hiển thị kết quả
+    output_frame = ttk.LabelFrame(tab, text="Kết quả")
+    output_frame.grid(row=1, column=0, columnspan=2, padx=10, pady=10, sticky="nsew")
+    tab.grid_rowconfigure(1, weight=1)
+    tab.grid_columnconfigure(0, weight=1)
+
+    columns = ("loan_id", "reader_id", "reader_name", "isbn", "book_title", "borrow_date", "due_date", "return_date", "status")
+    tree = ttk.Treeview(output_frame, columns=columns, show="headings")
+
+    # Thiết lập tên cột và độ rộng
+    tree.heading("loan_id", text="ID")
+    tree.column("loan_id", width=50, anchor="center")
+
+    tree.heading("reader_id", text="Mã bạn đọc")
+    tree.column("reader_id", width=100)
+
+    tree.heading("reader_name", text="Tên bạn đọc")
+    tree.column("reader_name", width=150)
+
+    tree.heading("isbn", text="ISBN")
+    tree.column("isbn", width=120)
+
+    tree.heading("book_title", text="Tên sách")
+    tree.column("book_title", width=200)
+
+    tree.heading("borrow_date", text="Ngày mượn")
+    tree.column("borrow_date", width=100)
+
+    tree.heading("due_date", text="Hạn trả")
+    tree.column("due_date", width=100)
+
+    tree.heading("return_date", text="Ngày trả")
+    tree.column("return_date", width=100)
+
+    tree.heading("status", text="Trạng thái")
+    tree.column("status", width=100)
+
+    # Thêm thanh cuộn
+    scrollbar_y = ttk.Scrollbar(output_frame, orient="vertical", command=tree.yview)
+    scrollbar_y.pack(side="right", fill="y")
+    tree.configure(yscroll=scrollbar_y.set)
+
+    scrollbar_x = ttk.Scrollbar(output_frame, orient="horizontal", command=tree.xview)
+    scrollbar_x.pack(side="bottom", fill="x")
+    tree.configure(xscroll=scrollbar_x.set)
+
+    tree.pack(fill="both", expand=True)
+
+
+    def display_loans(loans):
+        for row in tree.get_children():
+            tree.delete(row)
+        if not loans:
+            messagebox.showinfo("Thông báo", "Không có dữ liệu.")
+            return
+        for loan in loans:
+            tree.insert("", "end", values=(
+                loan.loan_id,
+                loan.reader_id,
+                loan.reader_name,
+                loan.isbn,
+                loan.book_title,
+                loan.borrow_date.strftime('%Y-%m-%d'),
+                loan.due_date.strftime('%Y-%m-%d'),
+                loan.return_date.strftime('%Y-%m-%d') if loan.return_date else "N/A",
+                loan.status
+        ))
+
+
+    def display_loan_counts(counts):
+        # Xóa tất cả cột cũ
+        for col in tree["columns"]:
+            tree.heading(col, text="")
+            tree.column(col, width=0)
+        tree["columns"] = ("isbn_title", "count")
+
+        tree.heading("isbn_title", text="ISBN - Tên sách")
+        tree.column("isbn_title", width=400)
+
+        tree.heading("count", text="Số lượt mượn")
+        tree.column("count", width=100, anchor="center")
+
+        # Xóa dữ liệu cũ
+        for row in tree.get_children():
+            tree.delete(row)
+
+        if not counts:
+            messagebox.showinfo("Thông báo", "Không có dữ liệu.")
+            return
+
+    # Thêm dữ liệu mới
+        for isbn_title, count in counts.items():
+            tree.insert("", "end", values=(isbn_title, count))
+
+
+    def create_loan():
+        # Đảm bảo các giá trị được strip để tránh khoảng trắng
+        reader_id = reader_id_entry.get().strip()
+        isbn = isbn_entry.get().strip()
+        value = duedays_entry.get().strip()
+        duedays = int(value) if value else 30
+        if loan_manager.add_loan(reader_id, isbn,duedays):
+            # Sau khi thêm thành công, hiển thị trang chứa các phiếu mới nhất
+            reset_treeview_columns()
+            show_page(loan_manager.get_last_loans_page())
+
+    def return_book():
+        try:
+            loan_id = int(loan_id_entry.get().strip())
+            if loan_manager.return_loan(loan_id):
+                messagebox.showinfo("Thành công", "Đã trả sách.")
+                refresh_current_page() # Refresh list after successful return
+            else:
+                messagebox.showerror("Lỗi", "Không thể trả sách. Có thể phiếu mượn không tồn tại hoặc đã được trả.")
+        except ValueError:
+            messagebox.showerror("Lỗi", "ID phiếu mượn không hợp lệ.")
+
+    def delete_loan():
+        selected = tree.selection()
+        if selected:
+            try:
+            # Lấy loan_id từ dòng đang chọn trên TreeView
+                loan_id = int(tree.item(selected[0])["values"][0])
+            except (IndexError, ValueError):
+                messagebox.showerror("Lỗi", "Không thể đọc ID phiếu mượn từ bảng.")
+                return
+        else:
+            # Nếu không chọn dòng nào, lấy từ ô nhập liệu
+            try:
+                loan_id = int(loan_id_entry.get().strip())
+            except ValueError:
+                messagebox.showerror("Lỗi", "ID phiếu mượn không hợp lệ.")
+                return
+        # Gọi hàm xóa
+        if loan_manager.delete_loan(loan_id):
+            messagebox.showinfo("Thành công", "Đã xoá phiếu mượn.")
+            refresh_current_page() # Refresh list after successful deletion
+        else:
+            messagebox.showerror("Lỗi", "Không thể xoá phiếu mượn. Chỉ có thể xoá phiếu đã trả.")
+
+
+    def search_by_reader():
+        display_loans(loan_manager.get_loan_history_by_reader(reader_id_entry.get().strip()))
+
+    def search_by_isbn():
+        display_loans(loan_manager.get_loan_history_by_isbn(isbn_entry.get().strip()))
+
+    def show_current_loans():
+        display_loans(loan_manager.get_current_loans_by_reader(reader_id_entry.get().strip()))
+
+    def show_overdue():
+        display_loans(loan_manager.get_overdue_loans())
+
+    def read_date_range():
+        """Đọc khoảng ngày từ ô nhập; ngày kết thúc được tính trọn ngày."""
+        try:
+            start = datetime.strptime(from_date_entry.get().strip(), "%Y-%m-%d")
+            end = datetime.strptime(to_date_entry.get().strip(), "%Y-%m-%d") + timedelta(days=1)
+        except ValueError:
+            messagebox.showerror("Lỗi", "Ngày phải có dạng YYYY-MM-DD.")
+            return None
+        return start, end
+
+    def filter_by_borrow_date():
+        date_range = read_date_range()
+        if date_range:
+            reset_treeview_columns()
+            display_loans(loan_manager.get_loans_borrowed_between(*date_range))
+
+    def filter_by_due_date():
+        date_range = read_date_range()
+        if date_range:
+            reset_treeview_columns()
+            display_loans(loan_manager.get_loans_due_between(*date_range))
+
+    def show_statistics():
+        display_loan_counts(loan_manager.count_loans_by_isbn())
+    original_columns = columns  # columns = ("loan_id", "reader_id", ..., "status")
+    original_column_config = {
+    "loan_id": {"text": "ID", "width": 50, "anchor": "center"},
+    "reader_id": {"text": "Mã bạn đọc", "width": 100},
+    "reader_name": {"text": "Tên bạn đọc", "width": 150},
+    "isbn": {"text": "ISBN", "width": 120},
+    "book_title": {"text": "Tên sách", "width": 200},
+    "borrow_date": {"text": "Ngày mượn", "width": 100},
+    "due_date": {"text": "Hạn trả", "width": 100},
+    "return_date": {"text": "Ngày trả", "width": 100},
+    "status": {"text": "Trạng thái", "width": 100},
+}
+    def reset_treeview_columns():
+        tree["columns"] = original_columns
+        for col in original_columns:
+            cfg = original_column_config[col]
+            tree.heading(col, text=cfg["text"])
+            tree.column(col, width=cfg.get("width", 100), anchor=cfg.get("anchor", "w"))
+
+    # Phân trang theo khóa loan_id: chỉ cần nhớ ID đầu/cuối của trang đang xem
+    page_bounds = {"first": None, "last": None}
+
+    def show_page(loans):
+        display_loans(loans)
+        page_bounds["first"] = loans[0].loan_id if loans else None
+        page_bounds["last"] = loans[-1].loan_id if loans else None
+
+    def show_all():
+        reset_treeview_columns()  # Reset lại cấu hình cột
+        show_page(loan_manager.get_loans_page())
+
+    def show_next_page():
+        if page_bounds["last"] is None:
+            show_all()
+            return
+        loans = loan_manager.get_loans_page(after_id=page_bounds["last"])
+        if not loans:
+            messagebox.showinfo("Thông báo", "Đã ở trang cuối.")
+            return
+        reset_treeview_columns()
+        show_page(loans)
+
+    def show_previous_page():
+        if page_bounds["first"] is None:
+            show_all()
+            return
+        loans = loan_manager.get_loans_page(before_id=page_bounds["first"])
+        if not loans:
+            messagebox.showinfo("Thông báo", "Đã ở trang đầu.")
+            return
+        reset_treeview_columns()
+        show_page(loans)
+
+    def refresh_current_page():
+        if page_bounds["first"] is None:
+            show_all()
+            return
+        loans = loan_manager.get_loans_page(after_id=page_bounds["first"] - 1)
+        if not loans:
+            show_all()
+            return
+        reset_treeview_columns()
+        show_page(loans)
+
+    # Các nút chức năng
+    button_frame = ttk.Frame(tab)
+    button_frame.grid(row=2, column=0, columnspan=2, pady=5)
+
+    ttk.Button(button_frame, text="Tạo phiếu mượn", command=create_loan).grid(row=0, column=0, padx=2)
+    ttk.Button(button_frame, text="Trả sách", command=return_book).grid(row=0, column=1, padx=2)
+    ttk.Button(button_frame, text="Xoá phiếu mượn", command=delete_loan).grid(row=0, column=2, padx=2)
+    ttk.Button(button_frame, text="Tìm theo bạn đọc", command=search_by_reader).grid(row=1, column=0, padx=2)
+    ttk.Button(button_frame, text="Tìm theo ISBN", command=search_by_isbn).grid(row=1, column=1, padx=2)
+    ttk.Button(button_frame, text="Sách đang mượn", command=show_current_loans).grid(row=1, column=2, padx=2)
+    ttk.Button(button_frame, text="Sách quá hạn", command=show_overdue).grid(row=2, column=0, padx=2)
+    ttk.Button(button_frame, text="Thống kê mượn theo ISBN", command=show_statistics).grid(row=2, column=1, padx=2)
+    ttk.Button(button_frame, text="Reset dữ liệu", command=show_all).grid(row=2, column=2, padx=2)
+    ttk.Button(button_frame, text="◀ Trang trước", command=show_previous_page).grid(row=3, column=0, padx=2)
+    ttk.Button(button_frame, text="Trang sau ▶", command=show_next_page).grid(row=3, column=2, padx=2)
+    ttk.Button(button_frame, text="Lọc theo ngày mượn", command=filter_by_borrow_date).grid(row=4, column=0, padx=2)
+    ttk.Button(button_frame, text="Lọc theo hạn trả", command=filter_by_due_date).grid(row=4, column=1, padx=2)
+
+    show_all()
@@ -1,343 +1,712 @@
-import tkinter as tk
-from tkinter import ttk, messagebox
-import datetime # Cho các thao tác ngày tháng
-import sqlite3
-db_connection = sqlite3.connect("library4.db") # Kết nối CSDL SQLite
-# ==============================================================================
-# IMPORT CÁC LỚP CTDL TỰ CÀI ĐẶT VÀ ĐỐI TƯỢNG
-# ==============================================================================
-try:
-    from ui_books import HashTable
-    from ui_books import HashTable as BookHashTable, Book 
-
-    from ui_readers import Reader 
- 
-    from ui_loans import LoanBST, TreeNode, LoanRecord, LoanManager 
-except ImportError as e:
-    messagebox.showerror("Lỗi Import (Module 4)", f"Không thể import CTDL/Đối tượng cần thiết: {e}\nKiểm tra lại đường dẫn và tên file.")
-
-
-# ==============================================================================
-# GIẢI THUẬT TỰ CÀI ĐẶT 
-# ==============================================================================
-def self_implemented_merge_sort(data_list, key_func=None, reverse=False):
-    """Sắp xếp danh sách bằng Merge Sort tự cài đặt."""
-    
-    def merge_sort(arr):
-        if len(arr) <= 1:
-            return arr
-        mid = len(arr) // 2
-        left = merge_sort(arr[:mid])
-        right = merge_sort(arr[mid:])
-        return merge(left, right)
-
-    def merge(left, right):
-        merged = []
-        i = j = 0
-        while i < len(left) and j < len(right):
-            a = key_func(left[i]) if key_func else left[i]
-            b = key_func(right[j]) if key_func else right[j]
-            if (a <= b) ^ reverse:
-                merged.append(left[i])
-                i += 1
-            else:
-                merged.append(right[j])
-                j += 1
-        merged.extend(left[i:])
-        merged.extend(right[j:])
-        return merged
-
-    return merge_sort(data_list)
-
-
-def self_implemented_count_frequencies(list_of_objects, attribute_name_to_count):
-    """
-    Đếm tần suất của thuộc tính bất kỳ từ danh sách đối tượng,
-    sử dụng HashTable đã định nghĩa sẵn.
-    Trả về danh sách tuple (key, count)
-    """
-    frequency_table = HashTable()
-    
-    for obj in list_of_objects:
-        try:
-            key = getattr(obj, attribute_name_to_count)
-        except AttributeError:
-            print(f"Cảnh báo: Không có thuộc tính '{attribute_name_to_count}'")
-            continue
-
-        current_count = frequency_table.search(key)
-        if current_count is None:
-            frequency_table.insert(key, 1)
-        else:
-            frequency_table.insert(key, current_count + 1)
-    
-    # Trả kết quả dưới dạng danh sách tuple
-    result = []
-    for bucket in frequency_table.table:
-        for key, value in bucket.get_all_key_value_pairs():
-            result.append((key, value))
-    
-    return result
-# ==============================================================================
-# UI MODULE 4 - BÁO CÁO & THỐNG KÊ
-# ==============================================================================
-
-def create_statistics_tab(notebook, db_connection):
-    """
-    Tạo tab Báo cáo & Thống kê.
-    Dữ liệu được nạp từ CSDL vào các CTDL RAM riêng của Module 4 khi nhấn "Làm mới".
-    Các hàm thống kê hoạt động trên các CTDL RAM này.
-    """
-    tab = ttk.Frame(notebook)
-    notebook.add(tab, text="📊 Báo cáo & Thống kê")
-
-    # Các instance CTDL trong bộ nhớ, dành riêng cho Module 4 này
-    # Sẽ được nạp dữ liệu khi người dùng nhấn "Làm mới"
-    ht_books_stats = BookHashTable() # Sử dụng HashTable từ ui_books
-    ht_readers_stats = BookHashTable() # Giả sử dùng chung kiểu HashTable cho bạn đọc
-    
-    # LoanManager_stats sẽ quản lý LoanBST cho riêng Module 4 này
-    # Khởi tạo LoanManager mà không cần ht_books, ht_readers của các module khác
-    # vì nó sẽ dùng ht_books_stats và ht_readers_stats của riêng mình.
-    # Nếu constructor của LoanManager yêu cầu, bạn có thể truyền chúng vào.
-    loan_manager_stats = LoanManager(db_connection)
-                                     # Hoặc LoanManager() nếu constructor cho phép
-
-    # --- Giao diện ---
-    output_text_area = tk.Text(tab, width=120, height=28, wrap=tk.WORD, font=("Consolas", 10), relief=tk.SUNKEN, borderwidth=1)
-    output_text_area.grid(row=0, column=0, columnspan=3, padx=10, pady=(10,0), sticky="nsew")
-    
-    scrollbar = ttk.Scrollbar(tab, orient="vertical", command=output_text_area.yview)
-    scrollbar.grid(row=0, column=3, sticky="ns", pady=(10,0))
-    output_text_area.config(yscrollcommand=scrollbar.set)
-
-    tab.grid_rowconfigure(0, weight=1) # Cho Text widget co giãn
-    for i in range(3): 
-        tab.grid_columnconfigure(i, weight=1)
-
-    # --- Hàm nạp dữ liệu từ CSDL vào CTDL của Module 4 ---
-    def refresh_data_for_statistics_command():
-        ht_books_stats.size = 0 
-        ht_books_stats.table = [type(ht_books_stats.table[0])() for _ in range(ht_books_stats.capacity)] # Tạo lại list các LinkedListForHash rỗng
-
-        ht_readers_stats.size = 0
-        ht_readers_stats.table = [type(ht_readers_stats.table[0])() for _ in range(ht_readers_stats.capacity)]
-        
-        loan_manager_stats.loans.root = None # Reset cây AVL
-        loan_manager_stats.loan_id_counter = 1 # Reset counter
-
-        cursor = db_connection.cursor()
-        loaded_books_count = 0
-        loaded_readers_count = 0
-        loaded_loans_count = 0
-
-        # Nạp sách
-        try:
-            for row in cursor.execute("SELECT isbn, title, genre, author, year, quantity, available_quantity FROM books"):
-                book = Book(row[0], row[1], row[2], row[3],int(row[4]), int(row[5]))
-                book.available_quantity = int(row[6]) # Gán lại từ CSDL
-                ht_books_stats.insert(book.isbn, book)
-                loaded_books_count += 1
-        except Exception as e:
-            messagebox.showerror("Lỗi Nạp Sách (Stats)", f"Không thể nạp sách: {e}")
-            return
-
-        # Nạp bạn đọc
-        try:
-            for row in cursor.execute("SELECT reader_id, name, birth_date, address FROM readers"):
-                reader = Reader(row[0], row[1], row[2], row[3])
-                ht_readers_stats.insert(reader.reader_id, reader)
-                loaded_readers_count += 1
-        except Exception as e:
-            messagebox.showerror("Lỗi Nạp Bạn Đọc (Stats)", f"Không thể nạp bạn đọc: {e}")
-            return
-            
-        # Nạp phiếu mượn vào LoanBST của loan_manager_stats
-        try:
-            max_loan_id_db = 0
-            for row in cursor.execute("SELECT loan_id, reader_id, isbn, borrow_date, due_date, return_date, status FROM loans"):
-                try:
-                    loan_id_from_db = int(row[0])
-                    if loan_id_from_db > max_loan_id_db: max_loan_id_db = loan_id_from_db
-                    #date.strftime("%Y-%m-%d %H:%M:%S.%f")
-                    borrow_date_obj = datetime.datetime.strptime(row[3], "%Y-%m-%d %H:%M:%S.%f").date() if row[3] else None
-                    due_date_obj = datetime.datetime.strptime(row[4], "%Y-%m-%d %H:%M:%S.%f").date() if row[4] else None
-                    return_date_obj = datetime.datetime.strptime(row[5], "%Y-%m-%d %H:%M:%S.%f").date() if row[5] else None
-                    
-                    if borrow_date_obj and due_date_obj: # Ngày mượn và hạn trả là bắt buộc
-                        # Tạo LoanRecord với loan_id từ CSDL
-                        loan = LoanRecord(loan_id_from_db, row[1], row[2], borrow_date_obj, due_date_obj, return_date_obj, row[6])
-                        loan_manager_stats.loans.insert(loan) # Sử dụng insert của Loanloans
-                        loaded_loans_count += 1
-                    else:
-                        print(f"Cảnh báo (Stats): Phiếu mượn {row[0]} thiếu ngày mượn/hạn trả, bỏ qua.")
-                except ValueError as ve:
-                    print(f"Cảnh báo (Stats): Phiếu mượn {row[0]} có định dạng ngày lỗi ({ve}), bỏ qua.")
-            
-            loan_manager_stats.loan_id_counter = max_loan_id_db + 1 # Cập nhật counter
-            
-            # Cập nhật trạng thái phiếu mượn sau khi nạp
-            today = datetime.datetime.now().date()
-            for record in loan_manager_stats.loans.inorder(): # Duyệt cây
-                if record.return_date: record.status = "Đã trả"
-                elif record.due_date and record.due_date < today: record.status = "Quá hạn"
-                elif not record.return_date: record.status = "Đang mượn"
-            
-        except Exception as e:
-            messagebox.showerror("Lỗi Nạp Phiếu Mượn (Stats)", f"Không thể nạp phiếu mượn: {e}")
-            return
-            
-        messagebox.showinfo("Thành công", f"Đã làm mới dữ liệu cho thống kê từ CSDL.\nSách: {loaded_books_count}, Bạn đọc: {loaded_readers_count}, Phiếu mượn: {loaded_loans_count}")
-        clear_output_area_command()
-        output_text_area.insert(tk.END, "Dữ liệu đã được làm mới. Vui lòng chọn lại chức năng thống kê.\n")
-
-    # --- Các hàm thống kê (hoạt động trên ht_books_stats, ht_readers_stats, loan_manager_stats) ---
-    def clear_output_area_command():
-        output_text_area.delete("1.0", tk.END)
-
-    def display_top_n_books_command():
-        clear_output_area_command()
-        # Kiểm tra xem đã nạp dữ liệu chưa
-        if ht_books_stats.size == 0 and not loan_manager_stats.loans.inorder():
-            messagebox.showwarning("Chưa có dữ liệu", "Vui lòng 'Làm mới Dữ liệu Thống kê' trước.")
-            return
-        n_top = 10
-        all_loan_records = loan_manager_stats.loans.inorder()
-        if not all_loan_records:
-            output_text_area.insert(tk.END, "Chưa có dữ liệu mượn sách để thống kê.\n"); return
-
-        isbn_frequencies = self_implemented_count_frequencies(all_loan_records, "isbn")
-        if not isbn_frequencies:
-            output_text_area.insert(tk.END, "Không có ISBN nào được ghi nhận mượn.\n"); return
-            
-        sorted_top_books_data = self_implemented_merge_sort(list(isbn_frequencies), key_func=lambda pair: pair[1], reverse=True)
-
-        output_text_area.insert(tk.END, f"--- Top {n_top} Sách Được Mượn Nhiều Nhất ---\n")
-        for i, (isbn, count) in enumerate(sorted_top_books_data[:n_top], 1):
-            book_object = ht_books_stats.search(isbn)
-            title = book_object.title if book_object else f"[Sách ISBN {isbn} không tìm thấy]"
-            output_text_area.insert(tk.END, f"Hạng {i}: {title} (ISBN: {isbn}) - Số lượt mượn: {count}\n")
-
-    def display_top_n_readers_command():
-        clear_output_area_command()
-        if ht_readers_stats.size == 0 and not loan_manager_stats.loans.inorder():
-            messagebox.showwarning("Chưa có dữ liệu", "Vui lòng 'Làm mới Dữ liệu Thống kê' trước.")
-            return
-        n_top = 10
-        all_loan_records = loan_manager_stats.loans.inorder()
-        if not all_loan_records:
-            output_text_area.insert(tk.END, "Chưa có dữ liệu mượn sách để thống kê.\n"); return
-
-        reader_id_frequencies = self_implemented_count_frequencies(all_loan_records, "reader_id")
-        if not reader_id_frequencies:
-            output_text_area.insert(tk.END, "Không có bạn đọc nào mượn sách.\n"); return
-            
-        sorted_top_readers_data = self_implemented_merge_sort(list(reader_id_frequencies), key_func=lambda pair: pair[1], reverse=True)
-
-        output_text_area.insert(tk.END, f"--- Top {n_top} Bạn Đọc Mượn Sách Nhiều Nhất ---\n")
-        for i, (reader_id, count) in enumerate(sorted_top_readers_data[:n_top], 1):
-            reader_object = ht_readers_stats.search(reader_id)
-            name = reader_object.name if reader_object else f"[Bạn đọc mã {reader_id} không tìm thấy]"
-            output_text_area.insert(tk.END, f"Hạng {i}: {name} (Mã: {reader_id}) - Số lượt mượn: {count}\n")
-    
-    def display_total_books_stats_command():
-        clear_output_area_command()
-        if ht_books_stats.size == 0:
-             messagebox.showwarning("Chưa có dữ liệu", "Vui lòng 'Làm mới Dữ liệu Thống kê' trước.")
-             return
-        num_titles = ht_books_stats.size
-        all_book_objects = ht_books_stats.get_all_values()
-        # Tính tổng số lượng sách (total quantity)
-        total_copies = 0
-        total_available = 0
-        if all_book_objects:
-            for book in all_book_objects:
-                if book:
-                    total_copies += book.quantity
-                    total_available += book.available_quantity
-        output_text_area.insert(tk.END, "--- Thống Kê Tổng Số Sách ---\n")
-        output_text_area.insert(tk.END, f"Tổng số đầu sách trong thư viện: {num_titles}\n")
-        output_text_area.insert(tk.END, f"Tổng số cuốn sách trong thư viện: {total_copies}\n")
-        output_text_area.insert(tk.END, f"Tổng số cuốn sách hiện còn trong thư viện: {total_available}\n")
-    def display_total_readers_stats_command():
-        clear_output_area_command()
-        if ht_readers_stats.size== 0:
-             messagebox.showwarning("Chưa có dữ liệu", "Vui lòng 'Làm mới Dữ liệu Thống kê' trước.")
-             return
-        count = ht_readers_stats.size
-        output_text_area.insert(tk.END, "--- Thống Kê Tổng Số Bạn Đọc ---\n")
-        output_text_area.insert(tk.END, f"Tổng số bạn đọc đã đăng ký: {count}\n")
-
-    def display_books_currently_loaned_stats_command():
-        clear_output_area_command()
-        all_loan_records = loan_manager_stats.loans.inorder()
-        if not all_loan_records:
-             messagebox.showwarning("Chưa có dữ liệu", "Vui lòng 'Làm mới Dữ liệu Thống kê' trước.")
-             return
-        
-        # Cập nhật trạng thái trước khi đếm
-        today = datetime.datetime.now().date()
-        for record in all_loan_records:
-            if record.return_date: record.status = "Đã trả"
-            elif record.due_date and record.due_date < today: record.status = "Quá hạn"
-            elif not record.return_date: record.status = "Đang mượn"
-            
-        count = sum(1 for loan in all_loan_records if loan and (loan.status == "Đang mượn" or loan.status == "Quá hạn"))
-        output_text_area.insert(tk.END, "--- Thống Kê Sách Đang Được Mượn ---\n")
-        output_text_area.insert(tk.END, f"Tổng số sách hiện đang được mượn (bao gồm quá hạn): {count}\n")
-
-    def display_books_overdue_stats_command():
-        clear_output_area_command()
-        all_loan_records = loan_manager_stats.loans.inorder()
-        if not all_loan_records:
-             messagebox.showwarning("Chưa có dữ liệu", "Vui lòng 'Làm mới Dữ liệu Thống kê' trước.")
-             return
-
-        # Cập nhật trạng thái trước khi đếm
-        today = datetime.datetime.now().date()
-        for record in all_loan_records:
-            if record.return_date: record.status = "Đã trả"
-            elif record.due_date and record.due_date < today: record.status = "Quá hạn"
-            elif not record.return_date: record.status = "Đang mượn"
-
-        count = sum(1 for loan in all_loan_records if loan and loan.status == "Quá hạn")
-        output_text_area.insert(tk.END, "--- Thống Kê Sách Đã Quá Hạn Trả ---\n")
-        output_text_area.insert(tk.END, f"Tổng số sách đã quá hạn trả: {count}\n")
-
-    # --- Tạo các nút bấm ---
-    controls_frame = ttk.Frame(tab)
-    controls_frame.grid(row=1, column=0, columnspan=3, pady=5, sticky="ew")
-
-    btn_refresh_data = ttk.Button(controls_frame, text="🔄 LÀM MỚI DỮ LIỆU THỐNG KÊ TỪ CSDL", command=refresh_data_for_statistics_command, style="Accent.TButton")
-    btn_refresh_data.pack(fill=tk.X, padx=5, pady=(5,10))
-    
-    stats_buttons_frame = ttk.Frame(controls_frame)
-    stats_buttons_frame.pack(fill=tk.X, expand=True)
-    stats_buttons_frame.columnconfigure(0, weight=1); stats_buttons_frame.columnconfigure(1, weight=1)
-
-    btn_top_books = ttk.Button(stats_buttons_frame, text="🏆 Top Sách Mượn Nhiều", command=display_top_n_books_command)
-    btn_top_books.grid(row=0, column=0, padx=5, pady=2, sticky="ew")
-    btn_top_readers = ttk.Button(stats_buttons_frame, text="🥇 Top Bạn Đọc Mượn Nhiều", command=display_top_n_readers_command)
-    btn_top_readers.grid(row=0, column=1, padx=5, pady=2, sticky="ew")
-    
-    btn_total_books = ttk.Button(stats_buttons_frame, text="📚 Tổng Số Sách", command=display_total_books_stats_command)
-    btn_total_books.grid(row=1, column=0, padx=5, pady=2, sticky="ew")
-    btn_total_readers = ttk.Button(stats_buttons_frame, text="👥 Tổng Số Bạn Đọc", command=display_total_readers_stats_command)
-    btn_total_readers.grid(row=1, column=1, padx=5, pady=2, sticky="ew")
-    
-    btn_currently_loaned = ttk.Button(stats_buttons_frame, text="⏳ Sách Đang Mượn", command=display_books_currently_loaned_stats_command)
-    btn_currently_loaned.grid(row=2, column=0, padx=5, pady=2, sticky="ew")
-    btn_overdue = ttk.Button(stats_buttons_frame, text="⏰ Sách Quá Hạn Trả", command=display_books_overdue_stats_command)
-    btn_overdue.grid(row=2, column=1, padx=5, pady=2, sticky="ew")
-    
-    btn_clear = ttk.Button(controls_frame, text="🗑️ Xóa Kết Quả Hiển Thị", command=clear_output_area_command)
-    btn_clear.pack(fill=tk.X, padx=5, pady=(10,5))
-    
-    # Thêm style cho nút (tùy chọn, cần import ttk.Style)
-    # style = ttk.Style()
-    # style.configure("Accent.TButton", foreground="blue", font=('Helvetica', 10, 'bold'))
-
-    output_text_area.insert(tk.END, "Chào mừng đến Tab Thống kê!\n\n"
-                                    "Để xem các số liệu mới nhất, vui lòng nhấn nút:\n"
-                                    "'LÀM MỚI DỮ LIỆU THỐNG KÊ TỪ CSDL'\n\n"
-                                    "Sau đó, bạn có thể chọn các chức năng thống kê bên dưới.\n")
+import tkinter as tk
+from tkinter import ttk, messagebox
+import datetime # Cho các thao tác ngày tháng
+import sqlite3
+db_connection = sqlite3.connect("library4.db") # Kết nối CSDL SQLite
+# ==============================================================================
+# IMPORT CÁC LỚP CTDL TỰ CÀI ĐẶT VÀ ĐỐI TƯỢNG
+# ==============================================================================
+try:
+    from hashing import HashTable, create_hash_table
+    from ui_books import Book
+
+    from ui_readers import Reader 
+ 
+    from ui_loans import LoanBST, TreeNode, LoanRecord, LoanManager, date_range_keys, from_timestamp, to_timestamp, LOAN_STATUSES, LOAD_PROGRESS_EVERY
+    from counters import read_totals, count_totals, count_overdue, reconcile_counters
+    from sorting import merge_sort, top_n
+    from background import BackgroundTask, cancellable
+except ImportError as e:
+    messagebox.showerror("Lỗi Import (Module 4)", f"Không thể import CTDL/Đối tượng cần thiết: {e}\nKiểm tra lại đường dẫn và tên file.")
+
+
+# ==============================================================================
+# GIẢI THUẬT TỰ CÀI ĐẶT 
+# ==============================================================================
+def self_implemented_merge_sort(data_list, key_func=None, reverse=False):
+    """Sắp xếp danh sách bằng Merge Sort tự cài đặt (bottom-up, ổn định, xem sorting.py)."""
+    return merge_sort(data_list, key=key_func, reverse=reverse)
+
+
+def rank_key(pair):
+    """Thứ hạng của cặp (khóa, số lượng): số lượng giảm dần, hòa thì theo khóa tăng dần."""
+    return (-pair[1], pair[0])
+
+
+def self_implemented_top_n(pairs, n):
+    """N cặp (khóa, số lượng) đứng đầu theo rank_key (heap giới hạn N phần tử, xem sorting.py)."""
+    return top_n(pairs, n, key=rank_key, reverse=False)
+
+
+def self_implemented_count_frequencies(list_of_objects, attribute_name_to_count, hash_engine="chaining"):
+    """
+    Đếm tần suất của thuộc tính bất kỳ từ danh sách đối tượng,
+    sử dụng HashTable đã định nghĩa sẵn (hash_engine: "chaining" hoặc "open_addressing").
+    Trả về danh sách tuple (key, count)
+    """
+    frequency_table = create_hash_table(hash_engine)
+    
+    for obj in list_of_objects:
+        try:
+            key = getattr(obj, attribute_name_to_count)
+        except AttributeError:
+            print(f"Cảnh báo: Không có thuộc tính '{attribute_name_to_count}'")
+            continue
+
+        frequency_table.increment(key) # Một lần băm thay cho search + insert
+    
+    # Trả kết quả dưới dạng danh sách tuple
+    return frequency_table.get_all_items()
+# ==============================================================================
+# TỔNG HỢP NHIỀU CHIỀU TRONG MỘT LẦN DUYỆT PHIẾU MƯỢN
+# ==============================================================================
+SECONDS_PER_DAY = 86400
+UNKNOWN_GENRE = "[Không rõ thể loại]"
+AGGREGATE_DIMENSIONS = ("isbn", "reader_id", "status", "genre", "month")
+
+class LoanAggregates:
+    """
+    Số phiếu mượn theo từng chiều (ISBN, bạn đọc, trạng thái, thể loại, tháng mượn "YYYY-MM"),
+    mỗi chiều là một bảng băm khóa -> số phiếu. Do aggregate_loans tạo ra, chỉ để đọc.
+    """
+    def __init__(self, hash_engine="chaining"):
+        self.tables = {dimension: create_hash_table(hash_engine) for dimension in AGGREGATE_DIMENSIONS}
+        self.total = 0
+
+    def items(self, dimension):
+        """Danh sách (khóa, số phiếu) của một chiều."""
+        return self.tables[dimension].get_all_items()
+
+    def count(self, dimension, key):
+        return self.tables[dimension].search(key) or 0
+
+
+def aggregate_loans(loans, books_table, hash_engine="chaining"):
+    """
+    Duyệt các phiếu mượn ĐÚNG MỘT LẦN và điền mọi chiều thống kê. Mỗi phiếu chỉ băm ISBN,
+    mã bạn đọc và ngày mượn một lần (HashTable.increment); trạng thái đếm theo mã số trong
+    một list. Thể loại và tháng được gộp sau đó từ bảng ISBN / bảng ngày (ít khóa hơn số
+    phiếu rất nhiều), nên không phải tra sách hay tạo datetime cho từng phiếu.
+    """
+    aggregates = LoanAggregates(hash_engine)
+    tables = aggregates.tables
+    count_isbn = tables["isbn"].increment
+    count_reader = tables["reader_id"].increment
+    days = create_hash_table(hash_engine)
+    count_day = days.increment
+    status_counts = [0] * len(LOAN_STATUSES)
+    total = 0
+    for loan in cancellable(loans): # Trong tác vụ nền: dừng giữa chừng khi người dùng hủy
+        count_isbn(loan.isbn)
+        count_reader(loan.reader_id)
+        count_day(loan.borrow_ts // SECONDS_PER_DAY)
+        status_counts[loan.status_code] += 1
+        total += 1
+    aggregates.total = total
+
+    for code, count in enumerate(status_counts):
+        if count:
+            tables["status"].insert(LOAN_STATUSES[code], count)
+    count_genre = tables["genre"].increment
+    for isbn, count in cancellable(tables["isbn"].get_all_items()):
+        book = books_table.search(isbn)
+        count_genre(book.genre if book and book.genre else UNKNOWN_GENRE, count)
+    count_month = tables["month"].increment
+    for day, count in days.get_all_items():
+        count_month(from_timestamp(day * SECONDS_PER_DAY).strftime("%Y-%m"), count)
+    return aggregates
+
+
+class AggregateCache:
+    """
+    Giữ kết quả tổng hợp cho đến khi dữ liệu thay đổi. token là phiên bản dữ liệu
+    (vd. LoanManager.revision): cùng token thì các nút báo cáo chỉ đọc bảng đã tính sẵn.
+    """
+    def __init__(self, compute):
+        self.compute = compute
+        self.invalidate()
+
+    def invalidate(self):
+        self._token = None
+        self._value = None
+
+    def get(self, token):
+        if self._value is None or token != self._token:
+            self._value = self.compute()
+            self._token = token
+        return self._value
+
+# ==============================================================================
+# ENGINE THỐNG KÊ: CTDL TRONG RAM / ĐẨY XUỐNG SQL / BỘ ĐẾM
+# ==============================================================================
+# Ba engine có cùng các hàm và cùng dạng kết quả: count_by trả về danh sách (khóa, số phiếu)
+# như self_implemented_count_frequencies, top_books/top_readers xếp theo rank_key, totals
+# là dict theo TOTAL_COUNTERS (counters.py). Nhờ vậy mỗi báo cáo chọn engine riêng và
+# test1.py kiểm tra được các engine cho cùng kết quả.
+# Phiếu thiếu ISBN / mã bạn đọc (NULL) không được xếp hạng và không được đếm theo ISBN / bạn đọc.
+_SQL_IN_CHUNK = 500 # Số tham số tối đa trong một mệnh đề IN (...)
+
+class MemoryStatisticsEngine:
+    """
+    Thống kê trên các CTDL tự cài trong RAM: bảng băm sách / bạn đọc, cây phiếu mượn của
+    một LoanManager riêng và bảng tổng hợp aggregate_loans. Dữ liệu là ảnh chụp lúc
+    reload() (nút "Làm mới"); sau đó các báo cáo không truy vấn CSDL.
+    load=False: chưa nạp gì (kể cả phiếu mượn), vd. để nạp bằng reload() ở luồng nền.
+    """
+    name = "RAM"
+
+    def __init__(self, conn, hash_engine="chaining", load=True):
+        self.books = create_hash_table(hash_engine)
+        self.readers = create_hash_table(hash_engine)
+        self.loan_manager = LoanManager(conn, load=load)
+        # Tính chung mọi chiều trong một lần duyệt, dùng lại tới khi cây phiếu mượn đổi
+        self._aggregates = AggregateCache(
+            lambda: aggregate_loans(self.loan_manager.loans.iter_range(), self.books, hash_engine))
+
+    def has_data(self):
+        return self.books.size > 0 or self.loan_manager.loans.root is not None
+
+    def reload(self, progress=None):
+        """
+        Nạp lại sách, bạn đọc, phiếu mượn từ CSDL. Trả về (số sách, số bạn đọc, số phiếu).
+        progress(dòng tiến độ) được gọi theo từng bước và sau mỗi LOAD_PROGRESS_EVERY dòng;
+        ném ngoại lệ trong progress để hủy giữa chừng (dữ liệu dở dang, phải nạp lại).
+        """
+        report = progress or (lambda text: None)
+        self.books.clear() # Trả bảng băm về trạng thái rỗng với capacity ban đầu
+        self.readers.clear()
+        self._aggregates.invalidate() # Thể loại lấy từ bảng sách vừa nạp lại
+        conn = self.loan_manager.conn
+        report("Đang nạp sách...")
+        for row in conn.execute("SELECT isbn, title, genre, author, year, quantity, available_quantity FROM books"):
+            book = Book(row[0], row[1], row[2], row[3], int(row[4]), int(row[5]))
+            book.available_quantity = int(row[6]) # Gán lại từ CSDL
+            self.books.insert(book.isbn, book)
+            if self.books.size % LOAD_PROGRESS_EVERY == 0:
+                report(f"Đang nạp sách: {self.books.size}")
+        report("Đang nạp bạn đọc...")
+        for row in conn.execute("SELECT reader_id, name, birth_date, address FROM readers"):
+            self.readers.insert(row[0], Reader(row[0], row[1], row[2], row[3]))
+            if self.readers.size % LOAD_PROGRESS_EVERY == 0:
+                report(f"Đang nạp bạn đọc: {self.readers.size}")
+        # Trạng thái "quá hạn" không ghi đè lên từng phiếu mà được tính khi cần
+        # từ hàng đợi ưu tiên theo hạn trả
+        report("Đang nạp phiếu mượn...")
+        self.loan_manager.reload(lambda count: report(f"Đang nạp phiếu mượn: {count}"))
+        return self.books.size, self.readers.size, self.loan_manager.loans.size
+
+    def aggregates(self):
+        return self._aggregates.get(self.loan_manager.revision)
+
+    def count_by(self, dimension):
+        items = self.aggregates().items(dimension)
+        if dimension in ("isbn", "reader_id"):
+            items = [pair for pair in cancellable(items) if pair[0] is not None]
+        return items
+
+    def top_books(self, n):
+        return self_implemented_top_n(cancellable(self.count_by("isbn")), n)
+
+    def top_readers(self, n):
+        return self_implemented_top_n(cancellable(self.count_by("reader_id")), n)
+
+    def totals(self):
+        book_copies = available_copies = 0
+        for book in cancellable(self.books.get_all_values()):
+            book_copies += book.quantity
+            available_copies += book.available_quantity
+        return {
+            "book_titles": self.books.size,
+            "book_copies": book_copies,
+            "available_copies": available_copies,
+            "readers": self.readers.size,
+            "loans": self.loan_manager.loans.size,
+            "active_loans": len(self.loan_manager.active_loans_by_due), # Mọi phiếu chưa trả nằm trong hàng đợi
+        }
+
+    def count_overdue(self, as_of_ts):
+        # Chỉ duyệt phần đầu của hàng đợi hạn trả
+        return len(self.loan_manager.active_loans_by_due.due_before(as_of_ts))
+
+    def count_in_date_range(self, start_ts, end_ts):
+        """(số phiếu mượn trong [start_ts, end_ts), số phiếu có hạn trả trong khoảng đó)."""
+        # Đếm trên chỉ mục có thứ tự theo ngày: O(log n + k), không duyệt toàn bộ phiếu
+        lo, hi = date_range_keys(start_ts, end_ts)
+        return (sum(1 for _ in cancellable(self.loan_manager.loans_by_borrow_date.iter_range(lo, hi))),
+                sum(1 for _ in cancellable(self.loan_manager.loans_by_due_date.iter_range(lo, hi))))
+
+    def book_titles(self, isbns):
+        """isbn -> tên sách (bỏ qua ISBN không còn trong thư viện)."""
+        titles = {}
+        for isbn in isbns:
+            book = self.books.search(isbn)
+            if book:
+                titles[isbn] = book.title
+        return titles
+
+    def reader_names(self, reader_ids):
+        names = {}
+        for reader_id in reader_ids:
+            reader = self.readers.search(reader_id)
+            if reader:
+                names[reader_id] = reader.name
+        return names
+
+
+def load_statistics_snapshot(task):
+    """
+    Việc của nút "Làm mới" trên luồng nền (task là BackgroundTask): dựng engine RAM mới trên
+    kết nối riêng task.conn và tính sẵn bảng tổng hợp. Trả về (engine, (số sách, số bạn đọc, số phiếu)).
+    """
+    snapshot = MemoryStatisticsEngine(task.conn, load=False)
+    counts = snapshot.reload(task.report_progress)
+    task.report_progress("Đang tổng hợp phiếu mượn...")
+    snapshot.aggregates()
+    return snapshot, counts
+
+
+class SqlStatisticsEngine:
+    """
+    Đẩy phép đếm xuống SQLite (GROUP BY / COUNT, dùng các chỉ mục của migration 2): không
+    phiếu nào được nạp vào Python, luôn là dữ liệu mới nhất và không cần "Làm mới".
+    """
+    name = "SQL"
+    _COUNT_BY_SQL = {
+        "isbn": "SELECT isbn, COUNT(*) FROM loans WHERE isbn IS NOT NULL GROUP BY isbn",
+        "reader_id": "SELECT reader_id, COUNT(*) FROM loans WHERE reader_id IS NOT NULL GROUP BY reader_id",
+        "status": "SELECT status, COUNT(*) FROM loans GROUP BY status",
+        "genre": """SELECT COALESCE(NULLIF(b.genre, ''), :unknown_genre), COUNT(*)
+                    FROM loans l LEFT JOIN books b ON b.isbn = l.isbn GROUP BY 1""",
+        # Ngày là số giây (migration 3): 'unixepoch' đổi lại thành ngày như ghi trên lịch
+        "month": "SELECT strftime('%Y-%m', borrow_date, 'unixepoch'), COUNT(*) FROM loans GROUP BY 1",
+    }
+    # Thứ tự xếp hạng như rank_key: số phiếu giảm dần, hòa thì theo khóa tăng dần
+    _TOP_SQL = {
+        "isbn": """SELECT isbn, COUNT(*) AS loan_count FROM loans WHERE isbn IS NOT NULL
+                   GROUP BY isbn ORDER BY loan_count DESC, isbn LIMIT :n""",
+        "reader_id": """SELECT reader_id, COUNT(*) AS loan_count FROM loans WHERE reader_id IS NOT NULL
+                        GROUP BY reader_id ORDER BY loan_count DESC, reader_id LIMIT :n""",
+    }
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def has_data(self):
+        return True
+
+    def count_by(self, dimension):
+        return self.conn.execute(self._COUNT_BY_SQL[dimension], {"unknown_genre": UNKNOWN_GENRE}).fetchall()
+
+    def top_books(self, n):
+        return self.conn.execute(self._TOP_SQL["isbn"], {"n": n}).fetchall()
+
+    def top_readers(self, n):
+        return self.conn.execute(self._TOP_SQL["reader_id"], {"n": n}).fetchall()
+
+    def totals(self):
+        return count_totals(self.conn)
+
+    def count_overdue(self, as_of_ts):
+        return count_overdue(self.conn, as_of_ts)
+
+    def count_in_date_range(self, start_ts, end_ts):
+        return tuple(self.conn.execute("""
+            SELECT COALESCE(SUM(borrow_date >= :start AND borrow_date < :end), 0),
+                   COALESCE(SUM(due_date >= :start AND due_date < :end), 0)
+            FROM loans""", {"start": start_ts, "end": end_ts}).fetchone())
+
+    def _lookup(self, query, keys):
+        keys = list(keys)
+        result = {}
+        for start in range(0, len(keys), _SQL_IN_CHUNK):
+            chunk = keys[start:start + _SQL_IN_CHUNK]
+            placeholders = ", ".join("?" * len(chunk))
+            result.update(self.conn.execute(query.format(placeholders), chunk).fetchall())
+        return result
+
+    def book_titles(self, isbns):
+        return self._lookup("SELECT isbn, title FROM books WHERE isbn IN ({})", isbns)
+
+    def reader_names(self, reader_ids):
+        return self._lookup("SELECT reader_id, name FROM readers WHERE reader_id IN ({})", reader_ids)
+
+
+class CounterStatisticsEngine(SqlStatisticsEngine):
+    """
+    Như SqlStatisticsEngine nhưng tổng số và số phiếu theo ISBN / bạn đọc đọc từ bộ đếm
+    do trigger duy trì (migration 4, counters.py) thay vì đếm lại bảng loans.
+    """
+    name = "Bộ đếm"
+    _COUNT_BY_SQL = dict(SqlStatisticsEngine._COUNT_BY_SQL,
+                         isbn="SELECT isbn, loan_count FROM stats_loans_by_isbn",
+                         reader_id="SELECT reader_id, loan_count FROM stats_loans_by_reader")
+    _TOP_SQL = {
+        "isbn": "SELECT isbn, loan_count FROM stats_loans_by_isbn ORDER BY loan_count DESC, isbn LIMIT :n",
+        "reader_id": "SELECT reader_id, loan_count FROM stats_loans_by_reader ORDER BY loan_count DESC, reader_id LIMIT :n",
+    }
+
+    def totals(self):
+        return read_totals(self.conn)
+
+# ==============================================================================
+# UI MODULE 4 - BÁO CÁO & THỐNG KÊ
+# ==============================================================================
+DEFAULT_TOP_N = 10
+MAX_TOP_N = 1000
+
+# Engine mặc định của từng báo cáo (có thể đổi ở ô chọn cạnh nút báo cáo)
+DEFAULT_REPORT_ENGINES = {
+    "top_books": "RAM",
+    "top_readers": "RAM",
+    "total_books": "Bộ đếm",
+    "total_readers": "Bộ đếm",
+    "active_loans": "Bộ đếm",
+    "overdue_loans": "SQL",
+    "status": "RAM",
+    "genre": "RAM",
+    "month": "RAM",
+    "date_range": "RAM",
+}
+
+def create_statistics_tab(notebook, db_connection):
+    """
+    Tạo tab Báo cáo & Thống kê.
+    Mỗi báo cáo chọn engine riêng: "RAM" đọc các CTDL tự cài được nạp từ CSDL khi nhấn
+    "Làm mới"; "SQL" đếm trực tiếp trong SQLite; "Bộ đếm" đọc bộ đếm do trigger duy trì.
+    """
+    tab = ttk.Frame(notebook)
+    notebook.add(tab, text="📊 Báo cáo & Thống kê")
+
+    # Các CTDL trong bộ nhớ dành riêng cho Module 4 (bảng băm sách / bạn đọc, LoanManager
+    # riêng) nằm trong engine "RAM". Khi người dùng nhấn "Làm mới", một engine RAM mới được
+    # nạp ở luồng nền rồi thay engine cũ; engine đã thay vào thì không bị sửa nữa
+    engines = {engine.name: engine for engine in (MemoryStatisticsEngine(db_connection, load=False),
+                                                  SqlStatisticsEngine(db_connection),
+                                                  CounterStatisticsEngine(db_connection))}
+    report_engine_boxes = {} # báo cáo -> Combobox chọn engine
+    # Tác vụ nền đang chạy: một lần làm mới và một báo cáo có thể chạy song song;
+    # bấm lại cùng loại thì tác vụ cũ bị hủy và thay bằng tác vụ mới
+    background = {"refresh": None, "report": None}
+
+    # --- Giao diện ---
+    output_text_area = tk.Text(tab, width=120, height=28, wrap=tk.WORD, font=("Consolas", 10), relief=tk.SUNKEN, borderwidth=1)
+    output_text_area.grid(row=0, column=0, columnspan=3, padx=10, pady=(10,0), sticky="nsew")
+    
+    scrollbar = ttk.Scrollbar(tab, orient="vertical", command=output_text_area.yview)
+    scrollbar.grid(row=0, column=3, sticky="ns", pady=(10,0))
+    output_text_area.config(yscrollcommand=scrollbar.set)
+
+    tab.grid_rowconfigure(0, weight=1) # Cho Text widget co giãn
+    for i in range(3): 
+        tab.grid_columnconfigure(i, weight=1)
+
+    # --- Tác vụ nền: nạp dữ liệu / tính báo cáo mà cửa sổ không bị đứng ---
+    def update_busy_state(text=""):
+        """Thanh tiến độ chạy và nút Hủy bật khi còn tác vụ nền; text hiện ở dòng trạng thái."""
+        status_label.config(text=text)
+        if any(background.values()):
+            progress_bar.start(10)
+            btn_cancel.state(["!disabled"])
+        else:
+            progress_bar.stop()
+            btn_cancel.state(["disabled"])
+
+    def start_background_task(slot, description, work, on_done, error_title, error_text):
+        """Chạy work(task) trên luồng nền rồi on_done(kết quả) trên luồng chính."""
+        if background[slot] is not None:
+            background[slot].cancel()
+
+        def finished(result):
+            background[slot] = None
+            update_busy_state()
+            on_done(result)
+
+        def failed(error):
+            background[slot] = None
+            update_busy_state()
+            messagebox.showerror(error_title, f"{error_text}: {error}")
+
+        task = BackgroundTask(tab, db_connection, work, finished,
+                              on_progress=lambda text: status_label.config(text=text), on_error=failed)
+        background[slot] = task
+        update_busy_state(description)
+        task.start()
+
+    def cancel_background_task_command():
+        for slot, task in background.items():
+            if task is not None:
+                task.cancel() # Luồng nền dừng ở điểm kiểm tra kế tiếp, kết quả (nếu có) bị bỏ
+                background[slot] = None
+        update_busy_state("Đã hủy.")
+
+    # --- Hàm nạp dữ liệu từ CSDL vào CTDL của Module 4 ---
+    def refresh_data_for_statistics_command():
+        # Engine mới dựng trên kết nối riêng của luồng nền, engine RAM đang dùng vẫn nguyên vẹn
+        def adopt(result):
+            snapshot, (loaded_books_count, loaded_readers_count, loaded_loans_count) = result
+            snapshot.loan_manager.attach(db_connection) # Kết nối của luồng nền đã đóng
+            engines[snapshot.name] = snapshot
+            messagebox.showinfo("Thành công", f"Đã làm mới dữ liệu cho thống kê từ CSDL.\nSách: {loaded_books_count}, Bạn đọc: {loaded_readers_count}, Phiếu mượn: {loaded_loans_count}")
+            clear_output_area_command()
+            output_text_area.insert(tk.END, "Dữ liệu đã được làm mới. Vui lòng chọn lại chức năng thống kê.\n")
+
+        start_background_task("refresh", "Đang làm mới dữ liệu thống kê...", load_statistics_snapshot, adopt,
+                              "Lỗi Nạp Dữ Liệu (Stats)", "Không thể nạp dữ liệu thống kê")
+
+    # --- Các hàm thống kê (hoạt động trên engine được chọn cho từng báo cáo) ---
+    def clear_output_area_command():
+        output_text_area.delete("1.0", tk.END)
+
+    def engine_for(report):
+        """Engine đang chọn cho báo cáo, None nếu engine RAM chưa có dữ liệu."""
+        engine = engines[report_engine_boxes[report].get()]
+        if not engine.has_data():
+            messagebox.showwarning("Chưa có dữ liệu", "Vui lòng 'Làm mới Dữ liệu Thống kê' trước.")
+            return None
+        return engine
+
+    def run_report(report, compute, render):
+        """
+        compute(engine) chạy trên luồng nền, render(engine, kết quả) trên luồng chính.
+        Engine SQL / Bộ đếm được tạo lại trên kết nối riêng của luồng nền; engine RAM chỉ
+        được đọc (lần làm mới sau thay bằng engine khác chứ không sửa engine này).
+        """
+        engine = engine_for(report)
+        if engine is None:
+            return
+
+        def work(task):
+            if isinstance(engine, MemoryStatisticsEngine):
+                return compute(engine)
+            return compute(type(engine)(task.conn))
+
+        start_background_task("report", f"Đang tính báo cáo ({engine.name})...", work, lambda result: render(engine, result),
+                              "Lỗi Báo Cáo", "Không thể tính báo cáo")
+
+    def get_top_n():
+        """Số hạng cần hiển thị (ô "Số hạng"), None nếu không hợp lệ."""
+        try:
+            n_top = int(top_n_spinbox.get().strip())
+        except ValueError:
+            n_top = 0
+        if not 1 <= n_top <= MAX_TOP_N:
+            messagebox.showerror("Lỗi", f"Số hạng phải là số nguyên từ 1 đến {MAX_TOP_N}.")
+            return None
+        return n_top
+
+    def display_top_n_books_command():
+        n_top = get_top_n()
+        if n_top is None:
+            return
+
+        def compute(engine):
+            # Engine RAM chỉ giữ N cặp đứng đầu trong heap; engine SQL dùng ORDER BY ... LIMIT
+            top_books_data = engine.top_books(n_top)
+            return top_books_data, engine.book_titles(isbn for isbn, _ in top_books_data)
+
+        def render(engine, result):
+            top_books_data, titles = result
+            clear_output_area_command()
+            if not top_books_data:
+                output_text_area.insert(tk.END, "Chưa có dữ liệu mượn sách để thống kê.\n"); return
+            output_text_area.insert(tk.END, f"--- Top {n_top} Sách Được Mượn Nhiều Nhất ({engine.name}) ---\n")
+            for i, (isbn, count) in enumerate(top_books_data, 1):
+                title = titles.get(isbn, f"[Sách ISBN {isbn} không tìm thấy]")
+                output_text_area.insert(tk.END, f"Hạng {i}: {title} (ISBN: {isbn}) - Số lượt mượn: {count}\n")
+
+        run_report("top_books", compute, render)
+
+    def display_top_n_readers_command():
+        n_top = get_top_n()
+        if n_top is None:
+            return
+
+        def compute(engine):
+            top_readers_data = engine.top_readers(n_top)
+            return top_readers_data, engine.reader_names(reader_id for reader_id, _ in top_readers_data)
+
+        def render(engine, result):
+            top_readers_data, names = result
+            clear_output_area_command()
+            if not top_readers_data:
+                output_text_area.insert(tk.END, "Chưa có dữ liệu mượn sách để thống kê.\n"); return
+            output_text_area.insert(tk.END, f"--- Top {n_top} Bạn Đọc Mượn Sách Nhiều Nhất ({engine.name}) ---\n")
+            for i, (reader_id, count) in enumerate(top_readers_data, 1):
+                name = names.get(reader_id, f"[Bạn đọc mã {reader_id} không tìm thấy]")
+                output_text_area.insert(tk.END, f"Hạng {i}: {name} (Mã: {reader_id}) - Số lượt mượn: {count}\n")
+
+        run_report("top_readers", compute, render)
+    
+    def display_loan_counts_by_command(dimension, label, order_by_key=False):
+        """Báo cáo số phiếu theo một chiều (trạng thái, thể loại, tháng)."""
+        def compute(engine):
+            rows = engine.count_by(dimension)
+            if order_by_key:
+                return self_implemented_merge_sort(rows, key_func=lambda pair: pair[0])
+            return self_implemented_merge_sort(rows, key_func=rank_key)
+
+        def render(engine, rows):
+            clear_output_area_command()
+            total = sum(count for _, count in rows)
+            output_text_area.insert(tk.END, f"--- Số Phiếu Mượn Theo {label} ({engine.name}) ---\n")
+            for key, count in rows:
+                output_text_area.insert(tk.END, f"{key}: {count} phiếu ({count / total:.1%})\n")
+            output_text_area.insert(tk.END, f"Tổng cộng: {total} phiếu\n")
+
+        run_report(dimension, compute, render)
+
+    def display_total_books_stats_command():
+        def render(engine, totals):
+            clear_output_area_command()
+            output_text_area.insert(tk.END, f"--- Thống Kê Tổng Số Sách ({engine.name}) ---\n")
+            output_text_area.insert(tk.END, f"Tổng số đầu sách trong thư viện: {totals['book_titles']}\n")
+            output_text_area.insert(tk.END, f"Tổng số cuốn sách trong thư viện: {totals['book_copies']}\n")
+            output_text_area.insert(tk.END, f"Tổng số cuốn sách hiện còn trong thư viện: {totals['available_copies']}\n")
+
+        run_report("total_books", lambda engine: engine.totals(), render)
+
+    def display_total_readers_stats_command():
+        def render(engine, totals):
+            clear_output_area_command()
+            output_text_area.insert(tk.END, f"--- Thống Kê Tổng Số Bạn Đọc ({engine.name}) ---\n")
+            output_text_area.insert(tk.END, f"Tổng số bạn đọc đã đăng ký: {totals['readers']}\n")
+
+        run_report("total_readers", lambda engine: engine.totals(), render)
+
+    def display_books_currently_loaned_stats_command():
+        def render(engine, totals):
+            clear_output_area_command()
+            output_text_area.insert(tk.END, f"--- Thống Kê Sách Đang Được Mượn ({engine.name}) ---\n")
+            output_text_area.insert(tk.END, f"Tổng số sách hiện đang được mượn (bao gồm quá hạn): {totals['active_loans']}\n")
+
+        run_report("active_loans", lambda engine: engine.totals(), render)
+
+    def display_books_overdue_stats_command():
+        # Quá hạn = hạn trả trước ngày hôm nay
+        start_of_today = to_timestamp(datetime.datetime.combine(datetime.date.today(), datetime.time.min))
+
+        def render(engine, count):
+            clear_output_area_command()
+            output_text_area.insert(tk.END, f"--- Thống Kê Sách Đã Quá Hạn Trả ({engine.name}) ---\n")
+            output_text_area.insert(tk.END, f"Tổng số sách đã quá hạn trả: {count}\n")
+
+        run_report("overdue_loans", lambda engine: engine.count_overdue(start_of_today), render)
+
+    def reconcile_counters_command():
+        """Đối soát: tính lại bộ đếm từ dữ liệu gốc (chỉ cần khi nghi ngờ bộ đếm bị lệch)."""
+        def render(drift):
+            clear_output_area_command()
+            output_text_area.insert(tk.END, "--- Đối Soát Bộ Đếm Thống Kê ---\n")
+            if not drift:
+                output_text_area.insert(tk.END, "Các bộ đếm khớp với dữ liệu.\n")
+            for name, (stored, actual) in drift.items():
+                output_text_area.insert(tk.END, f"{name}: đã lưu {stored}, đúng là {actual} (đã sửa)\n")
+
+        # Hủy giữa chừng thì giao dịch đối soát được rollback, bộ đếm giữ nguyên
+        start_background_task("report", "Đang đối soát bộ đếm...", lambda task: reconcile_counters(task.conn), render,
+                              "Lỗi Đối Soát", "Không thể tính lại bộ đếm")
+
+    def display_loans_in_date_range_command():
+        try:
+            start = datetime.datetime.strptime(from_date_entry.get().strip(), "%Y-%m-%d")
+            end = datetime.datetime.strptime(to_date_entry.get().strip(), "%Y-%m-%d") + datetime.timedelta(days=1)
+        except ValueError:
+            messagebox.showerror("Lỗi", "Ngày phải có dạng YYYY-MM-DD.")
+            return
+
+        def render(engine, counts):
+            borrowed_count, due_count = counts
+            clear_output_area_command()
+            output_text_area.insert(tk.END, f"--- Thống Kê Từ {start:%Y-%m-%d} Đến {end - datetime.timedelta(days=1):%Y-%m-%d} ({engine.name}) ---\n")
+            output_text_area.insert(tk.END, f"Số phiếu mượn được tạo trong khoảng: {borrowed_count}\n")
+            output_text_area.insert(tk.END, f"Số phiếu mượn đến hạn trả trong khoảng: {due_count}\n")
+
+        run_report("date_range", lambda engine: engine.count_in_date_range(to_timestamp(start), to_timestamp(end)), render)
+
+    # --- Tạo các nút bấm ---
+    controls_frame = ttk.Frame(tab)
+    controls_frame.grid(row=1, column=0, columnspan=3, pady=5, sticky="ew")
+
+    btn_refresh_data = ttk.Button(controls_frame, text="🔄 LÀM MỚI DỮ LIỆU THỐNG KÊ TỪ CSDL", command=refresh_data_for_statistics_command, style="Accent.TButton")
+    btn_refresh_data.pack(fill=tk.X, padx=5, pady=(5,10))
+
+    # Tiến độ của tác vụ nền + nút hủy
+    status_frame = ttk.Frame(controls_frame)
+    status_frame.pack(fill=tk.X, padx=5, pady=(0,5))
+    progress_bar = ttk.Progressbar(status_frame, mode="indeterminate", length=120)
+    progress_bar.pack(side=tk.LEFT)
+    status_label = ttk.Label(status_frame, text="")
+    status_label.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+    btn_cancel = ttk.Button(status_frame, text="⛔ Hủy", command=cancel_background_task_command, state="disabled")
+    btn_cancel.pack(side=tk.RIGHT)
+    
+    stats_buttons_frame = ttk.Frame(controls_frame)
+    stats_buttons_frame.pack(fill=tk.X, expand=True)
+    stats_buttons_frame.columnconfigure(0, weight=1); stats_buttons_frame.columnconfigure(2, weight=1)
+
+    def add_engine_box(parent, report):
+        """Ô chọn engine cho báo cáo (mặc định theo DEFAULT_REPORT_ENGINES)."""
+        engine_box = ttk.Combobox(parent, values=list(engines), width=8, state="readonly")
+        engine_box.set(DEFAULT_REPORT_ENGINES[report])
+        report_engine_boxes[report] = engine_box
+        return engine_box
+
+    def add_report_button(report, text, command, row, column):
+        """Nút báo cáo ở cột column (0 hoặc 1) kèm ô chọn engine bên phải."""
+        button = ttk.Button(stats_buttons_frame, text=text, command=command)
+        button.grid(row=row, column=2 * column, padx=(5, 0), pady=2, sticky="ew")
+        add_engine_box(stats_buttons_frame, report).grid(row=row, column=2 * column + 1, padx=(2, 5), pady=2)
+        return button
+
+    btn_top_books = add_report_button("top_books", "🏆 Top Sách Mượn Nhiều", display_top_n_books_command, 0, 0)
+    btn_top_readers = add_report_button("top_readers", "🥇 Top Bạn Đọc Mượn Nhiều", display_top_n_readers_command, 0, 1)
+    
+    top_n_frame = ttk.Frame(stats_buttons_frame)
+    top_n_frame.grid(row=0, column=4, padx=5, pady=2, sticky="w")
+    ttk.Label(top_n_frame, text="Số hạng:").pack(side=tk.LEFT)
+    top_n_spinbox = ttk.Spinbox(top_n_frame, from_=1, to=MAX_TOP_N, width=6)
+    top_n_spinbox.set(DEFAULT_TOP_N)
+    top_n_spinbox.pack(side=tk.LEFT, padx=5)
+
+    btn_total_books = add_report_button("total_books", "📚 Tổng Số Sách", display_total_books_stats_command, 1, 0)
+    btn_total_readers = add_report_button("total_readers", "👥 Tổng Số Bạn Đọc", display_total_readers_stats_command, 1, 1)
+    
+    btn_currently_loaned = add_report_button("active_loans", "⏳ Sách Đang Mượn", display_books_currently_loaned_stats_command, 2, 0)
+    btn_overdue = add_report_button("overdue_loans", "⏰ Sách Quá Hạn Trả", display_books_overdue_stats_command, 2, 1)
+
+    btn_by_status = add_report_button("status", "🔖 Phiếu Theo Trạng Thái",
+                                      lambda: display_loan_counts_by_command("status", "Trạng Thái"), 3, 0)
+    btn_by_genre = add_report_button("genre", "🏷️ Phiếu Theo Thể Loại",
+                                     lambda: display_loan_counts_by_command("genre", "Thể Loại"), 3, 1)
+    btn_by_month = add_report_button("month", "🗓️ Phiếu Theo Tháng Mượn",
+                                     lambda: display_loan_counts_by_command("month", "Tháng Mượn", order_by_key=True), 4, 0)
+    
+    date_filter_frame = ttk.Frame(controls_frame)
+    date_filter_frame.pack(fill=tk.X, padx=5, pady=(5,0))
+    ttk.Label(date_filter_frame, text="Từ ngày (YYYY-MM-DD):").pack(side=tk.LEFT)
+    from_date_entry = ttk.Entry(date_filter_frame, width=12)
+    from_date_entry.pack(side=tk.LEFT, padx=5)
+    ttk.Label(date_filter_frame, text="Đến ngày:").pack(side=tk.LEFT)
+    to_date_entry = ttk.Entry(date_filter_frame, width=12)
+    to_date_entry.pack(side=tk.LEFT, padx=5)
+    btn_date_range = ttk.Button(date_filter_frame, text="📅 Thống kê theo khoảng ngày", command=display_loans_in_date_range_command)
+    btn_date_range.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(5, 0))
+    add_engine_box(date_filter_frame, "date_range").pack(side=tk.LEFT, padx=(2, 5))
+
+    btn_reconcile = ttk.Button(stats_buttons_frame, text="🧮 Đối Soát Bộ Đếm", command=reconcile_counters_command)
+    btn_reconcile.grid(row=4, column=2, columnspan=2, padx=5, pady=2, sticky="ew")
+
+    btn_clear = ttk.Button(controls_frame, text="🗑️ Xóa Kết Quả Hiển Thị", command=clear_output_area_command)
+    btn_clear.pack(fill=tk.X, padx=5, pady=(10,5))
+    
+    # Thêm style cho nút (tùy chọn, cần import ttk.Style)
+    # style = ttk.Style()
+    # style.configure("Accent.TButton", foreground="blue", font=('Helvetica', 10, 'bold'))
+
+    output_text_area.insert(tk.END, "Chào mừng đến Tab Thống kê!\n\n"
+                                    "Để xem các số liệu mới nhất, vui lòng nhấn nút:\n"
+                                    "'LÀM MỚI DỮ LIỆU THỐNG KÊ TỪ CSDL'\n\n"
+                                    "Sau đó, bạn có thể chọn các chức năng thống kê bên dưới.\n"
+                                    "Ô chọn cạnh mỗi nút là nguồn số liệu: RAM (dữ liệu đã làm mới), "
+                                    "SQL (đếm trực tiếp trong CSDL), Bộ đếm (cập nhật sau mỗi lần mượn/trả).\n"
+                                    "Việc nạp dữ liệu và tính báo cáo chạy nền: cửa sổ vẫn dùng được, nhấn 'Hủy' để dừng.\n")